@@ -1,5 +1,13 @@
 import os
+import sys
 import redis
+import socket
+import threading
+
+# Shared helpers live in utils/: next to this script in the container, one directory up in the repo
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.util_progress import publish_progress, queue_progress
+from utils.util_sharded_counters import counter_shard, fold_counters, shard_key
 
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
@@ -9,8 +17,12 @@ source_queue = os.getenv("REDIS_LIST", "source_list")
 pool = redis.ConnectionPool.from_url(redis_url)
 redis_client = redis.Redis(connection_pool=pool)
 
-# Define a counter key for tracking processed messages
+# Define a counter key for tracking processed messages. This consumer increments its own shard of it
+# (see utils/util_sharded_counters.py), and fold_counters refreshes the canonical key from the shards
 counter_key = "processed_count"
+consumer_id = f"{socket.gethostname()}_{os.getpid()}"
+counter_shard_key = shard_key(counter_key, counter_shard(consumer_id))
+
 
 def process_items():
     print("Starting consumer...")
@@ -23,11 +35,15 @@ def process_items():
             queue_name, message = item
             print(f"Processed message: {message}")
 
-            # Increment the counter by 1
-            redis_client.incr(counter_key)
+            # Increment our counter shard by 1, and mark progress if an injector is waiting
+            pipeline = redis_client.pipeline(transaction=False)
+            pipeline.incr(counter_shard_key)
+            replies = queue_progress(pipeline, 1, False)
+            publish_progress(redis_client, pipeline.execute()[-replies:], 1)
             # Display current counter value (optional)
             #processed_count = redis_client.get(counter_key)
             #print(f"Total messages processed: {processed_count.decode()}")
 
 if __name__ == "__main__":
+    threading.Thread(target=fold_counters, args=(redis_client, consumer_id), daemon=True).start()
     process_items()
\ No newline at end of file
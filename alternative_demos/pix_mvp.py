@@ -1,33 +1,148 @@
 import os
+import sys
 import redis
 import json
+import socket
+import threading
+import time
+
+# Shared helpers live in utils/: next to this script in the container, one directory up in the repo
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.util_progress import publish_progress, queue_progress
+from utils.util_sharded_counters import counter_shard, fold_counters, queue_counters
 
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 source_queue_base = os.getenv("REDIS_LIST", "source_list")  # Base name for lists
 list_index = int(os.getenv("LIST_INDEX", 0))  # Unique list index assigned per consumer
 use_hashtag = os.getenv("USE_HASHTAG", "false").lower() == "true"  # Determine if we should use hash tags
+consumer_mode = os.getenv("CONSUMER_MODE", "single")  # single | batched | reliable
+batch_size = int(os.getenv("BATCH_SIZE", 100))  # Max items per batch in batched/reliable mode
+block_timeout = float(os.getenv("BLOCK_TIMEOUT", 5))  # Seconds to block waiting for the first item
+heartbeat_ttl_ms = int(os.getenv("HEARTBEAT_TTL_MS", 10000))  # A consumer silent this long is considered dead
+recovery_interval = float(os.getenv("RECOVERY_INTERVAL", 30))  # Seconds between recovery sweeps
+work_stealing = os.getenv("WORK_STEALING", "false").lower() == "true"  # Also consume from the other lists
+num_lists = int(os.getenv("NUM_LISTS", 1))  # Lists source_list_0 .. source_list_{NUM_LISTS-1}
+steal_sample_interval = float(os.getenv("STEAL_SAMPLE_INTERVAL", 0.5))  # Seconds between LLEN samples
+
+
+def list_name(index):
+    # Apply hash tags if USE_HASHTAG is enabled
+    if use_hashtag:
+        return f"{{{source_queue_base}_{index}}}"
+    return f"{source_queue_base}_{index}"
+
+
+source_queue = list_name(list_index)
 
-# Apply hash tags if USE_HASHTAG is enabled
-if use_hashtag:
-    source_queue = f"{{{source_queue_base}_{list_index}}}"
-else:
-    source_queue = f"{source_queue_base}_{list_index}"
+# Per-consumer processing list for reliable mode. It shares the source list's hash tag, so LMOVE
+# stays in one slot on a cluster (reliable mode on a cluster requires USE_HASHTAG=true).
+consumer_id = f"{socket.gethostname()}_{os.getpid()}"
+processing_prefix = f"{source_queue}:processing:"
+alive_prefix = f"{source_queue}:alive:"
+processing_queue = f"{processing_prefix}{consumer_id}"
+alive_key = f"{alive_prefix}{consumer_id}"
+consumers_key = f"{source_queue}:consumers"  # Consumers that may own a processing list, scored by their last heartbeat
 
 # Initialize Redis connection≠
 pool = redis.ConnectionPool.from_url(redis_url)
 redis_client = redis.Redis(connection_pool=pool)
 
-# Define keys for tracking
+# Define keys for tracking: this consumer increments its own shard of each (see utils/util_sharded_counters.py),
+# so replicas never contend on one hot key; the canonical keys are refreshed by fold_counters
 counter_key = "processed_count"
 total_amount_key = "total_amount"
+shard = counter_shard(consumer_id)
+progress_waiting = False  # An injector was waiting at the last commit: count progress in the commit pipeline
+
+
+def commit_counters(processed, amount):
+    """
+    Add one batch to this consumer's shard of processed_count and total_amount, in one pipeline with
+    the progress reads, then publish progress for a waiting injector (see utils/util_progress.py)
+    """
+    global progress_waiting
+    pipeline = redis_client.pipeline(transaction=False)
+    queue_counters(pipeline, shard, processed, amount)
+    replies = queue_progress(pipeline, processed, progress_waiting)
+    progress_waiting = publish_progress(redis_client, pipeline.execute()[-replies:], processed)
+
+
+class WorkStealer:
+    """
+    Picks the list to pop from across all NUM_LISTS lists: the home list first, then the others
+    longest first, from LLEN samples taken in one pipeline every steal_sample_interval seconds.
+    Ties rotate on every sample, so idle consumers don't all pile onto the same list.
+
+    On a standalone Redis a single multi-key BRPOP blocks on all of them in priority order. On a
+    cluster the lists hash to different slots whether or not they use hash tags (each list has its
+    own tag), so a multi-key BRPOP fails with CROSSSLOT. The first CROSSSLOT switches this stealer to
+    single-key commands: RPOP on the best sampled list, or a short BRPOP on the home list when every
+    list looked empty.
+    """
 
-def process_items():
+    def __init__(self, home_index, count):
+        self.home = list_name(home_index)
+        self.others = [list_name(index) for index in range(count) if index != home_index]
+        self.order = [self.home] + self.others
+        self.lengths = {}
+        self.last_sample = 0.0
+        self.rotation = home_index
+        self.multi_key = True  # Until the server rejects a multi-key BRPOP
+
+    def sample(self):
+        pipeline = redis_client.pipeline(transaction=False)
+        for name in self.order:
+            pipeline.llen(name)
+        self.lengths = dict(zip(self.order, pipeline.execute()))
+        self.rotation += 1
+        rank = {name: (position - self.rotation) % len(self.others) for position, name in enumerate(self.others)}
+        self.order = [self.home] + sorted(self.others, key=lambda name: (-self.lengths[name], rank[name]))
+        self.last_sample = time.time()
+
+    def pop(self, timeout):
+        """Pop one item as (list name, message), or None after timeout seconds"""
+        if self.others and time.time() - self.last_sample >= steal_sample_interval:
+            self.sample()
+
+        if self.multi_key:
+            try:
+                return redis_client.brpop(self.order, timeout=timeout)
+            except redis.exceptions.ResponseError as e:
+                if "CROSSSLOT" not in str(e):
+                    raise
+                print("The lists are in different cluster slots: stealing with single-key RPOP instead of BRPOP")
+                self.multi_key = False
+                self.sample()
+
+        item = None
+        candidates = [name for name in self.order if self.lengths.get(name)]
+        for name in candidates:
+            message = redis_client.rpop(name)
+            if message is not None:
+                item = (name.encode(), message)
+                break
+            self.lengths[name] = 0
+        if item is None:
+            # Block on the home list only, but not for long: other lists may fill meanwhile
+            item = redis_client.brpop(self.home, timeout=min(timeout or steal_sample_interval,
+                                                             steal_sample_interval))
+        return item
+
+
+def pop_item(stealer, timeout):
+    """Pop from the home list, or across all lists when work stealing is enabled"""
+    if stealer:
+        return stealer.pop(timeout)
+    return redis_client.brpop(source_queue, timeout=timeout)
+
+
+def process_items(stealer=None):
     print(f"Starting consumer for list: {source_queue}...")
 
     while True:
         # Block until an item is available in the specified source_queue
-        item = redis_client.brpop(source_queue, timeout=0)
+        item = pop_item(stealer, timeout=0)
         if item:
             queue_name, message = item
             try:
@@ -38,8 +153,7 @@ def process_items():
                 amount = float(transaction.get("amount", 0))
 
                 # Increment the processed count and total amount
-                redis_client.incr(counter_key)
-                redis_client.incrbyfloat(total_amount_key, amount)
+                commit_counters(1, amount)
 
                 # Optional logging
                 # print(f"Processed transaction {transaction['transaction_id']}: BRL {amount}")
@@ -49,5 +163,118 @@ def process_items():
             except (ValueError, KeyError) as e:
                 print(f"Error processing message: {e}")
 
+
+def sum_batch(messages):
+    """Number of payments in a batch and their total amount; malformed messages are logged and skipped"""
+    processed, total = 0, 0.0
+    for message in messages:
+        try:
+            total += float(json.loads(message).get("amount", 0))
+            processed += 1
+        except (ValueError, KeyError, AttributeError) as e:
+            print(f"Error processing message: {e}")
+    return processed, total
+
+
+def process_items_batched(stealer=None):
+    """Block for the first item, drain up to batch_size - 1 more with RPOP COUNT, commit counters once per batch"""
+    print(f"Starting batched consumer for list: {source_queue} (batches of {batch_size})...")
+
+    while True:
+        item = pop_item(stealer, timeout=block_timeout)
+        if not item:
+            continue
+        queue_name, message = item
+        messages = [message]
+        if batch_size > 1:
+            # Drain the list the first item came from (home or stolen)
+            messages += redis_client.rpop(queue_name, batch_size - 1) or []
+
+        commit_counters(*sum_batch(messages))
+
+
+def recover_orphaned_batches():
+    """
+    Move items from processing lists of dead consumers (heartbeat expired) back to the source list.
+    The owners come from consumers_key, not a SCAN of the keyspace; a drained dead consumer is removed
+    (a consumer that was only slow adds itself back with its next heartbeat).
+    """
+    recovered = 0
+    for owner in redis_client.zrange(consumers_key, 0, -1):
+        owner = owner.decode()
+        if owner == consumer_id or redis_client.exists(f"{alive_prefix}{owner}"):
+            continue
+        # Pushed back on the end consumers pop from, so recovered payments are processed next.
+        # LMOVE is atomic per item, so concurrent sweeps can't lose or duplicate anything.
+        while redis_client.lmove(f"{processing_prefix}{owner}", source_queue, "RIGHT", "RIGHT") is not None:
+            recovered += 1
+        redis_client.zrem(consumers_key, owner)
+    if recovered:
+        print(f"Recovered {recovered} orphaned items into {source_queue}")
+    return recovered
+
+
+def process_items_reliable():
+    """
+    Each batch moves atomically into this consumer's processing list, so a crash never loses a payment:
+    the recovery sweep of another consumer hands it back to the source list.
+
+    Clearing the processing list, the heartbeat (alive key and consumers_key) and the fetch of the next
+    batch go in one MULTI/EXEC. All these keys share the source list's hash tag, so the transaction stays in one cluster slot. The
+    counters and the progress key live in other slots, so they go first in their own non-transactional
+    pipeline: a crash between the two can count a batch twice, never lose a payment. A busy consumer
+    pays two round trips per batch.
+    """
+    print(f"Starting reliable consumer {consumer_id} for list: {source_queue} (batches of {batch_size})...")
+
+    # Our own processing list survives a restart only under the same host and pid: process it first
+    messages = redis_client.lrange(processing_queue, 0, -1)
+    last_recovery = 0.0
+
+    while True:
+        if time.time() - last_recovery >= recovery_interval:
+            recover_orphaned_batches()
+            last_recovery = time.time()
+
+        if not messages:
+            heartbeat = redis_client.pipeline(transaction=False)
+            heartbeat.set(alive_key, 1, px=heartbeat_ttl_ms)
+            heartbeat.zadd(consumers_key, {consumer_id: time.time()})
+            heartbeat.execute()
+            first = redis_client.blmove(source_queue, processing_queue, block_timeout, "RIGHT", "LEFT")
+            if first is None:
+                continue
+            messages = [first]
+            if batch_size > 1:
+                pipeline = redis_client.pipeline(transaction=False)
+                for _ in range(batch_size - 1):
+                    pipeline.lmove(source_queue, processing_queue, "RIGHT", "LEFT")
+                messages += [message for message in pipeline.execute() if message is not None]
+
+        commit_counters(*sum_batch(messages))
+
+        pipeline = redis_client.pipeline(transaction=True)
+        pipeline.delete(processing_queue)
+        pipeline.set(alive_key, 1, px=heartbeat_ttl_ms)
+        pipeline.zadd(consumers_key, {consumer_id: time.time()})
+        for _ in range(batch_size):
+            pipeline.lmove(source_queue, processing_queue, "RIGHT", "LEFT")
+        messages = [message for message in pipeline.execute()[3:] if message is not None]
+
+
 if __name__ == "__main__":
-    process_items()
\ No newline at end of file
+    threading.Thread(target=fold_counters, args=(redis_client, consumer_id), daemon=True).start()
+
+    stealer = None
+    if work_stealing and num_lists > 1:
+        stealer = WorkStealer(list_index, num_lists)
+        print(f"Work stealing across {num_lists} lists, home list {source_queue}")
+
+    if consumer_mode == "reliable":
+        if stealer:
+            print("Work stealing is not supported in reliable mode (BLMOVE takes a single source list)")
+        process_items_reliable()
+    elif consumer_mode == "batched":
+        process_items_batched(stealer)
+    else:
+        process_items(stealer)
@@ -1,8 +1,15 @@
 import os
+import sys
 import random
 import redis
 import time
 import socket
+import threading
+
+# Shared helpers live in utils/: next to this script in the container, one directory up in the repo
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.util_progress import publish_progress, queue_progress
+from utils.util_sharded_counters import counter_shard, fold_counters, queue_counters
 
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
@@ -11,6 +18,7 @@ group_name = os.getenv("GROUP_NAME", "pix_consumers")  # Consumer group name
 #consumer_name = os.getenv("CONSUMER_NAME", "consumer_1")  # Unique consumer name
 consumer_name = f"consumer_{socket.gethostname()}_{random.randint(1000, 9999)}"
 idle_threshold_ms = int(os.getenv("IDLE_THRESHOLD_MS", 5000))  # Idle threshold for claiming messages (default 5s)
+shard = counter_shard(consumer_name)  # Our processed_count/total_amount shard (see utils/util_sharded_counters.py)
 
 # Initialize Redis connection
 redis_client = redis.from_url(redis_url)
@@ -32,6 +40,14 @@ def initialize_consumer_group():
             else:
                 raise e
 
+# Count one processed message on our counter shards and, if an injector is waiting, mark the first,
+# every step-th and the last
+def count_processed(amount):
+    pipeline = redis_client.pipeline(transaction=False)
+    queue_counters(pipeline, shard, 1, amount)
+    replies = queue_progress(pipeline, 1, False)
+    publish_progress(redis_client, pipeline.execute()[-replies:], 1)
+
 # Process messages from the stream
 def process_messages():
     print(f"Starting consumer {consumer_name} for stream: {stream_name}...")
@@ -62,8 +78,7 @@ def process_messages():
             for message_id, message_data in message_entries:
                 try:
                     amount = float(message_data.get(b"amount", 0))
-                    redis_client.incr("processed_count")
-                    redis_client.incrbyfloat("total_amount", amount)
+                    count_processed(amount)
                     redis_client.xack(stream_name, group_name, message_id)
                     print(f"Processed message ID: {message_id}, Amount: {amount}")
                 except (ValueError, KeyError) as e:
@@ -90,12 +105,12 @@ def review_pending():
             for msg_id, msg_data in claimed_messages:
                 try:
                     amount = float(msg_data.get(b"amount", 0))
-                    redis_client.incr("processed_count")
-                    redis_client.incrbyfloat("total_amount", amount)
+                    count_processed(amount)
                     redis_client.xack(stream_name, group_name, msg_id)
                     print(f"Claimed and processed stalled message ID: {msg_id}, Amount: {amount}")
                 except (ValueError, KeyError) as e:
                     print(f"Error processing stalled message ID {msg_id}: {e}")
 
 if __name__ == "__main__":
+    threading.Thread(target=fold_counters, args=(redis_client, consumer_name), daemon=True).start()
     process_messages()
\ No newline at end of file
@@ -30,9 +30,21 @@ case "${MODE}" in
     exec python3 stream_latency_demo.py
     ;;
 
+  lag-metrics)
+    echo "Starting Lag Metrics Adapter (pix_lag_metrics.py)..."
+    echo "Metrics at http://localhost:${METRICS_PORT:-8080}/metrics"
+    exec python3 pix_lag_metrics.py
+    ;;
+
+  archiver)
+    echo "Starting Stream Archiver (pix_archiver.py)..."
+    echo "ARCHIVE_DIR: ${ARCHIVE_DIR:-archive}"
+    exec python3 pix_archiver.py
+    ;;
+
   *)
     echo "ERROR: Invalid MODE '${MODE}'"
-    echo "Valid modes: consumer, monitor, simulator, latency-demo"
+    echo "Valid modes: consumer, monitor, simulator, latency-demo, lag-metrics, archiver"
     exit 1
     ;;
 esac
@@ -0,0 +1,185 @@
+import os
+import argparse
+import glob
+import json
+import redis
+import time
+
+from utils.util_payment_columns import ColumnBuffer, format_id, parse_id, read_columns, summarize_columns, write_columns
+
+# Archives acknowledged payments from the stream to compressed, column-oriented files on local disk,
+# so pix_payments can be trimmed without losing what reconciliation needs. The archiver has its own ID
+# cursor and reads with large-COUNT XRANGEs, but never past the processing group's acknowledged
+# frontier: entries up to the group's last-delivered-id and below its oldest pending entry. An entry
+# delivered more than ARCHIVE_MAX_DELIVERIES times without an ACK can't be processed, so it doesn't hold
+# the frontier back: it is archived as it is, with a warning. Rows are
+# buffered column by column and written as one .npz (one NumPy array per column, zip-deflated) when
+# ARCHIVE_ROWS rows are buffered or ARCHIVE_INTERVAL seconds have passed. Reads stop at ARCHIVE_ROWS,
+# so no file has more rows and memory stays bounded by them. After each file the last archived ID is
+# checkpointed.
+#
+# Columns: see utils/util_payment_columns.py. Archive files double as traffic recordings for
+# utils/util_traffic_replayer.py.
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+stream_name = os.getenv("REDIS_STREAM", "pix_payments")
+group_name = os.getenv("GROUP_NAME", "pix_consumers")  # Only entries this group acknowledged are archived
+archive_dir = os.getenv("ARCHIVE_DIR", "archive")
+read_count = int(os.getenv("ARCHIVE_READ_COUNT", 10000))  # Entries per XRANGE
+flush_rows = int(os.getenv("ARCHIVE_ROWS", 200000))  # Rows per file at most
+flush_interval = float(os.getenv("ARCHIVE_INTERVAL", 60))  # Seconds before a partial file is written anyway
+poll_interval = float(os.getenv("ARCHIVE_POLL", 1))  # Seconds to wait when caught up with the frontier
+trim = os.getenv("ARCHIVE_TRIM", "false").lower() == "true"  # XTRIM MINID the stream up to each checkpoint
+max_deliveries = int(os.getenv("ARCHIVE_MAX_DELIVERIES", 10))  # Pending entries delivered more often are poison
+stall_warning = float(os.getenv("ARCHIVE_STALL_WARNING", 300))  # Warn when one pending entry holds the frontier this long
+
+checkpoint_file = os.path.join(archive_dir, f"{stream_name}.checkpoint.json")
+
+
+def archive_path(first_id, last_id):
+    return os.path.join(archive_dir, f"{stream_name}_{first_id}_{last_id}.npz")
+
+
+def write_archive(buffer):
+    """Write the buffer to its file (temp file, fsync, rename) and return the last archived ID"""
+    first_id = format_id(buffer.id_ms[0], buffer.id_seq[0])
+    last_id = format_id(buffer.id_ms[-1], buffer.id_seq[-1])
+    path = archive_path(first_id, last_id)
+    write_columns(path, buffer)
+    return path, last_id
+
+
+def load_checkpoint():
+    """
+    Last archived ID: the checkpoint, or a newer archive file left by a crash between writing a file
+    and checkpointing it, so its rows aren't archived twice
+    """
+    last_id = "0-0"
+    try:
+        with open(checkpoint_file) as checkpoint:
+            last_id = json.load(checkpoint)["last_id"]
+    except (OSError, ValueError, KeyError):
+        pass
+    for path in glob.glob(os.path.join(archive_dir, f"{stream_name}_*_*.npz")):
+        file_last_id = os.path.basename(path)[:-len(".npz")].rsplit("_", 1)[1]
+        if parse_id(file_last_id) > parse_id(last_id):
+            last_id = file_last_id
+    return last_id
+
+
+def save_checkpoint(last_id, path):
+    with open(checkpoint_file + ".tmp", "w") as checkpoint:
+        json.dump({"last_id": last_id, "file": os.path.basename(path), "updated": time.time()}, checkpoint)
+    os.replace(checkpoint_file + ".tmp", checkpoint_file)
+
+
+def oldest_live_pending(redis_client, page_size=100):
+    """
+    The oldest pending entry that is still being worked on, or None, and the IDs of the older ones that
+    were delivered more than max_deliveries times (poison: every consumer fails on them)
+    """
+    poison = []
+    start = "-"
+    while True:
+        page = redis_client.xpending_range(stream_name, group_name, min=start, max="+", count=page_size)
+        for entry in page:
+            if entry["times_delivered"] <= max_deliveries:
+                return entry["message_id"].decode(), poison
+            poison.append(entry["message_id"].decode())
+        if len(page) < page_size:
+            return None, poison
+        start = f"({page[-1]['message_id'].decode()}"
+
+
+def acknowledged_frontier(redis_client):
+    """
+    XRANGE end bound covering only entries the group acknowledged (or gave up on, see oldest_live_pending),
+    or None when the group doesn't exist yet; also the stream's max-deleted-entry-id (Redis 7+), to detect
+    entries trimmed before they were archived, and the poison entries passed over
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.xinfo_groups(stream_name)
+    pipe.xpending(stream_name, group_name)
+    pipe.xinfo_stream(stream_name)
+    groups, pending, stream_info = pipe.execute(raise_on_error=False)
+    if isinstance(groups, Exception) or isinstance(pending, Exception):
+        return None, None, []
+    group = next((group for group in groups if group["name"].decode() == group_name), None)
+    if group is None:
+        return None, None, []
+    max_deleted = None if isinstance(stream_info, Exception) else stream_info.get("max-deleted-entry-id")
+    max_deleted = max_deleted.decode() if max_deleted else None
+    poison = []
+    if pending["pending"]:
+        oldest, poison = oldest_live_pending(redis_client)
+        if oldest is not None:
+            return f"({oldest}", max_deleted, poison  # Exclusive: the oldest pending entry isn't acknowledged
+    return group["last-delivered-id"].decode(), max_deleted, poison
+
+
+def run():
+    os.makedirs(archive_dir, exist_ok=True)
+    redis_client = redis.from_url(redis_url)
+    cursor = load_checkpoint()
+    buffer = ColumnBuffer()
+    reported_loss = None
+    reported_poison = set()
+    held_by, held_since, held_reported = None, 0.0, False  # The pending entry bounding the frontier, and since when
+    print(f"Archiving acknowledged entries of {stream_name} (group {group_name}) after {cursor} to {archive_dir}/, "
+          f"{flush_rows:,} rows or {flush_interval:g}s per file")
+
+    while True:
+        frontier, max_deleted, poison = acknowledged_frontier(redis_client)
+        for message_id in poison:
+            if message_id not in reported_poison and parse_id(message_id) > parse_id(cursor):
+                print(f"Warning: archiving past {message_id}, delivered more than {max_deliveries} times "
+                      f"without being acknowledged")
+                reported_poison.add(message_id)
+        if frontier is not None and frontier.startswith("(") and frontier == held_by:
+            if not held_reported and time.time() - held_since >= stall_warning:
+                print(f"Warning: pending entry {frontier[1:]} has held archiving back for {stall_warning:g}s")
+                held_reported = True
+        else:
+            held_by, held_since, held_reported = frontier, time.time(), False
+        entries = []
+        count = min(read_count, flush_rows - len(buffer))  # Never read past a full file
+        if frontier is None:
+            print(f"Waiting for consumer group '{group_name}' on stream '{stream_name}'...")
+        else:
+            if max_deleted and parse_id(max_deleted) > parse_id(cursor) and max_deleted != reported_loss:
+                print(f"Warning: entries after {cursor} up to {max_deleted} were trimmed or deleted before being archived")
+                reported_loss = max_deleted
+            entries = redis_client.xrange(stream_name, min=f"({cursor}", max=frontier, count=count)
+            if entries:
+                buffer.append(entries)
+                cursor = entries[-1][0].decode()
+
+        if len(buffer) >= flush_rows or (len(buffer) and time.time() - buffer.started >= flush_interval):
+            path, last_id = write_archive(buffer)
+            save_checkpoint(last_id, path)
+            print(f"Archived {len(buffer):,} entries to {path} ({os.path.getsize(path) / len(buffer):.1f} bytes/entry)")
+            buffer.clear()
+            if trim:
+                # Approximate MINID only removes whole stream nodes, so nothing newer than the checkpoint goes
+                ms, seq = parse_id(last_id)
+                redis_client.xtrim(stream_name, minid=format_id(ms, seq + 1), approximate=True)
+
+        # Read again at once while behind; wait only when caught up with the frontier
+        if len(entries) < count:
+            time.sleep(poll_interval)
+
+
+def inspect(paths):
+    """Print rows, ID range and amounts per backend of archive files, e.g. for reconciliation"""
+    for path in paths:
+        summarize_columns(path, read_columns(path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive acknowledged PIX payments to compressed columnar files")
+    parser.add_argument("--inspect", nargs="+", metavar="FILE", help="Summarize archive files instead of archiving")
+    args = parser.parse_args()
+    if args.inspect:
+        inspect(args.inspect)
+    else:
+        run()
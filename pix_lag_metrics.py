@@ -0,0 +1,245 @@
+import os
+import json
+import math
+import redis
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.util_metric_history import EwmaRate
+from utils.util_sharded_counters import queue_counter_reads, sum_counter_replies
+
+# Autoscaling signal for the PIX consumers. They are I/O-bound, so CPU stays flat while the backlog
+# grows; this service samples the consumer group's lag, the arrival and processing rates and the
+# measured throughput of one consumer pod, and serves them as Prometheus metrics (for prometheus-adapter,
+# which exposes them to the HPA as external metrics) and as JSON (for KEDA's metrics-api scaler).
+#
+# Each consumer pod runs several workers, each a group consumer named <pod consumer>/<index> (the first
+# is just <pod consumer>), so capacity and active counts are per pod: the unit the HPA scales.
+#
+# pix_recommended_replicas is the number of consumer pods needed to keep up with arrivals and drain the
+# current backlog within TARGET_DRAIN_SECONDS. An HPA External metric on it with an AverageValue
+# target of 1 makes the HPA follow the recommendation directly.
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+stream_name = os.getenv("REDIS_STREAM", "pix_payments")
+group_name = os.getenv("GROUP_NAME", "pix_consumers")
+consumer_stats_key = os.getenv("CONSUMER_STATS_KEY", "consumer_processed_count")  # The stream consumers' counts, not <key>:<list>
+metrics_port = int(os.getenv("METRICS_PORT", 8080))
+sample_interval = float(os.getenv("SAMPLE_INTERVAL", 5))  # Seconds between samples
+rate_window = float(os.getenv("RATE_WINDOW", 60))  # EWMA window (seconds) for arrival and processing rates
+target_drain_seconds = float(os.getenv("TARGET_DRAIN_SECONDS", 60))  # Drain the backlog within this time
+consumer_throughput = float(os.getenv("CONSUMER_THROUGHPUT", 500))  # msg/s per consumer pod until measured
+saturation_backlog = int(os.getenv("SATURATION_BACKLOG", 1000))  # Backlog above which consumers are busy
+active_idle_ms = int(os.getenv("ACTIVE_IDLE_MS", 30000))  # Consumers idle longer than this are gone
+min_replicas = int(os.getenv("MIN_REPLICAS", 1))
+max_replicas = int(os.getenv("MAX_REPLICAS", 100))
+
+
+def consumer_pod(name):
+    """The consumer pod a group consumer belongs to: its name without the /<index> of a worker"""
+    return name.split("/", 1)[0]
+
+
+class LagMetrics:
+    def __init__(self):
+        self.redis_client = redis.from_url(redis_url)
+        self.arrival = EwmaRate((rate_window,))
+        self.processing = EwmaRate((rate_window,))
+        self.consumer_rates = {}  # consumer name -> EwmaRate
+        self.capacity = consumer_throughput  # Measured msg/s of one consumer pod, all its workers together
+        self.capacity_measured = False
+        self.snapshot = {}
+        self.last_sample = 0.0
+        self.lag_known = True
+        self.lock = threading.Lock()
+
+    def sample(self):
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.xinfo_stream(stream_name)
+        pipe.xinfo_groups(stream_name)
+        pipe.xinfo_consumers(stream_name, group_name)
+        pipe.hgetall(consumer_stats_key)
+        queue_counter_reads(pipe)  # processed_count, summed from its shards
+        stream_info, groups, consumers, consumer_counts, *counter_replies = pipe.execute(raise_on_error=False)
+        timestamp = time.time()
+
+        if isinstance(stream_info, Exception) or isinstance(groups, Exception):
+            # Stream or group not created yet: nothing to scale for
+            stream_info, groups, consumers = {}, [], []
+        if isinstance(consumers, Exception):
+            consumers = []
+        group = next((group for group in groups if group["name"].decode() == group_name), {})
+        lag, lag_known = self.group_lag(stream_info, group)
+        pending = group.get("pending", 0)
+        backlog = lag + pending
+        active = len({consumer_pod(consumer["name"].decode())
+                      for consumer in consumers if consumer.get("idle", 0) < active_idle_ms})
+
+        processed = sum_counter_replies(counter_replies)["processed_count"]
+        (processing_rate,) = self.processing.update(timestamp, processed)
+        # entries-added needs Redis 7; without it assume arrivals match processing (steady state)
+        entries_added = stream_info.get("entries-added")
+        if entries_added is not None:
+            (arrival_rate,) = self.arrival.update(timestamp, entries_added)
+        else:
+            arrival_rate = processing_rate
+
+        # Only a saturated interval measures what a consumer can do; idle consumers just show arrivals
+        if backlog >= saturation_backlog and active and self.processing.instant:
+            per_consumer = self.processing.instant / active
+            if self.capacity_measured:
+                alpha = 1 - math.exp(-sample_interval / rate_window)
+                self.capacity += alpha * (per_consumer - self.capacity)
+            else:
+                self.capacity = per_consumer
+                self.capacity_measured = True
+
+        per_consumer_rates = {}
+        if not isinstance(consumer_counts, Exception):
+            for name, count in consumer_counts.items():
+                rate = self.consumer_rates.setdefault(name.decode(), EwmaRate((rate_window,)))
+                (per_consumer_rates[name.decode()],) = rate.update(timestamp, int(count))
+            # Consumers pruned from the stats hash are gone: drop their rates too
+            for name in set(self.consumer_rates) - set(per_consumer_rates):
+                del self.consumer_rates[name]
+
+        processing_rate = processing_rate or 0.0
+        arrival_rate = arrival_rate or 0.0
+        needed = (arrival_rate + backlog / target_drain_seconds) / max(self.capacity, 1e-9)
+        recommended = min(max(math.ceil(needed), min_replicas), max_replicas)
+        net_drain = processing_rate - arrival_rate
+        drain_seconds = backlog / net_drain if net_drain > 0 else (0.0 if not backlog else math.inf)
+
+        snapshot = {
+            "stream": stream_name,
+            "group": group_name,
+            "timestamp": timestamp,
+            "lag": lag,
+            "lag_known": lag_known,
+            "pending": pending,
+            "backlog": backlog,
+            "active_consumers": active,
+            "arrival_rate": arrival_rate,
+            "processing_rate": processing_rate,
+            "consumer_capacity": self.capacity,
+            "capacity_measured": self.capacity_measured,
+            "estimated_drain_seconds": drain_seconds,
+            "target_drain_seconds": target_drain_seconds,
+            "recommended_replicas": recommended,
+            "consumer_rates": {name: rate or 0.0 for name, rate in per_consumer_rates.items()},
+        }
+        with self.lock:
+            self.snapshot = snapshot
+            self.last_sample = timestamp
+        return snapshot
+
+    def group_lag(self, stream_info, group):
+        """
+        The group's lag and whether Redis reported it. XINFO GROUPS has no lag before Redis 7, and a null
+        one when deleted entries make it uncomputable. Then entries-added minus entries-read stands in,
+        which counts deleted entries too (erring toward more replicas); without those (Redis < 7) the
+        lag is taken as 0, so the recommendation only covers arrivals and pending entries. Logged when
+        it changes, and exposed as pix_consumer_group_lag_unknown.
+        """
+        lag = group.get("lag")
+        if lag is not None or not group:
+            lag_known, estimate = True, lag or 0
+        else:
+            lag_known = False
+            entries_added, entries_read = stream_info.get("entries-added"), group.get("entries-read")
+            if entries_added is not None and entries_read is not None:
+                estimate = max(entries_added - entries_read, 0)
+            else:
+                estimate = 0
+        if lag_known != self.lag_known:
+            if lag_known:
+                print(f"Redis reports the lag of {stream_name}/{group_name} again")
+            elif estimate:
+                print(f"Redis reports no lag for {stream_name}/{group_name}: "
+                      f"estimating {estimate:,} from entries-added minus entries-read")
+            else:
+                print(f"Redis reports no lag for {stream_name}/{group_name} (Redis < 7?): "
+                      f"replicas are recommended from arrivals and pending entries only")
+            self.lag_known = lag_known
+        return estimate, lag_known
+
+    def run(self):
+        while True:
+            started = time.time()
+            try:
+                self.sample()
+            except redis.exceptions.ConnectionError as e:
+                print(f"Redis unavailable: {e}")
+            time.sleep(max(sample_interval - (time.time() - started), 0))
+
+    def current(self):
+        with self.lock:
+            return dict(self.snapshot), self.last_sample
+
+
+def render_prometheus(snapshot):
+    labels = f'stream="{snapshot["stream"]}",group="{snapshot["group"]}"'
+    gauges = [
+        ("pix_consumer_group_lag", "Entries not yet delivered to the group", snapshot["lag"]),
+        ("pix_consumer_group_lag_unknown", "1 when Redis reports no lag and pix_consumer_group_lag is an estimate",
+         int(not snapshot["lag_known"])),
+        ("pix_consumer_group_pending", "Entries delivered but not acknowledged", snapshot["pending"]),
+        ("pix_consumer_group_backlog", "Lag plus pending", snapshot["backlog"]),
+        ("pix_active_consumers", "Consumer pods with a worker seen within ACTIVE_IDLE_MS", snapshot["active_consumers"]),
+        ("pix_arrival_rate", "Messages added per second (EWMA)", snapshot["arrival_rate"]),
+        ("pix_processing_rate", "Messages processed per second (EWMA)", snapshot["processing_rate"]),
+        ("pix_consumer_capacity", "Messages per second one saturated consumer pod processes", snapshot["consumer_capacity"]),
+        ("pix_estimated_drain_seconds", "Seconds to drain the backlog at current rates", snapshot["estimated_drain_seconds"]),
+        ("pix_recommended_replicas", "Consumer pods needed to drain within the target", snapshot["recommended_replicas"]),
+    ]
+    lines = []
+    for name, help_text, value in gauges:
+        value = "+Inf" if math.isinf(value) else float(value)
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{{{labels}}} {value}"]
+    lines += ["# HELP pix_consumer_throughput Messages per second processed by each consumer (EWMA)",
+              "# TYPE pix_consumer_throughput gauge"]
+    for consumer, rate in snapshot["consumer_rates"].items():
+        lines.append(f'pix_consumer_throughput{{{labels},consumer="{consumer}"}} {rate}')
+    return "\n".join(lines) + "\n"
+
+
+def make_handler(metrics):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            snapshot, last_sample = metrics.current()
+            if self.path == "/healthz":
+                healthy = time.time() - last_sample < 3 * sample_interval
+                self._send(200 if healthy else 503, "text/plain", "ok\n" if healthy else "stale\n")
+            elif not snapshot:
+                self._send(503, "text/plain", "no sample yet\n")
+            elif self.path == "/metrics":
+                self._send(200, "text/plain; version=0.0.4", render_prometheus(snapshot))
+            elif self.path == "/recommendation":
+                # inf is not valid JSON: report an undrainable backlog as null
+                if math.isinf(snapshot["estimated_drain_seconds"]):
+                    snapshot["estimated_drain_seconds"] = None
+                self._send(200, "application/json", json.dumps(snapshot))
+            else:
+                self._send(404, "text/plain", "not found\n")
+
+        def _send(self, status, content_type, body):
+            body = body.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood the log
+
+    return Handler
+
+
+if __name__ == "__main__":
+    metrics = LagMetrics()
+    threading.Thread(target=metrics.run, daemon=True).start()
+    print(f"Serving lag metrics for {stream_name}/{group_name} on :{metrics_port} "
+          f"(/metrics, /recommendation, /healthz), sampling every {sample_interval}s")
+    ThreadingHTTPServer(("", metrics_port), make_handler(metrics)).serve_forever()
@@ -1,8 +1,15 @@
 import os
+import argparse
+import gzip
+import json
+import zlib
+import sys
 import redis
+import redis.asyncio
 import time
 import asyncio
-from datetime import datetime
+import numpy as np
+from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 
 from rich.console import Console
@@ -14,165 +21,403 @@ from rich.live import Live
 from rich.align import Align
 from rich.columns import Columns
 
+from utils.util_metric_history import MetricHistory, EwmaRate, Sparkline
+from utils.util_sharded_counters import COUNTERS, counter_shards, queue_counter_reads, sum_counter_replies
+from utils.util_rollups import (plan_buckets, queue_rollup_reads, parse_bucket, merge_volumes, volume_count,
+                                search_peak_second, start_of_today)
+
+LATENCY_KEYS = [
+    "read_latency_avg_ms",
+    "read_latency_min_ms",
+    "read_latency_max_ms",
+    "read_latency_p50_ms",
+    "read_latency_p95_ms",
+    "read_latency_p99_ms",
+    "read_latency_sample_count",
+]
+# Per-tick samples kept in the history ring buffer: (key, label, value format)
+HISTORY_METRICS = [
+    ("throughput", "Throughput", "{:,.0f} msg/s"),
+    ("lag", "Group Lag", "{:,.0f}"),
+    ("pending", "Pending", "{:,.0f}"),
+    ("p99", "Read P99", "{:.3f} ms"),
+    ("stream_length", "Stream Length", "{:,.0f}"),
+    ("used_memory", "Used Memory", "{:,.1f} MB"),
+]
+
+
+def find_consumer_skew(group_name, consumers, ratio, min_pending):
+    """
+    Flag consumers that deviate strongly from their group's median: throughput below median/ratio
+    (slow or CPU-throttled pod) or pending above median*ratio (consumer hoarding a PEL). Impact is
+    the share of the group's throughput missing, or of its PEL held in excess.
+    """
+    flagged = []
+    rates = [c["rate"] for c in consumers if c.get("rate") is not None]
+    if len(rates) >= 2:
+        median_rate = float(np.median(rates))
+        group_rate = sum(rates)
+        for consumer in consumers:
+            rate = consumer.get("rate")
+            if median_rate >= 1 and rate is not None and rate < median_rate / ratio:
+                flagged.append({
+                    "group": group_name,
+                    "consumer": consumer["name"],
+                    "issue": "slow",
+                    "detail": f"{rate:,.1f} msg/s vs median {median_rate:,.1f}",
+                    "impact": (median_rate - rate) / group_rate
+                })
+
+    if len(consumers) >= 2:
+        pending = [c.get("pending", 0) for c in consumers]
+        median_pending = float(np.median(pending))
+        group_pending = sum(pending)
+        for consumer in consumers:
+            excess = consumer.get("pending", 0) - max(median_pending * ratio, min_pending)
+            if excess > 0:
+                flagged.append({
+                    "group": group_name,
+                    "consumer": consumer["name"],
+                    "issue": "hoarding",
+                    "detail": f"{consumer['pending']:,} pending vs median {median_pending:,.0f}",
+                    "impact": excess / group_pending
+                })
+    return flagged
+
+
+def parse_targets(spec: str):
+    """Parse "name=redis_url#stream,..." into (name, url, stream) tuples; name and #stream are optional"""
+    targets = []
+    for index, entry in enumerate(part.strip() for part in spec.split(",") if part.strip()):
+        name, target = None, entry
+        if "=" in entry and "://" not in entry.split("=", 1)[0]:
+            name, target = entry.split("=", 1)
+        url, _, stream = target.partition("#")
+        targets.append((name or f"target{index + 1}", url, stream or None))
+    return targets
+
+
+def _json_default(value):
+    """Encode the non-JSON values found in a snapshot (redis-py bytes, uptime)"""
+    if isinstance(value, bytes):
+        return value.decode(errors="replace")
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _entry_id(entry):
+    """Keep only the ID of a first/last stream entry: its fields aren't shown and have bytes keys"""
+    return [entry[0]] if entry and entry[0] else None
+
+
+def _parse_number(value, cast, default):
+    """Parse a counter value read from Redis, falling back to default when missing or malformed"""
+    try:
+        return cast(value) if value else default
+    except (ValueError, TypeError):
+        return default
+
 
 class PIXMonitor:
-    def __init__(self):
-        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
-        self.stream_name = os.getenv("REDIS_STREAM", "pix_payments")
+    def __init__(self, redis_url: Optional[str] = None, stream_name: Optional[str] = None, name: Optional[str] = None):
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+        self.stream_name = stream_name or os.getenv("REDIS_STREAM", "pix_payments")
+        self.name = name or self.stream_name
         self.group_name = os.getenv("GROUP_NAME", "pix_consumers")
         self.backend_response_prefix = os.getenv("BACKEND_RESPONSE_PREFIX", "backend_bacen_response_")
         
         self.redis_client = redis.from_url(self.redis_url)
         self.console = Console()
+        self.source_label = f"Redis: {self.redis_url} | Stream: {self.stream_name}"
         
         # Tracking variables
         self.start_time = datetime.now()
-        self.last_processed_count = 0
-        self.processing_rate = 0
+
+        # History of per-tick samples for the sparklines, and smoothed 1/5/15-minute processing rates
+        self.history_size = int(os.getenv("HISTORY_SIZE", 1800))  # Ticks kept (1800 = 15 minutes at 2 Hz)
+        self.sparkline_width = int(os.getenv("SPARKLINE_WIDTH", 60))  # Ticks drawn per sparkline
+        self.history = MetricHistory([key for key, _, _ in HISTORY_METRICS], self.history_size)
+        self.processing_rates = EwmaRate()
+        self.sparklines = {key: Sparkline(self.sparkline_width) for key, _, _ in HISTORY_METRICS}
+
+        # Per-consumer throughput from the stream consumers' processed counters, and skew thresholds.
+        # Only the stream transport's hash: list workers count into <key>:<list> and aren't group consumers
+        self.consumer_stats_key = os.getenv("CONSUMER_STATS_KEY", "consumer_processed_count")
+        self.skew_ratio = float(os.getenv("SKEW_RATIO", 2.0))  # Flag consumers this many times off the median
+        self.skew_min_pending = int(os.getenv("SKEW_MIN_PENDING", 100))  # Ignore PELs smaller than this
+        self.consumer_rates = {}  # consumer name -> EwmaRate
+
+        # Cached discovery state: groups seen on the last tick, response streams from the last SCAN pass
+        self.discovery_interval = float(os.getenv("DISCOVERY_INTERVAL", 10))  # Seconds between SCAN passes
+        self.scan_count = int(os.getenv("SCAN_COUNT", 1000))  # Keys examined per SCAN step
+        self.known_groups = []
+        self.backend_stream_names = []
+        self.scan_cursor = None  # None = no SCAN pass in progress
+        self.scan_found = set()
+        self.last_discovery = 0.0
+
+        # Per-backend volume from the consumers' rollups, and the busiest second of today (searched a step per tick)
+        self.rollup_window = float(os.getenv("ROLLUP_WINDOW", 600))  # Seconds of volume shown per backend
+        self.rollup_refresh = float(os.getenv("ROLLUP_REFRESH", 5))  # Seconds between reads of the window
+        self.peak_interval = float(os.getenv("ROLLUP_PEAK_INTERVAL", 60))  # Seconds between peak searches
+        self.rollup_volume = {}
+        self.last_rollup_read = 0.0
+        self.peak_search = None  # None = no search in progress
+        self.peak_buckets = []  # Buckets the search asked for next
+        self.peak_today = {}
+        self.last_peak_search = 0.0
         
-    def get_redis_info(self) -> Dict[str, Any]:
-        """Get various Redis metrics for monitoring"""
-        try:
-            # Test Redis connection first
-            self.redis_client.ping()
-            # Basic counters with proper error handling
-            try:
-                processed_count = self.redis_client.get("processed_count")
-                processed_count = int(processed_count) if processed_count else 0
-            except (ValueError, TypeError):
-                processed_count = 0
-            
-            try:
-                total_amount = self.redis_client.get("total_amount")
-                total_amount = float(total_amount) if total_amount else 0.0
-            except (ValueError, TypeError):
-                total_amount = 0.0
-            
-            # Stream info
-            try:
-                stream_info = self.redis_client.xinfo_stream(self.stream_name)
-                stream_length = stream_info.get("length", 0)
-                last_generated_id = stream_info.get("last-generated-id", "N/A")
-                first_entry = stream_info.get("first-entry", None)
-                last_entry = stream_info.get("last-entry", None)
-            except redis.exceptions.ResponseError:
-                stream_length = 0
-                last_generated_id = "N/A"
-                first_entry = None
-                last_entry = None
-            
-            # Consumer group info - enhanced with all groups
-            consumer_groups = {}
-            try:
-                groups_info = self.redis_client.xinfo_groups(self.stream_name)
-                for group in groups_info:
-                    group_name = group["name"].decode()
-                    consumer_groups[group_name] = {
-                        "pending": group.get("pending", 0),
-                        "last_delivered_id": group.get("last-delivered-id", b"N/A").decode(),
-                        "consumers": group.get("consumers", 0),
-                        "entries_read": group.get("entries-read", 0),
-                        "lag": group.get("lag", 0)
-                    }
-                    
-                    # Get individual consumer details for this group
-                    try:
-                        consumers = self.redis_client.xinfo_consumers(self.stream_name, group_name)
-                        consumer_groups[group_name]["consumer_details"] = []
-                        for consumer in consumers:
-                            consumer_groups[group_name]["consumer_details"].append({
-                                "name": consumer["name"].decode(),
-                                "pending": consumer.get("pending", 0),
-                                "idle": consumer.get("idle", 0)
-                            })
-                    except redis.exceptions.ResponseError:
-                        consumer_groups[group_name]["consumer_details"] = []
-                        
-            except redis.exceptions.ResponseError:
-                consumer_groups = {}
-            
-            # Calculate processing rate
-            current_time = time.time()
-            if hasattr(self, 'last_check_time'):
-                time_diff = current_time - self.last_check_time
-                count_diff = processed_count - self.last_processed_count
-                if time_diff > 0:
-                    self.processing_rate = count_diff / time_diff
-            
-            self.last_check_time = current_time
-            self.last_processed_count = processed_count
-            
-            # Backend response streams info - dynamic discovery
-            backend_streams = {}
-            try:
-                keys = self.redis_client.keys(f"{self.backend_response_prefix}*")
-                for key in keys:
-                    stream_name = key.decode()
-                    backend_id = stream_name.replace(self.backend_response_prefix, "")
-                    try:
-                        info = self.redis_client.xinfo_stream(stream_name)
-                        backend_streams[backend_id] = {
-                            "length": info.get("length", 0),
-                            "last_id": info.get("last-generated-id", "N/A"),
-                            "stream_name": stream_name
-                        }
-                    except redis.exceptions.ResponseError:
-                        backend_streams[backend_id] = {
-                            "length": 0,
-                            "last_id": "N/A",
-                            "stream_name": stream_name
-                        }
-            except Exception:
-                pass
-
-            # Read latency metrics
-            latency_metrics = {}
+    def _start_discovery_if_due(self) -> bool:
+        """Begin a new SCAN pass every discovery_interval seconds; True while a pass is in progress"""
+        if self.scan_cursor is None and time.time() - self.last_discovery >= self.discovery_interval:
+            self.scan_cursor = 0
+            self.scan_found = set()
+        return self.scan_cursor is not None
+
+    def _advance_discovery(self, scan_result) -> None:
+        """Fold one SCAN step into the pass; publish the cached stream list when the pass completes"""
+        if isinstance(scan_result, Exception):
+            self.scan_cursor = None
+            self.last_discovery = time.time()
+            return
+        cursor, keys = scan_result
+        self.scan_found.update(key.decode() for key in keys)
+        if cursor == 0:
+            self.backend_stream_names = sorted(self.scan_found)
+            self.scan_cursor = None
+            self.last_discovery = time.time()
+        else:
+            self.scan_cursor = cursor
+
+    def _queue_rollups(self, pipe):
+        """Queue this tick's rollup reads: the volume window when due, and the next step of the peak search"""
+        now = time.time()
+        window = []
+        if now - self.last_rollup_read >= self.rollup_refresh:
+            window = plan_buckets(now - self.rollup_window, now)
+            queue_rollup_reads(pipe, window)
+        if self.peak_search is None and now - self.last_peak_search >= self.peak_interval:
+            self.peak_search = search_peak_second(start_of_today(), now)
+            self.peak_buckets = next(self.peak_search)
+        peak = self.peak_buckets if self.peak_search is not None else []
+        queue_rollup_reads(pipe, peak)
+        return window, peak
+
+    def _advance_rollups(self, results, plan) -> None:
+        """Fold this tick's rollup replies into the cached window volume and the peak search"""
+        window, peak = plan
+        if window:
+            self.rollup_volume = merge_volumes(parse_bucket(next(results)) for _ in window)
+            self.last_rollup_read = time.time()
+        if peak:
+            volumes = [parse_bucket(next(results)) for _ in peak]
             try:
-                latency_avg = self.redis_client.get("read_latency_avg_ms")
-                latency_min = self.redis_client.get("read_latency_min_ms")
-                latency_max = self.redis_client.get("read_latency_max_ms")
-                latency_p50 = self.redis_client.get("read_latency_p50_ms")
-                latency_p95 = self.redis_client.get("read_latency_p95_ms")
-                latency_p99 = self.redis_client.get("read_latency_p99_ms")
-                latency_samples = self.redis_client.get("read_latency_sample_count")
-
-                latency_metrics = {
-                    "avg": float(latency_avg) if latency_avg else None,
-                    "min": float(latency_min) if latency_min else None,
-                    "max": float(latency_max) if latency_max else None,
-                    "p50": float(latency_p50) if latency_p50 else None,
-                    "p95": float(latency_p95) if latency_p95 else None,
-                    "p99": float(latency_p99) if latency_p99 else None,
-                    "samples": int(latency_samples) if latency_samples else 0
-                }
-            except (ValueError, TypeError):
-                latency_metrics = {}
-            
-            return {
-                "processed_count": processed_count,
-                "total_amount": total_amount,
-                "stream_length": stream_length,
-                "last_generated_id": last_generated_id,
-                "first_entry": first_entry,
-                "last_entry": last_entry,
-                "consumer_groups": consumer_groups,
-                "processing_rate": self.processing_rate,
-                "backend_streams": backend_streams,
-                "latency_metrics": latency_metrics,
-                "uptime": datetime.now() - self.start_time
+                self.peak_buckets = self.peak_search.send(volumes)
+            except StopIteration as done:
+                second, volume = done.value
+                self.peak_today = {"second": second, "volume": volume} if second is not None else {}
+                self.peak_search = None
+                self.last_peak_search = time.time()
+
+    def _queue_snapshot(self, pipe):
+        """Queue every read of this tick on pipe; consumer details use the groups seen on the previous tick"""
+        groups_to_query = list(self.known_groups)
+        streams_to_query = list(self.backend_stream_names)
+        discovering = self._start_discovery_if_due()
+
+        pipe.mget(LATENCY_KEYS)
+        queue_counter_reads(pipe)  # processed_count and total_amount, summed from their shards
+        pipe.info("memory")
+        pipe.hgetall(self.consumer_stats_key)
+        pipe.xinfo_stream(self.stream_name)
+        pipe.xinfo_groups(self.stream_name)
+        for group_name in groups_to_query:
+            pipe.xinfo_consumers(self.stream_name, group_name)
+        for stream_name in streams_to_query:
+            pipe.xinfo_stream(stream_name)
+        if discovering:
+            # Incremental SCAN instead of KEYS: one bounded step per tick, never blocks the server
+            pipe.scan(cursor=self.scan_cursor, match=f"{self.backend_response_prefix}*",
+                      count=self.scan_count, _type="stream")
+        rollups = self._queue_rollups(pipe)
+        return groups_to_query, streams_to_query, discovering, rollups
+
+    def _parse_snapshot(self, results, plan) -> Dict[str, Any]:
+        """Build the snapshot dict from the pipeline replies, in the order _queue_snapshot queued them"""
+        groups_to_query, streams_to_query, discovering, rollups = plan
+        results = iter(results)
+
+        # Basic counters and read latency metrics with proper error handling
+        values = next(results)
+        if isinstance(values, Exception):
+            values = [None] * len(LATENCY_KEYS)
+        latency = [_parse_number(value, float, None) for value in values]
+        counters = sum_counter_replies([next(results) for _ in range(len(COUNTERS) * counter_shards)])
+        processed_count = counters["processed_count"]
+        total_amount = counters["total_amount"]
+        latency_metrics = {
+            "avg": latency[0],
+            "min": latency[1],
+            "max": latency[2],
+            "p50": latency[3],
+            "p95": latency[4],
+            "p99": latency[5],
+            "samples": int(latency[6]) if latency[6] else 0
+        }
+
+        memory_info = next(results)
+        used_memory = None if isinstance(memory_info, Exception) else memory_info.get("used_memory")
+
+        consumer_counts = next(results)
+        if isinstance(consumer_counts, Exception):
+            consumer_counts = {}
+
+        # Stream info
+        stream_info = next(results)
+        if isinstance(stream_info, Exception):
+            stream_info = {}
+        stream_length = stream_info.get("length", 0)
+        last_generated_id = stream_info.get("last-generated-id", "N/A")
+        first_entry = stream_info.get("first-entry", None)
+        last_entry = stream_info.get("last-entry", None)
+
+        # Consumer group info - enhanced with all groups
+        consumer_groups = {}
+        groups_info = next(results)
+        if isinstance(groups_info, Exception):
+            groups_info = []
+        for group in groups_info:
+            group_name = group["name"].decode()
+            consumer_groups[group_name] = {
+                "pending": group.get("pending", 0),
+                "last_delivered_id": group.get("last-delivered-id", b"N/A").decode(),
+                "consumers": group.get("consumers", 0),
+                "entries_read": group.get("entries-read", 0),
+                "lag": group.get("lag", 0),
+                "consumer_details": []
             }
-            
-        except redis.exceptions.ConnectionError:
+        self.known_groups = list(consumer_groups)
+
+        # Individual consumer details for each group
+        for group_name in groups_to_query:
+            consumers = next(results)
+            if group_name not in consumer_groups or isinstance(consumers, Exception):
+                continue
+            for consumer in consumers:
+                consumer_groups[group_name]["consumer_details"].append({
+                    "name": consumer["name"].decode(),
+                    "pending": consumer.get("pending", 0),
+                    "idle": consumer.get("idle", 0),
+                    "processed": _parse_number(consumer_counts.get(consumer["name"]), int, None)
+                })
+
+        # Backend response streams info - from the cached SCAN discovery
+        backend_streams = {}
+        for stream_name in streams_to_query:
+            info = next(results)
+            backend_id = stream_name.replace(self.backend_response_prefix, "")
+            if isinstance(info, Exception):
+                info = {}
+            backend_streams[backend_id] = {
+                "length": info.get("length", 0),
+                "last_id": info.get("last-generated-id", "N/A"),
+                "stream_name": stream_name
+            }
+
+        if discovering:
+            self._advance_discovery(next(results))
+        self._advance_rollups(results, rollups)
+
+        data = {
+            "processed_count": processed_count,
+            "total_amount": total_amount,
+            "stream_length": stream_length,
+            "last_generated_id": last_generated_id,
+            "first_entry": first_entry,
+            "last_entry": last_entry,
+            "consumer_groups": consumer_groups,
+            "backend_streams": backend_streams,
+            "latency_metrics": latency_metrics,
+            "used_memory": used_memory,
+            "backend_volume": {"window": self.rollup_window, "backends": self.rollup_volume},
+            "peak_today": self.peak_today,
+            "uptime": datetime.now() - self.start_time
+        }
+        now = time.time()
+        data["timestamp"] = now
+        self.attribute_consumer_throughput(data, now)
+        self.record_history(data, now)
+        return data
+
+    @staticmethod
+    def _error_snapshot(error: Exception) -> Dict[str, Any]:
+        if isinstance(error, redis.exceptions.ConnectionError):
             return {"error": "Cannot connect to Redis server"}
-        except redis.exceptions.TimeoutError:
+        if isinstance(error, redis.exceptions.TimeoutError):
             return {"error": "Redis connection timeout"}
+        return {"error": f"Redis error: {str(error)}"}
+
+    def get_redis_info(self) -> Dict[str, Any]:
+        """Get various Redis metrics for monitoring, as one pipelined snapshot (a single round trip)"""
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            plan = self._queue_snapshot(pipe)
+            return self._parse_snapshot(pipe.execute(raise_on_error=False), plan)
         except Exception as e:
-            return {"error": f"Redis error: {str(e)}"}
-    
+            return self._error_snapshot(e)
+
+    async def get_redis_info_async(self, async_client) -> Dict[str, Any]:
+        """Same snapshot as get_redis_info, over a redis.asyncio client"""
+        try:
+            pipe = async_client.pipeline(transaction=False)
+            plan = self._queue_snapshot(pipe)
+            return self._parse_snapshot(await pipe.execute(raise_on_error=False), plan)
+        except Exception as e:
+            return self._error_snapshot(e)
+
+    def attribute_consumer_throughput(self, data: Dict[str, Any], timestamp: float) -> None:
+        """Turn successive per-consumer processed counts into rates, and flag consumers skewed from their group"""
+        seen = set()
+        skew = []
+        for group_name, group_info in data["consumer_groups"].items():
+            consumers = group_info["consumer_details"]
+            for consumer in consumers:
+                name = consumer["name"]
+                seen.add(name)
+                consumer["rate"] = None
+                if consumer["processed"] is None:
+                    continue
+                rate = self.consumer_rates.setdefault(name, EwmaRate((30,)))
+                consumer["rate"] = rate.update(timestamp, consumer["processed"])[0]
+            skew.extend(find_consumer_skew(group_name, consumers, self.skew_ratio, self.skew_min_pending))
+
+        # Forget consumers that left their groups, so restarts don't accumulate state
+        for name in set(self.consumer_rates) - seen:
+            del self.consumer_rates[name]
+        data["consumer_skew"] = sorted(skew, key=lambda entry: entry["impact"], reverse=True)
+
+    def record_history(self, data: Dict[str, Any], timestamp: float) -> None:
+        """Update the smoothed processing rates and append this tick's sample to the history"""
+        rate_1m, rate_5m, rate_15m = self.processing_rates.update(timestamp, data["processed_count"])
+        data["processing_rate"] = rate_1m or 0.0
+        data["processing_rates"] = {"1m": rate_1m or 0.0, "5m": rate_5m or 0.0, "15m": rate_15m or 0.0}
+
+        main_group = data["consumer_groups"].get(self.group_name, {})
+        used_memory = data.get("used_memory")
+        self.history.append(timestamp, {
+            "throughput": self.processing_rates.instant,
+            "lag": main_group.get("lag"),
+            "pending": main_group.get("pending"),
+            "p99": data["latency_metrics"].get("p99"),
+            "stream_length": data["stream_length"],
+            "used_memory": used_memory / 1024 / 1024 if used_memory is not None else None,
+        })
+
     def create_header_panel(self) -> Panel:
         """Create header panel with title and connection info"""
         title = Text("PIX Payment System Monitor", style="bold magenta")
-        subtitle = Text(f"Redis: {self.redis_url} | Stream: {self.stream_name}", style="dim")
+        subtitle = Text(self.source_label, style="dim")
         header_content = Align.center(Text.assemble(title, "\n", subtitle))
         return Panel(header_content, style="blue")
     
@@ -187,7 +432,9 @@ class PIXMonitor:
         
         table.add_row("Messages Processed", f"{data.get('processed_count', 0):,}")
         table.add_row("Total Amount", f"BRL {data.get('total_amount', 0.0):,.2f}")
-        table.add_row("Processing Rate", f"{data.get('processing_rate', 0.0):.1f} msg/sec")
+        rates = data.get('processing_rates', {})
+        table.add_row("Processing Rate", f"{data.get('processing_rate', 0.0):.1f} msg/sec (1m avg)")
+        table.add_row("5m / 15m Avg", f"{rates.get('5m', 0.0):.1f} / {rates.get('15m', 0.0):.1f} msg/sec")
         table.add_row("Uptime", str(data.get('uptime', 'N/A')).split('.')[0])
         
         # Consumer group summary info
@@ -251,6 +498,48 @@ class PIXMonitor:
         
         return Panel(table, title="Backend Response Streams", style="magenta")
     
+    def create_volume_panel(self, data: Dict[str, Any]) -> Panel:
+        """Create panel showing processed volume per backend over the rollup window, and today's peak second"""
+        if "error" in data:
+            return Panel(f"Error: {data['error']}", title="Backend Volume", style="red")
+
+        backend_volume = data.get('backend_volume', {})
+        window = backend_volume.get('window', self.rollup_window)
+        backends = backend_volume.get('backends', {})
+        title = f"Backend Volume (last {window / 60:g}m)"
+        if not backends:
+            return Panel("No rollups in this window", title=title, style="dim")
+
+        table = Table(show_header=True, box=None)
+        table.add_column("Backend ID", style="cyan")
+        table.add_column("Messages", style="green", justify="right")
+        table.add_column("BRL", style="yellow", justify="right")
+        table.add_column("Rate", style="magenta", justify="right")
+        table.add_column("Share", style="bold", justify="right")
+
+        total = sum(entry['count'] for entry in backends.values()) or 1
+        for backend_id, entry in sorted(backends.items(), key=lambda item: item[1]['count'], reverse=True):
+            table.add_row(
+                str(backend_id) or "(none)",
+                f"{entry['count']:,}",
+                f"{entry['centavos'] / 100:,.2f}",
+                f"{entry['count'] / window:,.1f}/s",
+                f"{entry['count'] / total:.0%}"
+            )
+
+        peak = data.get('peak_today', {})
+        if peak:
+            volume = peak['volume']
+            table.add_row("", "", "", "", "")  # Spacer
+            table.add_row(
+                f"Peak second today {datetime.fromtimestamp(peak['second']):%H:%M:%S}",
+                f"{volume_count(volume):,}",
+                f"{sum(entry['centavos'] for entry in volume.values()) / 100:,.2f}",
+                "", ""
+            )
+
+        return Panel(table, title=title, style="bright_magenta")
+
     def create_latency_panel(self, data: Dict[str, Any]) -> Panel:
         """Create panel showing Redis read latency metrics"""
         if "error" in data:
@@ -323,29 +612,94 @@ class PIXMonitor:
         table.add_column("Consumers", style="green")
         table.add_column("Lag", style="red")
         table.add_column("Entries Read", style="blue")
+        table.add_column("Rate", style="magenta")
         
         for group_name, group_info in consumer_groups.items():
+            details = group_info.get('consumer_details', [])
+            rates = [consumer['rate'] for consumer in details if consumer.get('rate') is not None]
             table.add_row(
                 group_name,
                 str(group_info.get('pending', 0)),
                 str(group_info.get('consumers', 0)),
                 str(group_info.get('lag', 0)),
-                str(group_info.get('entries_read', 0))
+                str(group_info.get('entries_read', 0)),
+                f"{sum(rates):,.1f}/s" if rates else ""
             )
             
             # Add consumer details as sub-rows
-            for consumer in group_info.get('consumer_details', []):
+            for consumer in details:
                 idle_time = consumer.get('idle', 0) / 1000  # Convert to seconds
+                rate = consumer.get('rate')
                 table.add_row(
                     f"  └─ {consumer.get('name', 'Unknown')}",
                     str(consumer.get('pending', 0)),
                     f"{idle_time:.1f}s idle",
                     "",
-                    ""
+                    "",
+                    f"{rate:,.1f}/s" if rate is not None else "N/A"
                 )
         
         return Panel(table, title="Consumer Groups Detail", style="blue")
     
+    def create_skew_panel(self, data: Dict[str, Any]) -> Panel:
+        """Create panel listing consumers skewed from their group's median, by impact"""
+        if "error" in data:
+            return Panel(f"Error: {data['error']}", title="Consumer Skew", style="red")
+
+        skew = data.get('consumer_skew', [])
+        if not skew:
+            return Panel("No skewed consumers", title="Consumer Skew", style="dim")
+
+        table = Table(show_header=True, box=None)
+        table.add_column("Consumer", style="cyan")
+        table.add_column("Issue", style="red")
+        table.add_column("Detail", style="yellow")
+        table.add_column("Impact", style="bold", justify="right")
+
+        for entry in skew:
+            table.add_row(
+                f"{entry['group']}/{entry['consumer']}",
+                entry['issue'],
+                entry['detail'],
+                f"{entry['impact']:.0%}"
+            )
+
+        return Panel(table, title=f"Consumer Skew ({len(skew)} flagged)", style="red")
+
+    def create_history_panel(self, data: Dict[str, Any]) -> Panel:
+        """Create panel with a sparkline per metric over the last sparkline_width ticks"""
+        if "error" in data:
+            return Panel(f"Error: {data['error']}", title="History", style="red")
+        if not len(self.history):
+            return Panel("No history yet", title="History", style="dim")
+
+        table = Table(show_header=True, box=None, padding=(0, 1))
+        table.add_column("Metric", style="cyan")
+        table.add_column("Trend", style="bright_green", no_wrap=True)
+        table.add_column("Now", style="bold", justify="right")
+        table.add_column("Min", style="dim", justify="right")
+        table.add_column("Max", style="dim", justify="right")
+
+        for key, label, value_format in HISTORY_METRICS:
+            window = self.history.series(key, self.sparkline_width)
+            sparkline = self.sparklines[key].update(window, self.history.total)
+            finite = window[~np.isnan(window)]
+            if not len(finite):
+                table.add_row(label, sparkline, "N/A", "", "")
+                continue
+            latest = self.history.latest(key)
+            table.add_row(
+                label,
+                sparkline,
+                value_format.format(latest) if latest is not None else "N/A",
+                value_format.format(finite.min()),
+                value_format.format(finite.max())
+            )
+
+        seconds = self.history.times(self.sparkline_width)
+        span = seconds[-1] - seconds[0] if len(seconds) > 1 else 0
+        return Panel(table, title=f"History (last {span:.0f}s)", style="bright_blue")
+
     def create_layout(self, data: Dict[str, Any]) -> Layout:
         """Create the main layout"""
         layout = Layout()
@@ -353,6 +707,7 @@ class PIXMonitor:
         layout.split_column(
             Layout(name="header", size=3),
             Layout(name="main", ratio=1),
+            Layout(name="history", size=len(HISTORY_METRICS) + 3),
         )
 
         layout["main"].split_row(
@@ -367,7 +722,9 @@ class PIXMonitor:
         )
 
         layout["right"].split_column(
-            Layout(name="consumer_groups", ratio=1),
+            Layout(name="consumer_groups", ratio=2),
+            Layout(name="consumer_skew", ratio=1),
+            Layout(name="backend_volume", ratio=2),
             Layout(name="backend_streams", ratio=1),
         )
 
@@ -376,10 +733,77 @@ class PIXMonitor:
         layout["latency"].update(self.create_latency_panel(data))
         layout["stream"].update(self.create_stream_panel(data))
         layout["consumer_groups"].update(self.create_consumer_groups_panel(data))
+        layout["consumer_skew"].update(self.create_skew_panel(data))
+        layout["backend_volume"].update(self.create_volume_panel(data))
         layout["backend_streams"].update(self.create_backend_panel(data))
+        layout["history"].update(self.create_history_panel(data))
 
         return layout
     
+    def record(self, output_file: str, interval: float, flush_interval: float = 10.0):
+        """Headless mode: append one JSON line per snapshot to a gzip file, without drawing anything"""
+        self.console.print(f"[bold green]Recording snapshots every {interval}s to {output_file}[/bold green]")
+        self.console.print("[dim]Press Ctrl+C to stop[/dim]")
+        snapshots = 0
+        # Append mode adds a new gzip member per run, and readers see the members as one stream. Flushing
+        # only every flush_interval keeps compression effective; a crash loses at most that much.
+        with gzip.open(output_file, "at", encoding="utf-8") as output:
+            last_flush = time.time()
+            try:
+                while True:
+                    started = time.time()
+                    data = self.get_redis_info()
+                    data.setdefault("timestamp", started)
+                    if "first_entry" in data:
+                        data["first_entry"] = _entry_id(data["first_entry"])
+                        data["last_entry"] = _entry_id(data["last_entry"])
+                    output.write(json.dumps(data, default=_json_default, separators=(",", ":")) + "\n")
+                    snapshots += 1
+
+                    if started - last_flush >= flush_interval:
+                        output.flush()
+                        last_flush = started
+                    time.sleep(max(interval - (time.time() - started), 0))
+            except KeyboardInterrupt:
+                self.console.print(f"\n[bold yellow]Recorded {snapshots:,} snapshots to {output_file}[/bold yellow]")
+
+    def read_recording(self, input_file: str):
+        """Yield the snapshots of a recording, stopping cleanly at a tail truncated by a crash"""
+        with gzip.open(input_file, "rt", encoding="utf-8") as recording:
+            try:
+                for line in recording:
+                    try:
+                        data = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # partial last line
+                    if "uptime" in data:
+                        data["uptime"] = timedelta(seconds=data["uptime"])
+                    yield data
+            except (EOFError, zlib.error, gzip.BadGzipFile):
+                return
+
+    def replay(self, input_file: str, speed: float):
+        """Render a recording through the same panels, speed times faster than it was recorded"""
+        self.source_label = f"Replay: {input_file} | {speed:g}x"
+        snapshots = 0
+        try:
+            with Live(self.create_layout({"error": "Loading recording..."}), refresh_per_second=4, screen=True) as live:
+                previous = None
+                for data in self.read_recording(input_file):
+                    timestamp = data["timestamp"]
+                    if previous is not None:
+                        time.sleep(max(timestamp - previous, 0) / speed)
+                    previous = timestamp
+                    if "error" not in data:
+                        # Rebuild rates, skew and history from the recorded times, as they were live
+                        self.attribute_consumer_throughput(data, timestamp)
+                        self.record_history(data, timestamp)
+                    live.update(self.create_layout(data))
+                    snapshots += 1
+        except KeyboardInterrupt:
+            pass
+        self.console.print(f"[bold yellow]Replayed {snapshots:,} snapshots from {input_file}[/bold yellow]")
+
     def run(self):
         """Run the monitoring interface"""
         self.console.print("[bold green]Starting PIX Monitor TUI...")
@@ -406,6 +830,207 @@ class PIXMonitor:
             self.console.print(f"\n[bold red]Error: {e}[/bold red]")
 
 
+class MultiTargetMonitor:
+    """
+    Monitors several Redis targets (e.g. primary and DR, or several streams) from one screen.
+
+    Every tick the snapshot of each target is collected concurrently with redis.asyncio, and the
+    screen is redrawn once the tick budget has elapsed even if some targets haven't answered. A
+    slow or dead target keeps its single collection in flight (no pile-up) and shows as stale
+    with its last snapshot, while the others keep refreshing.
+    """
+
+    def __init__(self, targets, tick_interval: float = 0.5):
+        self.monitors = [PIXMonitor(url, stream, name) for name, url, stream in targets]
+        self.console = Console()
+        self.tick_interval = tick_interval
+        self.tick_budget = float(os.getenv("TICK_BUDGET", tick_interval * 0.8))  # Seconds to wait for targets per tick
+        self.target_timeout = float(os.getenv("TARGET_TIMEOUT", 5))  # Socket timeout per target
+        self.snapshots = [{"error": "Connecting..."} for _ in self.monitors]
+        self.collected_at = [None] * len(self.monitors)
+        self.tasks = [None] * len(self.monitors)
+        self.selected = 0  # 0 = overview, N = drill down into target N
+        self.trends = [Sparkline(30) for _ in self.monitors]
+
+        for index, monitor in enumerate(self.monitors, 1):
+            monitor.source_label = (f"[{index}/{len(self.monitors)}] {monitor.name} | Redis: {monitor.redis_url} | "
+                                    f"Stream: {monitor.stream_name} | 0 = overview")
+
+    async def _collect(self, index: int, client) -> None:
+        self.snapshots[index] = await self.monitors[index].get_redis_info_async(client)
+        self.collected_at[index] = time.time()
+
+    async def tick(self, clients) -> None:
+        """Start a collection for every target that has none in flight, then wait at most tick_budget"""
+        for index, task in enumerate(self.tasks):
+            if task is None or task.done():
+                self.tasks[index] = asyncio.create_task(self._collect(index, clients[index]))
+        in_flight = [task for task in self.tasks if not task.done()]
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=self.tick_budget)
+
+    def _on_key(self) -> None:
+        key = sys.stdin.read(1)
+        if key.isdigit() and int(key) <= len(self.monitors):
+            self.selected = int(key)
+        elif key in ("n", "\t"):
+            self.selected = (self.selected + 1) % (len(self.monitors) + 1)
+        elif key == "p":
+            self.selected = (self.selected - 1) % (len(self.monitors) + 1)
+
+    def _status(self, index: int) -> str:
+        snapshot = self.snapshots[index]
+        age = time.time() - self.collected_at[index] if self.collected_at[index] else None
+        if age is not None and age > self.tick_interval * 3:
+            return f"[yellow]stale {age:.0f}s[/yellow]"
+        if "error" in snapshot:
+            return f"[red]{snapshot['error']}[/red]"
+        return "[green]ok[/green]"
+
+    def create_overview_panel(self) -> Panel:
+        """Create panel with one row per target plus totals"""
+        table = Table(show_header=True, box=None, padding=(0, 1))
+        table.add_column("#", style="dim")
+        table.add_column("Target", style="cyan")
+        table.add_column("Stream", style="cyan")
+        table.add_column("Status")
+        table.add_column("Processed", justify="right", style="green")
+        table.add_column("Rate (1m)", justify="right", style="green")
+        table.add_column("Trend", style="bright_green", no_wrap=True)
+        table.add_column("Stream Len", justify="right", style="yellow")
+        table.add_column("Lag", justify="right", style="red")
+        table.add_column("Pending", justify="right", style="yellow")
+        table.add_column("P99", justify="right")
+        table.add_column("Memory", justify="right", style="dim")
+
+        totals = {"processed": 0, "rate": 0.0, "stream_length": 0, "lag": 0, "pending": 0}
+        for index, monitor in enumerate(self.monitors):
+            snapshot = self.snapshots[index]
+            if "error" in snapshot:
+                table.add_row(str(index + 1), monitor.name, monitor.stream_name, self._status(index),
+                              "", "", "", "", "", "", "", "")
+                continue
+
+            main_group = snapshot.get("consumer_groups", {}).get(monitor.group_name, {})
+            p99 = snapshot.get("latency_metrics", {}).get("p99")
+            used_memory = snapshot.get("used_memory")
+            totals["processed"] += snapshot["processed_count"]
+            totals["rate"] += snapshot["processing_rate"]
+            totals["stream_length"] += snapshot["stream_length"]
+            totals["lag"] += main_group.get("lag") or 0
+            totals["pending"] += main_group.get("pending", 0)
+            table.add_row(
+                str(index + 1),
+                monitor.name,
+                monitor.stream_name,
+                self._status(index),
+                f"{snapshot['processed_count']:,}",
+                f"{snapshot['processing_rate']:,.1f}/s",
+                self.trends[index].update(monitor.history.series("throughput", self.trends[index].width),
+                                          monitor.history.total),
+                f"{snapshot['stream_length']:,}",
+                f"{main_group.get('lag') or 0:,}",
+                f"{main_group.get('pending', 0):,}",
+                f"{p99:.3f} ms" if p99 is not None else "N/A",
+                f"{used_memory / 1024 / 1024:,.1f} MB" if used_memory is not None else "N/A"
+            )
+
+        table.add_row("", "", "", "", "", "", "", "", "", "", "", "")
+        table.add_row(
+            "", "[bold]Total[/bold]", "", "",
+            f"[bold]{totals['processed']:,}[/bold]",
+            f"[bold]{totals['rate']:,.1f}/s[/bold]",
+            "",
+            f"[bold]{totals['stream_length']:,}[/bold]",
+            f"[bold]{totals['lag']:,}[/bold]",
+            f"[bold]{totals['pending']:,}[/bold]",
+            "", ""
+        )
+        return Panel(table, title=f"Targets ({len(self.monitors)}) - press 1-{len(self.monitors)} to drill down",
+                     style="blue")
+
+    def create_layout(self) -> Layout:
+        if self.selected:
+            index = self.selected - 1
+            return self.monitors[index].create_layout(self.snapshots[index])
+
+        layout = Layout()
+        layout.split_column(
+            Layout(name="header", size=3),
+            Layout(name="overview", ratio=1),
+        )
+        title = Text("PIX Payment System Monitor", style="bold magenta")
+        subtitle = Text(f"{len(self.monitors)} targets | 1-9 = drill down, n/p = next/previous, 0 = overview",
+                        style="dim")
+        layout["header"].update(Panel(Align.center(Text.assemble(title, "\n", subtitle)), style="blue"))
+        layout["overview"].update(self.create_overview_panel())
+        return layout
+
+    async def run_async(self):
+        loop = asyncio.get_running_loop()
+        clients = [redis.asyncio.from_url(monitor.redis_url, socket_connect_timeout=self.target_timeout,
+                                          socket_timeout=self.target_timeout)
+                   for monitor in self.monitors]
+
+        # Single-key navigation without Enter, where the terminal supports it
+        terminal_settings = None
+        try:
+            import termios
+            import tty
+            if sys.stdin.isatty():
+                terminal_settings = termios.tcgetattr(sys.stdin)
+                tty.setcbreak(sys.stdin)
+                loop.add_reader(sys.stdin, self._on_key)
+        except ImportError:
+            pass
+
+        try:
+            with Live(self.create_layout(), refresh_per_second=2, screen=True) as live:
+                while True:
+                    started = loop.time()
+                    await self.tick(clients)
+                    live.update(self.create_layout())
+                    await asyncio.sleep(max(self.tick_interval - (loop.time() - started), 0))
+        finally:
+            if terminal_settings is not None:
+                loop.remove_reader(sys.stdin)
+                termios.tcsetattr(sys.stdin, termios.TCSADRAIN, terminal_settings)
+            for task in self.tasks:
+                if task:
+                    task.cancel()
+            for client in clients:
+                await client.aclose()
+
+    def run(self):
+        """Run the multi-target monitoring interface"""
+        self.console.print(f"[bold green]Starting PIX Monitor TUI for {len(self.monitors)} targets...")
+        self.console.print("[dim]Press Ctrl+C to exit[/dim]")
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            self.console.print("\n[bold yellow]Monitor stopped by user[/bold yellow]")
+
+
 if __name__ == "__main__":
-    monitor = PIXMonitor()
-    monitor.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="PIX payment system monitor")
+    parser.add_argument("--targets", default=os.getenv("TARGETS"),
+                        help='Monitor several targets: "name=redis://host:6379#stream,..." (live TUI only)')
+    parser.add_argument("--headless", action="store_true",
+                        help="Record snapshots to a gzip NDJSON file instead of drawing the TUI")
+    parser.add_argument("--output", default=os.getenv("RECORD_FILE", "pix_monitor_snapshots.ndjson.gz"),
+                        help="Recording file for --headless (appended to)")
+    parser.add_argument("--interval", type=float, default=float(os.getenv("RECORD_INTERVAL", 1.0)),
+                        help="Seconds between recorded snapshots")
+    parser.add_argument("--replay", metavar="FILE", help="Replay a recording through the TUI panels")
+    parser.add_argument("--speed", type=float, default=float(os.getenv("REPLAY_SPEED", 10.0)),
+                        help="Replay speed multiplier")
+    args = parser.parse_args()
+
+    if args.replay:
+        PIXMonitor().replay(args.replay, args.speed)
+    elif args.headless:
+        PIXMonitor().record(args.output, args.interval)
+    elif args.targets:
+        MultiTargetMonitor(parse_targets(args.targets)).run()
+    else:
+        PIXMonitor().run()
\ No newline at end of file
@@ -1,11 +1,19 @@
 import os
+import json
+import math
+import queue
 import random
 import redis
 import time
 import socket
+import threading
+import zlib
 from datetime import datetime
 from collections import deque
 
+from utils.util_progress import publish_progress, queue_progress
+from utils.util_sharded_counters import counter_shard, fold_counters, queue_counters
+
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 stream_name = os.getenv("REDIS_STREAM", "pix_payments")  # Stream name for PIX payments
@@ -14,13 +22,101 @@ consumer_name = f"consumer_{socket.gethostname()}_{random.randint(1000, 9999)}"
 idle_threshold_ms = int(os.getenv("IDLE_THRESHOLD_MS", 5000))  # Idle threshold for claiming messages (default 5s)
 backend_response_prefix = os.getenv("BACKEND_RESPONSE_PREFIX",
                                     "backend_bacen_response_")  # Prefix for backend response streams
-
-# Initialize Redis connection
-redis_client = redis.from_url(redis_url)
-
-# Latency tracking - keep last 1000 read latencies for statistics
-latency_buffer = deque(maxlen=1000)
+consumer_stats_key = os.getenv("CONSUMER_STATS_KEY", "consumer_processed_count")  # Hash of messages processed per stream consumer; list workers count into <key>:<list>
+consumer_prune_interval = float(os.getenv("CONSUMER_PRUNE_INTERVAL", 60))  # Seconds between sweeps for gone consumers
+consumer_retire_ms = int(os.getenv("CONSUMER_RETIRE_MS", 600000))  # Idle time after which an empty consumer is gone
+rollup_prefix = os.getenv("ROLLUP_PREFIX", "pix_rollup")  # Per-second and per-minute volume buckets
+rollup_ttls = {"1s": int(os.getenv("ROLLUP_SECOND_TTL", 86400)),  # Keep per-second buckets a day
+               "1m": int(os.getenv("ROLLUP_MINUTE_TTL", 7 * 86400))}  # and per-minute buckets a week
+status_prefix = os.getenv("STATUS_PREFIX", "pix_status")  # Transaction status index
+status_buckets = int(os.getenv("STATUS_BUCKETS", 4096))  # Index hashes per generation; ~daily volume / 100 keeps them small
+status_ttl = int(os.getenv("STATUS_TTL", 86400))  # Seconds a status stays findable, at least
+transport_name = os.getenv("TRANSPORT", "stream")  # stream | list | memory: where batches come from (see below)
+source_list = f"{os.getenv('REDIS_LIST', 'source_list')}_{int(os.getenv('LIST_INDEX', 0))}"  # List transport source
+heartbeat_ttl_ms = int(os.getenv("HEARTBEAT_TTL_MS", 10000))  # List transport: a worker silent this long is dead
+memory_messages = int(os.getenv("MEMORY_MESSAGES", 1000000))  # Memory transport: payments generated and processed
+
+
+def read_cgroup_limits():
+    """
+    CPU and memory available to this container: (cpus, cpu source, memory bytes, memory source).
+    cgroup v2 first (cpu.max, memory.max), then cgroup v1, then the host's CPU count and RAM.
+    """
+    cpus, cpu_source = None, None
+    memory, memory_source = None, None
+    try:
+        quota, period = open("/sys/fs/cgroup/cpu.max").read().split()
+        if quota != "max":
+            cpus, cpu_source = int(quota) / int(period), "cgroup v2"
+    except (OSError, ValueError):
+        try:
+            quota = int(open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read())
+            period = int(open("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read())
+            if quota > 0:
+                cpus, cpu_source = quota / period, "cgroup v1"
+        except (OSError, ValueError):
+            pass
+    try:
+        limit = open("/sys/fs/cgroup/memory.max").read().strip()
+        if limit != "max":
+            memory, memory_source = int(limit), "cgroup v2"
+    except (OSError, ValueError):
+        try:
+            limit = int(open("/sys/fs/cgroup/memory/memory.limit_in_bytes").read())
+            if limit < 1 << 60:  # v1 reports "unlimited" as a huge number
+                memory, memory_source = limit, "cgroup v1"
+        except (OSError, ValueError):
+            pass
+
+    if cpus is None:
+        cpus, cpu_source = float(len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity")
+                                 else os.cpu_count() or 1), "host"
+    if memory is None:
+        memory, memory_source = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"), "host"
+    return cpus, cpu_source, memory, memory_source
+
+
+def derive_profile(cpus, memory):
+    """
+    Consumer settings for the available CPU and memory. The consumer is I/O-bound, so it runs two
+    workers per CPU; throttled pods read smaller batches so one batch fits in a CFS period; read-ahead
+    only pays off when a spare CPU can process while the next read is in flight; the pool holds one
+    connection per worker and reader plus one spare. Read-ahead batches are capped to 10% of memory.
+    """
+    workers = min(max(math.ceil(cpus * 2), 1), 32)
+    read_count = min(max(int(200 * cpus), 10), 500)
+    prefetch_depth = 2 if cpus >= 1 else 0
+    message_bytes = 2048  # A decoded message with its pipeline replies, generously
+    read_count = max(min(read_count, int(memory * 0.1 / (message_bytes * workers * (prefetch_depth + 1)))), 1)
+    profile = {
+        "workers": workers,
+        "read_count": read_count,
+        "prefetch_depth": prefetch_depth,
+        "latency_samples": 10000 if memory >= 256 * 1024 * 1024 else 1000,
+    }
+    # Environment overrides win over the derived values
+    overrides = {"workers": "CONSUMER_WORKERS", "read_count": "READ_COUNT", "prefetch_depth": "PREFETCH_DEPTH",
+                 "latency_samples": "LATENCY_SAMPLES"}
+    for key, env_name in overrides.items():
+        if os.getenv(env_name):
+            profile[key] = int(os.getenv(env_name))
+    # Sized for the final worker and reader count
+    profile["pool_size"] = int(os.getenv("POOL_SIZE") or
+                               profile["workers"] * (2 if profile["prefetch_depth"] else 1) + 1)
+    return profile
+
+
+cpu_limit, cpu_source, memory_limit, memory_source = read_cgroup_limits()
+profile = derive_profile(cpu_limit, memory_limit)
+
+# Initialize Redis connection; workers wait for a free connection instead of failing
+redis_client = redis.Redis(connection_pool=redis.BlockingConnectionPool.from_url(
+    redis_url, max_connections=profile["pool_size"]))
+
+# Latency tracking - keep the last latency_samples read latencies for statistics
+latency_buffer = deque(maxlen=profile["latency_samples"])
 latency_update_counter = 0
+latency_lock = threading.Lock()
 LATENCY_UPDATE_INTERVAL = 10  # Update Redis stats every N reads
 
 
@@ -72,93 +168,455 @@ def update_latency_stats():
     pipeline.execute()
 
 
-# Process messages from the stream
-def process_messages():
-    print(f"Starting consumer {consumer_name} for stream: {stream_name}...")
-    initialize_consumer_group()
+progress_waiting = False  # An injector was waiting at the last commit: count progress in the commit pipeline
+
+
+def queue_rollups(pipeline, volume, timestamp):
+    """
+    Queue one batch's per-backend volume ({backend: [count, centavos]}) into the second and minute buckets
+    of timestamp (see utils/util_rollups.py): one HINCRBY per field per bucket, and a refreshed TTL per bucket.
+    """
+    for resolution, bucket in (("1s", int(timestamp)), ("1m", int(timestamp) // 60 * 60)):
+        key = f"{rollup_prefix}:{resolution}:{bucket}"
+        for backend_id, (count, centavos) in volume.items():
+            pipeline.hincrby(key, f"{backend_id}:count", count)
+            pipeline.hincrby(key, f"{backend_id}:centavos", centavos)
+        pipeline.expire(key, rollup_ttls[resolution])
+
+
+status_generation = None
+status_expiring = set()  # Index hashes of status_generation this process committed an expiry on
+
+
+def queue_status(pipeline, expiring, transaction_id, status, backend_id, message_id, timestamp):
+    """
+    Queue the status index entry of one transaction (see utils/util_status_index.py): an HSET into its
+    bucket of the current generation, plus the bucket's expiry until a committed batch has set it. The
+    buckets given an expiry are added to expiring, for commit_batch to mark once the batch is committed.
+    """
+    global status_generation
+    generation = int(timestamp) // status_ttl
+    if generation != status_generation:
+        status_generation = generation
+        status_expiring.clear()
+    key = f"{status_prefix}:{generation}:{zlib.crc32(transaction_id.encode()) % status_buckets}"
+    pipeline.hset(key, transaction_id, f"{status}|{backend_id}|{message_id}|{int(timestamp * 1000)}")
+    if key not in status_expiring and key not in expiring:
+        # Kept until the end of the next generation, so lookups only need to check two generations
+        pipeline.expireat(key, (generation + 2) * status_ttl)
+        expiring.add(key)
+
+
+def prune_consumer_stats(idle_ms=consumer_retire_ms):
+    """
+    Forget consumers that are gone. Consumer names are random per process and worker, so otherwise the
+    group and the transport's stats_key (read with HGETALL every monitor tick) gain entries on every restart.
+    The transport retires its consumers idle for idle_ms with nothing pending; the stats fields of
+    consumers it no longer knows are deleted. Each transport has its own stats_key, as it only knows its own consumers. Returns the number of fields deleted.
+    """
+    live = transport.retire_consumers(idle_ms)
+    if live is None:
+        return 0  # The transport can't tell which consumers are gone
+    gone = [name for name in redis_client.hkeys(transport.stats_key) if name not in live]
+    if gone:
+        redis_client.hdel(transport.stats_key, *gone)
+    return len(gone)
+
+
+def prune_consumers():
+    """Every consumer_prune_interval seconds, prune_consumer_stats; the lock only keeps every replica from doing the same work"""
+    while True:
+        time.sleep(consumer_prune_interval)
+        try:
+            if redis_client.set(transport.prune_lock_key, consumer_name, nx=True, px=int(consumer_prune_interval * 1000)):
+                pruned = prune_consumer_stats()
+                if pruned:
+                    print(f"Removed the processed counts of {pruned} consumers that are gone")
+        except redis.exceptions.RedisError as e:
+            print(f"Consumer prune failed: {e}")
 
-    # Progress tracking
-    messages_processed = 0
-    last_report_time = time.time()
-    report_interval = 5  # Report every 5 seconds
 
-    while True:
-        global latency_update_counter
+def record_read_latency(read_latency_ms):
+    """Add one read latency to the buffer; every LATENCY_UPDATE_INTERVAL reads, publish the statistics"""
+    global latency_update_counter
 
-        try:
-            # Measure XREADGROUP latency
-            start_time = time.perf_counter()
-            messages = redis_client.xreadgroup(
-                groupname=group_name,
-                consumername=consumer_name,
-                streams={stream_name: '>'},
-                count=100,  # Read up to 100 messages at once for better throughput
-                block=5000  # Block for 5 seconds if no new messages
-            )
-            end_time = time.perf_counter()
+    latency_buffer.append(read_latency_ms)
+    with latency_lock:
+        latency_update_counter += 1
+        update_due = latency_update_counter >= LATENCY_UPDATE_INTERVAL
+        if update_due:
+            latency_update_counter = 0
+    if update_due:
+        update_latency_stats()
+
+
+# Transports: where a worker's batches come from and how they are acknowledged. Each one reads a batch
+# of (message_id, message) entries shaped like XREADGROUP's, turns a message into its fields, commits a
+# batch (executes the pipeline the consumer core queued, then acknowledges its entries), dead-letters
+# a message that can't be processed and claims pending entries of dead workers. process_batch, the
+# consumer core, is the same for all of them.
+#
+#   stream  XREADGROUP + XACK on the consumer group, XAUTOCLAIM for stalled entries (default)
+#   list    BLMOVE from source_list into a per-worker processing list, LREM once committed; the
+#           processing lists of workers whose heartbeat expired are claimed, and unparsable items
+#           are moved to a dead-letter list
+#   memory  payments generated in-process, and commits encoded as RESP but never sent: no Redis in
+#           the loop, so the time per message is the consumer's pure Python overhead
+
+
+class StreamTransport:
+    name = "stream"
+    stats_key = consumer_stats_key  # Processed counts of this transport's consumers (the monitor reads these)
+    prune_lock_key = "consumer_prune_lock"
+
+    def initialize(self):
+        initialize_consumer_group()
+
+    def entry_id(self, message_id):
+        """The ID recorded in the status index"""
+        return message_id.decode()
+
+    def fields(self, message):
+        return message
+
+    def dead_letter(self, worker_name, message_id):
+        pass  # Left pending, where XPENDING shows it
+
+    def read_batch(self, worker_name):
+        """One XREADGROUP for a worker; records the read latency when messages were available"""
+        while True:
+            try:
+                # Measure XREADGROUP latency
+                start_time = time.perf_counter()
+                messages = redis_client.xreadgroup(
+                    groupname=group_name,
+                    consumername=worker_name,
+                    streams={stream_name: '>'},
+                    count=profile["read_count"],  # Sized to the container's CPU and memory
+                    block=5000  # Block for 5 seconds if no new messages
+                )
+                end_time = time.perf_counter()
+            except redis.exceptions.ResponseError as e:
+                if "NOGROUP" in str(e):
+                    print("Consumer group or stream was deleted, reinitializing consumer group...")
+                    initialize_consumer_group()
+                    continue
+                else:
+                    raise e
 
             # Only track latency for non-blocking reads (when messages were available)
-            if messages:
-                read_latency_ms = (end_time - start_time) * 1000  # Convert to milliseconds
-                latency_buffer.append(read_latency_ms)
+            if not messages:
+                return []
+            record_read_latency((end_time - start_time) * 1000)  # Convert to milliseconds
+            return messages[0][1]
+
+    def commit_batch(self, worker_name, pipeline, message_ids):
+        """Execute the batch's pipeline, then acknowledge all its entries in one XACK; returns the replies"""
+        replies = pipeline.execute()
+        redis_client.xack(stream_name, group_name, *message_ids)
+        return replies
+
+    def claim_pending(self, worker_name, cursor, count):
+        """XAUTOCLAIM entries idle longer than idle_threshold_ms: (next cursor, or None at the end; entries)"""
+        next_start_id, claimed_messages, deleted_ids = redis_client.xautoclaim(
+            name=stream_name,
+            groupname=group_name,
+            consumername=worker_name,
+            min_idle_time=idle_threshold_ms,
+            start_id=cursor,
+            count=count
+        )
+        return (None if next_start_id in (b"0-0", "0-0") else next_start_id), claimed_messages
+
+    def retire_consumers(self, idle_ms):
+        """
+        XGROUP DELCONSUMER the group's consumers idle longer than idle_ms with no pending entries (an
+        empty PEL, so nothing is lost; a consumer that reads again is recreated). Returns the names left.
+        """
+        live = set()
+        for consumer in redis_client.xinfo_consumers(stream_name, group_name):
+            if consumer["idle"] > idle_ms and not consumer["pending"]:
+                redis_client.xgroup_delconsumer(stream_name, group_name, consumer["name"])
+            else:
+                live.add(consumer["name"])
+        return live
+
+
+class ListTransport:
+    name = "list"
+    workers_key = f"{source_list}:workers"  # Workers that may own a processing list, scored by their last read
+    dead_letter_key = f"{source_list}:dead"  # Items that aren't a payment
+    # Own counts and prune lock: a prune only knows its own workers, so a shared hash would lose the other side's
+    stats_key = f"{consumer_stats_key}:{source_list}"
+    prune_lock_key = f"consumer_prune_lock:{source_list}"
+
+    def processing_key(self, worker_name):
+        return f"{source_list}:processing:{worker_name}"
+
+    def alive_key(self, worker_name):
+        return f"{source_list}:alive:{worker_name}"
+
+    def initialize(self):
+        print(f"Consuming list '{source_list}' with per-worker processing lists")
+
+    def entry_id(self, message_id):
+        return "-"  # List items have no ID; the message ID is the item itself, for LREM
+
+    def fields(self, message):
+        """A list item (the JSON the list injectors LPUSH) as XREADGROUP-style fields; ValueError if it isn't one"""
+        payment = json.loads(message)
+        if not isinstance(payment, dict):
+            raise ValueError(f"Expected a JSON object, got {type(payment).__name__}")
+        return {name.encode(): str(field).encode() for name, field in payment.items()}
+
+    def dead_letter(self, worker_name, message_id):
+        """Move an item that can't be processed out of the worker's processing list, so nobody claims it again"""
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.lpush(self.dead_letter_key, message_id)  # Pushed before it's removed: a crash can't lose it
+        pipeline.lrem(self.processing_key(worker_name), 1, message_id)
+        pipeline.execute()
+
+    def read_batch(self, worker_name):
+        """BLMOVE the first item into the worker's processing list, then pipelined LMOVEs for the rest"""
+        heartbeat = redis_client.pipeline(transaction=False)
+        heartbeat.set(self.alive_key(worker_name), 1, px=heartbeat_ttl_ms)
+        heartbeat.zadd(self.workers_key, {worker_name: time.time()})
+        heartbeat.execute()
+        processing = self.processing_key(worker_name)
+        start_time = time.perf_counter()
+        first = redis_client.blmove(source_list, processing, 5, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        values = [first]
+        if profile["read_count"] > 1:
+            # No multi-element LMOVE: pipeline the rest, an empty list answers None
+            pipeline = redis_client.pipeline(transaction=False)
+            for _ in range(profile["read_count"] - 1):
+                pipeline.lmove(source_list, processing, "RIGHT", "LEFT")
+            values += [value for value in pipeline.execute() if value is not None]
+        record_read_latency((time.perf_counter() - start_time) * 1000)
+        return [(value, value) for value in values]
+
+    def commit_batch(self, worker_name, pipeline, message_ids):
+        """Execute the batch's pipeline, then LREM its items from the worker's processing list"""
+        replies = pipeline.execute()
+        processing = self.processing_key(worker_name)
+        acks = redis_client.pipeline(transaction=False)
+        for message_id in message_ids:
+            acks.lrem(processing, 1, message_id)
+        acks.execute()
+        return replies
+
+    def claim_pending(self, worker_name, cursor, count):
+        """
+        LMOVE up to count items from the processing list of a worker whose heartbeat expired into this
+        worker's, as XAUTOCLAIM transfers ownership; LMOVE is atomic per item, so concurrent claims can't
+        lose or duplicate anything
+        """
+        processing = self.processing_key(worker_name)
+        for owner in redis_client.zrange(self.workers_key, 0, -1):
+            owner = owner.decode()
+            if owner == worker_name or redis_client.exists(self.alive_key(owner)):
+                continue
+            values = []
+            while len(values) < count:
+                value = redis_client.lmove(self.processing_key(owner), processing, "RIGHT", "LEFT")
+                if value is None:
+                    break
+                values.append(value)
+            if values:
+                return cursor, [(value, value) for value in values]
+        return None, []
+
+    def retire_consumers(self, idle_ms):
+        """
+        Forget workers that last read more than idle_ms ago, whose heartbeat expired and whose processing
+        list is empty (a worker that reads again is re-added). Returns the names left.
+        """
+        for owner in redis_client.zrangebyscore(self.workers_key, "-inf", time.time() - idle_ms / 1000):
+            name = owner.decode()
+            if not redis_client.exists(self.alive_key(name)) and not redis_client.llen(self.processing_key(name)):
+                redis_client.zrem(self.workers_key, owner)
+        return set(redis_client.zrange(self.workers_key, 0, -1))
+
+
+class MemoryTransport:
+    name = "memory"
+    stats_key = consumer_stats_key  # Never written: the pipelines are dropped
+    prune_lock_key = "consumer_prune_lock"
+
+    def __init__(self):
+        # Shaped like the injectors' payments, as redis-py returns stream fields
+        timestamp = datetime.now().isoformat().encode()
+        self.entries = deque(
+            (f"{index + 1}-0".encode(), {b"transaction_id": str(index).encode(),
+                                         b"backend_id": str(index % 4 + 1).encode(),
+                                         b"amount": f"{random.uniform(1, 1000):.2f}".encode(),
+                                         b"timestamp": timestamp})
+            for index in range(memory_messages))
+        self.packer = redis.connection.Connection()  # Never connected: only its RESP encoder is used
+        self.committed = 0
+        self.commit_lock = threading.Lock()
+        self.done = threading.Event()
+
+    def initialize(self):
+        print(f"Processing {memory_messages:,} in-memory payments; nothing is sent to Redis")
+
+    def entry_id(self, message_id):
+        return message_id.decode()
+
+    def fields(self, message):
+        return message
+
+    def dead_letter(self, worker_name, message_id):
+        pass
+
+    def read_batch(self, worker_name):
+        entries = []
+        try:
+            for _ in range(profile["read_count"]):
+                entries.append(self.entries.popleft())
+        except IndexError:
+            pass
+        if not entries:
+            self.done.wait(5)  # Drained: idle like an XREADGROUP that blocked in vain
+        return entries
+
+    def commit_batch(self, worker_name, pipeline, message_ids):
+        """Encode the pipeline as execute would and drop it; no replies, so no progress marks"""
+        self.packer.pack_commands([args for args, options in pipeline.command_stack])
+        pipeline.reset()
+        with self.commit_lock:
+            self.committed += len(message_ids)
+            if self.committed >= memory_messages:
+                self.done.set()
+        return None
+
+    def claim_pending(self, worker_name, cursor, count):
+        return None, []
+
+    def retire_consumers(self, idle_ms):
+        return None
+
+
+transports = {"stream": StreamTransport, "list": ListTransport, "memory": MemoryTransport}
+if transport_name not in transports:
+    raise SystemExit(f"Unknown TRANSPORT '{transport_name}': use {', '.join(transports)}")
+transport = transports[transport_name]()
+
+
+def read_ahead(worker_name, batches):
+    """Reader thread of one worker: keeps up to prefetch_depth batches read while the worker processes"""
+    try:
+        while True:
+            batches.put(transport.read_batch(worker_name))
+    except Exception as e:
+        batches.put(e)  # Re-raised by the worker, so a failed read still stops the consumer
+
+
+def process_batch(worker_name, shard, entries):
+    """
+    The consumer core, the same for every transport: queue one batch's confirmations, status index
+    entries, per-consumer count, rollups and counters on a pipeline. Returns the pipeline, the message
+    IDs to acknowledge, the number of progress replies at its end, for publish_progress, and the status
+    buckets it sets an expiry on.
+    """
+    # Use pipeline for batching Redis operations; not a MULTI, which a cluster rejects with CROSSSLOT
+    # since the batch's keys (response streams, status buckets, rollups, counter shards) span slots
+    pipeline = redis_client.pipeline(transaction=False)
+    message_ids_to_ack = []
+    batch_amount = 0.0
+    batch_volume = {}  # backend_id -> [count, centavos], for the rollups
+    batch_time = time.time()
+    expiring = set()
+
+    for message_id, message in entries:
+        try:
+            # Extract and process message data
+            message_data = transport.fields(message)
+            amount = float(message_data.get(b"amount", 0))
+            transaction_id = message_data.get(b"transaction_id", b"").decode("utf-8")
+            backend_id = message_data.get(b"backend_id", b"").decode("utf-8")
+
+            # Sum the amount and the per-backend volume; counters and rollups go in once per batch below
+            batch_amount += amount
+            backend_volume = batch_volume.setdefault(backend_id, [0, 0])
+            backend_volume[0] += 1
+            backend_volume[1] += round(amount * 100)
+
+            # Batch send confirmation to the specific backend's response stream
+            response_stream_name = f"{backend_response_prefix}{backend_id}"
+            confirmation_message = {
+                "transaction_id": transaction_id,
+                "status": "confirmed",
+                "processed_amount": amount,
+                "backend_id": backend_id,
+                "timestamp": datetime.now().isoformat()
+            }
+            pipeline.xadd(response_stream_name, confirmation_message)
+            queue_status(pipeline, expiring, transaction_id, "confirmed", backend_id, transport.entry_id(message_id),
+                         batch_time)
+
+            # Collect message IDs for batch acknowledgment
+            message_ids_to_ack.append(message_id)
+
+        except (ValueError, KeyError) as e:
+            print(f"Error processing message ID {message_id}: {e}")
+            transport.dead_letter(worker_name, message_id)
+
+    replies = 0
+    if message_ids_to_ack:
+        # Per-consumer count, so the monitor can attribute throughput to each consumer
+        pipeline.hincrby(transport.stats_key, worker_name, len(message_ids_to_ack))
+        queue_rollups(pipeline, batch_volume, batch_time)
+        # The worker's own counter shard (see utils/util_sharded_counters.py), so replicas never contend on
+        # one hot key, then the progress reads (see utils/util_progress.py)
+        queue_counters(pipeline, shard, len(message_ids_to_ack), batch_amount)
+        replies = queue_progress(pipeline, len(message_ids_to_ack), progress_waiting)
+    return pipeline, message_ids_to_ack, replies, expiring
+
+
+def commit_batch(worker_name, pipeline, message_ids, replies, expiring):
+    """
+    Commit a batch through the transport, then mark its status buckets as expiring (a failed commit
+    leaves them to the next batch) and publish progress from its progress replies
+    """
+    global progress_waiting
+    results = transport.commit_batch(worker_name, pipeline, message_ids)
+    status_expiring.update(expiring)
+    if results is not None:
+        progress_waiting = publish_progress(redis_client, results[-replies:], len(message_ids))
+
+
+# Process messages from the transport
+def process_messages(worker_name=consumer_name):
+    print(f"Starting consumer {worker_name} for {transport.name} transport...")
 
-                # Periodically update Redis with statistics
-                latency_update_counter += 1
-                if latency_update_counter >= LATENCY_UPDATE_INTERVAL:
-                    update_latency_stats()
-                    latency_update_counter = 0
+    # Progress tracking
+    messages_processed = 0
+    last_report_time = time.time()
+    report_interval = 5  # Report every 5 seconds
 
-        except redis.exceptions.ResponseError as e:
-            if "NOGROUP" in str(e):
-                print("Consumer group or stream was deleted, reinitializing consumer group...")
-                initialize_consumer_group()
-                continue
-            else:
-                raise e
+    shard = counter_shard(worker_name)
+    batches = None
+    if profile["prefetch_depth"]:
+        batches = queue.Queue(maxsize=profile["prefetch_depth"])
+        threading.Thread(target=read_ahead, args=(worker_name, batches), daemon=True).start()
+
+    while True:
+        messages = batches.get() if batches else transport.read_batch(worker_name)
+        if isinstance(messages, Exception):
+            raise messages
 
         if not messages:
-            review_pending()  # Check for stalled messages if no new messages are available
+            review_pending(worker_name)  # Check for stalled messages if no new messages are available
             continue
 
-        # Use pipeline for batching Redis operations
-        pipeline = redis_client.pipeline()
-        message_ids_to_ack = []
-
-        for stream, message_entries in messages:
-            for message_id, message_data in message_entries:
-                try:
-                    # Extract and process message data
-                    amount = float(message_data.get(b"amount", 0))
-                    transaction_id = message_data.get(b"transaction_id", b"").decode("utf-8")
-                    backend_id = message_data.get(b"backend_id", b"").decode("utf-8")
-
-                    # Batch increment counters
-                    pipeline.incr("processed_count")
-                    pipeline.incrbyfloat("total_amount", amount)
-
-                    # Batch send confirmation to the specific backend's response stream
-                    response_stream_name = f"{backend_response_prefix}{backend_id}"
-                    confirmation_message = {
-                        "transaction_id": transaction_id,
-                        "status": "confirmed",
-                        "processed_amount": amount,
-                        "backend_id": backend_id,
-                        "timestamp": datetime.now().isoformat()
-                    }
-                    pipeline.xadd(response_stream_name, confirmation_message)
-
-                    # Collect message IDs for batch acknowledgment
-                    message_ids_to_ack.append(message_id)
-
-                except (ValueError, KeyError) as e:
-                    print(f"Error processing message ID {message_id}: {e}")
-
-        # Execute all batched operations at once
+        pipeline, message_ids_to_ack, replies, expiring = process_batch(worker_name, shard, messages)
+
+        # Execute all batched operations at once, then acknowledge the batch
         if message_ids_to_ack:
-            pipeline.execute()
-            # Batch acknowledge all messages
-            for msg_id in message_ids_to_ack:
-                redis_client.xack(stream_name, group_name, msg_id)
+            commit_batch(worker_name, pipeline, message_ids_to_ack, replies, expiring)
 
             # Update progress counter
             messages_processed += len(message_ids_to_ack)
@@ -168,71 +626,73 @@ def process_messages():
             if current_time - last_report_time >= report_interval:
                 elapsed = current_time - last_report_time
                 rate = messages_processed / elapsed
-                print(f"[{consumer_name}] Processed {messages_processed} messages in {elapsed:.1f}s ({rate:.1f} msg/sec)")
+                print(f"[{worker_name}] Processed {messages_processed} messages in {elapsed:.1f}s ({rate:.1f} msg/sec)")
                 messages_processed = 0
                 last_report_time = current_time
 
 
 # Function to review and claim pending messages if they've been idle too long
-def review_pending(batch_size=100):
-    print(f"Reviewing pending messages for consumer group '{group_name}'...")
+def review_pending(worker_name=consumer_name, batch_size=100):
+    print(f"Reviewing pending messages for {transport.name} transport...")
 
-    start_id = "0-0"  # Start from the beginning of the stream
+    shard = counter_shard(worker_name)
+    cursor = "0-0"  # Start from the beginning of the stream
     while True:
-        # Attempt to claim messages using XAUTOCLAIM
-        response = redis_client.xautoclaim(
-            name=stream_name,
-            groupname=group_name,
-            consumername=consumer_name,
-            min_idle_time=idle_threshold_ms,
-            start_id=start_id,  # Use start_id instead of start
-            count=batch_size
-        )
-
-        next_start_id, claimed_messages, deleted_ids = response
+        cursor, claimed_messages = transport.claim_pending(worker_name, cursor, batch_size)
 
         if not claimed_messages:
             print("No more pending messages to claim.")
             break
 
-        for msg_id, msg_data in claimed_messages:
-            try:
-                # Extract message data
-                amount = float(msg_data.get(b"amount", 0))
-                transaction_id = msg_data.get(b"transaction_id", b"").decode("utf-8")
-                backend_id = msg_data.get(b"backend_id", b"").decode("utf-8")
-
-                # Process the message
-                redis_client.incr("processed_count")
-                redis_client.incrbyfloat("total_amount", amount)
-                redis_client.xack(stream_name, group_name, msg_id)
-
-                # Send confirmation to the specific backend's response stream
-                response_stream_name = f"{backend_response_prefix}{backend_id}"
-                confirmation_message = {
-                    "transaction_id": transaction_id,
-                    "status": "confirmed",
-                    "processed_amount": amount,
-                    "backend_id": backend_id,
-                    "timestamp": datetime.now().isoformat(),
-                }
-                redis_client.xadd(response_stream_name, confirmation_message)
-
-                print(
-                    f"Claimed and processed message ID: {msg_id}, Amount: {amount}, "
-                    f"Backend ID: {backend_id}, Transaction ID: {transaction_id}"
-                )
+        # Claimed messages go through the same core and commit as a freshly read batch
+        pipeline, message_ids, replies, expiring = process_batch(worker_name, shard, claimed_messages)
+        if message_ids:
+            commit_batch(worker_name, pipeline, message_ids, replies, expiring)
+        print(f"Claimed and processed {len(message_ids)} of {len(claimed_messages)} pending messages")
 
-            except (ValueError, KeyError) as e:
-                print(f"Error processing claimed message ID {msg_id}: {e}")
-            except Exception as e:
-                print(f"Unhandled exception for claimed message ID {msg_id}: {e}")
-
-        # Move to the next batch using the next_start_id
-        if next_start_id == "0-0":
+        if cursor is None:
             print("Completed iterating over all pending messages.")
             break
 
 
+def run_worker(worker_name):
+    """Run one worker; an error in any worker stops the whole consumer, as a single-worker one would"""
+    try:
+        process_messages(worker_name)
+    except Exception as e:
+        print(f"Worker {worker_name} failed: {e!r}")
+        os._exit(1)
+
+
+def measure_overhead():
+    """
+    Memory transport: run every worker until all payments are committed and report the time per
+    message, the consumer's own cost with Redis out of the loop. Workers are threads sharing the GIL,
+    so CONSUMER_WORKERS=1 gives the cleanest per-message figure.
+    """
+    started = time.perf_counter()
+    for index in range(profile["workers"]):
+        threading.Thread(target=run_worker, args=(f"{consumer_name}/{index}",), daemon=True).start()
+    transport.done.wait()
+    elapsed = time.perf_counter() - started
+    print(f"Processed {memory_messages:,} messages in {elapsed:.3f}s with {profile['workers']} workers: "
+          f"{elapsed / memory_messages * 1e6:.2f} us/message ({memory_messages / elapsed:,.0f} msg/sec), "
+          f"the ceiling once Redis is fast")
+
+
 if __name__ == "__main__":
-    process_messages()
\ No newline at end of file
+    print(f"Runtime profile: {cpu_limit:g} CPUs ({cpu_source}), {memory_limit / 1024 / 1024:,.0f} MiB ({memory_source}) -> "
+          f"{profile['workers']} workers, COUNT {profile['read_count']}, prefetch {profile['prefetch_depth']}, "
+          f"pool {profile['pool_size']}, {profile['latency_samples']} latency samples")
+    transport.initialize()
+    if transport.name == "memory":
+        measure_overhead()
+        raise SystemExit(0)
+    threading.Thread(target=fold_counters, args=(redis_client, consumer_name), daemon=True).start()
+    threading.Thread(target=prune_consumers, daemon=True).start()
+
+    # One consumer name per worker, so the group tracks each worker's pending entries separately.
+    # Workers are <consumer_name>/<index>, so pix_lag_metrics.py can count pods rather than workers
+    for index in range(1, profile["workers"]):
+        threading.Thread(target=run_worker, args=(f"{consumer_name}/{index}",), daemon=True).start()
+    run_worker(consumer_name)
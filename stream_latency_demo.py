@@ -8,12 +8,16 @@ from datetime import datetime
 from collections import deque
 from typing import Dict, List, Tuple
 
+from utils.util_latency_burst import run_sweep
+
 # Redis configuration
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 test_stream = os.getenv("LATENCY_TEST_STREAM", "latency_test_stream")
 test_group = os.getenv("LATENCY_TEST_GROUP", "latency_test_group")
 test_consumer = "latency_demo_consumer"
 sqs_baseline_ms = float(os.getenv("SQS_BASELINE_MS", "70.0"))
+burst_stream = f"{test_stream}_burst"  # Separate stream, so burst leftovers never reach the single-message test
+burst_group = f"{test_group}_burst"
 
 # Initialize Redis
 redis_client = redis.from_url(redis_url)
@@ -21,9 +25,6 @@ redis_client = redis.from_url(redis_url)
 # Store test results (last 100 tests)
 test_history = deque(maxlen=100)
 
-# Auto-repeat state
-auto_repeat_active = False
-
 
 def initialize_consumer_group():
     """Initialize the consumer group for latency testing"""
@@ -234,11 +235,67 @@ def get_latency_chart_data():
     return df
 
 
+def run_burst_test(num_messages: float, pipeline_size: float, concurrency_levels: str):
+    """
+    Run a burst of messages at each concurrency level (K producer/consumer process pairs) and
+    return the summary, the latency distribution and the latency-vs-concurrency chart data
+    """
+    try:
+        levels = sorted({int(level) for level in concurrency_levels.split(",") if level.strip()})
+        if not levels or min(levels) < 1:
+            raise ValueError("concurrency levels must be positive integers")
+    except ValueError as e:
+        return f"❌ **Error**: invalid concurrency levels '{concurrency_levels}': {e}", None, None
+
+    try:
+        results = run_sweep(redis_url, burst_stream, burst_group, int(num_messages), levels, int(pipeline_size))
+    except Exception as e:
+        return f"❌ **Error** running burst: {str(e)}", None, None
+
+    rows = []
+    percentile_rows = []
+    all_latencies = [result["latencies_ms"] for result in results if len(result["latencies_ms"])]
+    upper = max(np.percentile(latencies, 99.9) for latencies in all_latencies) if all_latencies else 1.0
+    bins = np.linspace(0, upper, 31)
+    distribution_rows = []
+
+    for result in results:
+        latencies = result["latencies_ms"]
+        if not len(latencies):
+            rows.append(f"| {result['concurrency']} | 0/{result['sent']:,} | - | - | - | - | - |")
+            continue
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        rows.append(f"| {result['concurrency']} | {result['received']:,}/{result['sent']:,} | "
+                    f"{result['throughput']:,.0f} | {p50:.3f} | {p95:.3f} | {p99:.3f} | {latencies.max():.3f} |")
+        for name, value in (("P50", p50), ("P95", p95), ("P99", p99)):
+            percentile_rows.append({"Concurrency": result["concurrency"], "Latency (ms)": float(value),
+                                    "Percentile": name})
+
+        # Latencies past the P99.9 of the slowest run land in the last bin
+        counts, _ = np.histogram(np.minimum(latencies, upper), bins=bins)
+        for upper_edge, count in zip(bins[1:], counts):
+            distribution_rows.append({"Latency (ms)": f"≤{upper_edge:.2f}", "Messages": int(count),
+                                      "Concurrency": f"K={result['concurrency']}"})
+
+    summary = f"""
+## 🔥 Burst Results ({int(num_messages):,} messages per run, pipeline {int(pipeline_size)})
+
+Latency is measured at the consumer that received each message, from the timestamp embedded by its producer.
+
+| Concurrency (K) | Received | Throughput (msg/s) | P50 (ms) | P95 (ms) | P99 (ms) | Max (ms) |
+|-----------------|----------|--------------------|----------|----------|----------|----------|
+""" + "\n".join(rows) + f"""
+
+**AWS SQS Baseline:** {sqs_baseline_ms:.1f} ms
+"""
+    return summary, pd.DataFrame(distribution_rows), pd.DataFrame(percentile_rows)
+
+
 def clean_stream() -> str:
     """Delete the test stream and recreate consumer group"""
     try:
-        # Delete the stream
-        redis_client.delete(test_stream)
+        # Delete the streams
+        redis_client.delete(test_stream, burst_stream)
         
         # Clear history
         test_history.clear()
@@ -308,7 +365,34 @@ with gr.Blocks(title="Redis Streams Latency Demo", theme=gr.themes.Soft()) as de
             wrap=True
         )
 
+    gr.Markdown("""
+    ## 🔥 Burst & Concurrency Sweep
+
+    Sends a burst of messages through **K producer/consumer pairs running as separate processes**, for each K,
+    to show latency under load and not just on the idle path. Pipelining batches that many XADDs per round trip.
+    """)
+
+    with gr.Row():
+        burst_messages = gr.Number(label="Messages per run", value=10000, precision=0, minimum=1)
+        burst_pipeline = gr.Slider(label="Pipeline size (1 = no pipelining)", minimum=1, maximum=1000, step=1,
+                                   value=1)
+        burst_levels = gr.Textbox(label="Concurrency levels (K)", value="1,2,4,8")
+        burst_btn = gr.Button("🔥 Run Burst Sweep", variant="primary")
+
+    burst_summary = gr.Markdown()
+    with gr.Row():
+        burst_distribution = gr.BarPlot(x="Latency (ms)", y="Messages", color="Concurrency",
+                                        title="Latency Distribution", x_label_angle=-45)
+        burst_concurrency = gr.LinePlot(x="Concurrency", y="Latency (ms)", color="Percentile",
+                                        title="Latency vs Concurrency")
+
     # Event handlers
+    burst_btn.click(
+        fn=run_burst_test,
+        inputs=[burst_messages, burst_pipeline, burst_levels],
+        outputs=[burst_summary, burst_distribution, burst_concurrency]
+    )
+
     send_btn.click(
         fn=run_single_test,
         inputs=[message_input],
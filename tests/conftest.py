@@ -0,0 +1,32 @@
+import os
+import sys
+
+import fakeredis
+import pytest
+
+# The utils scripts import their siblings directly (from util_x import ...), the root scripts as utils.util_x
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "utils"))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def smasher_client(request, monkeypatch):
+    """
+    A fakeredis client wired into pix_smasher_demo, with a fresh transport of the class the test
+    module picks: pytestmark = pytest.mark.parametrize("smasher_client", [ListTransport], indirect=True)
+    """
+    import pix_smasher_demo as smasher
+
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(smasher, "redis_client", client)
+    monkeypatch.setattr(smasher, "transport", request.param())
+    monkeypatch.setattr(smasher, "status_expiring", set())
+    if isinstance(smasher.transport, smasher.StreamTransport):
+        client.xgroup_create(smasher.stream_name, smasher.group_name, id="0", mkstream=True)
+    return client
+
+
+def payment(index):
+    """A payment's fields, as the injectors write them (XADD fields, or JSON for the lists)"""
+    return {"transaction_id": f"PIX{index:08d}", "backend_id": "bank_a", "amount": "10.00"}
@@ -0,0 +1,86 @@
+import glob
+
+import fakeredis
+import pytest
+
+import pix_archiver as archiver
+from utils.util_payment_columns import ColumnBuffer, read_columns
+
+
+def test_column_buffer_keeps_one_list_per_column():
+    buffer = ColumnBuffer()
+    buffer.append([
+        (b"1700000000000-0", {b"transaction_id": b"PIX1", b"backend_id": b"bank_a", b"amount": b"10.25",
+                              b"timestamp": b"2023-11-14T22:13:20"}),
+        (b"1700000000000-1", {b"transaction_id": b"PIX2", b"backend_id": b"bank_b", b"amount": b"bad"}),
+        (b"1700000000001-0", {b"transaction_id": b"PIX3", b"backend_id": b"bank_a", b"amount": b"0.10"}),
+    ])
+    assert len(buffer) == 3
+    assert (buffer.id_ms, buffer.id_seq) == ([1700000000000, 1700000000000, 1700000000001], [0, 1, 0])
+    assert buffer.backend_code == [0, 1, 0]
+    assert buffer.amount_cents == [1025, 0, 10]  # A malformed amount is archived as 0
+    assert buffer.created_ms[0] > 0 and buffer.created_ms[1:] == [-1, -1]
+
+    buffer.clear()
+    assert len(buffer) == 0 and not buffer.backend_labels
+
+
+def test_file_interval_starts_at_the_first_buffered_row(monkeypatch):
+    buffer = ColumnBuffer()
+    monkeypatch.setattr("utils.util_payment_columns.time.time", lambda: 1000.0)
+    buffer.append([])
+    assert buffer.started is None  # An idle poll doesn't start the interval
+
+    monkeypatch.setattr("utils.util_payment_columns.time.time", lambda: 5000.0)
+    buffer.append([(b"1-0", {b"amount": b"1.00"})])
+    monkeypatch.setattr("utils.util_payment_columns.time.time", lambda: 5010.0)
+    buffer.append([(b"2-0", {b"amount": b"1.00"})])
+    assert buffer.started == 5000.0
+
+
+class Stop(Exception):
+    pass
+
+
+def test_files_never_exceed_archive_rows(tmp_path, monkeypatch):
+    client = fakeredis.FakeRedis()
+    for index in range(200):
+        client.xadd(archiver.stream_name, {"transaction_id": f"PIX{index}", "backend_id": "bank_a", "amount": "1.00"})
+    client.xgroup_create(archiver.stream_name, archiver.group_name, id="0")
+    entries = client.xreadgroup(archiver.group_name, "consumer", {archiver.stream_name: ">"})[0][1]
+    client.xack(archiver.stream_name, archiver.group_name, *[message_id for message_id, _ in entries])
+
+    monkeypatch.setattr(archiver.redis, "from_url", lambda url: client)
+    monkeypatch.setattr(archiver, "archive_dir", str(tmp_path))
+    monkeypatch.setattr(archiver, "checkpoint_file", str(tmp_path / "checkpoint.json"))
+    monkeypatch.setattr(archiver, "flush_rows", 50)
+    monkeypatch.setattr(archiver, "read_count", 90)
+
+    def caught_up(seconds):
+        raise Stop()
+
+    monkeypatch.setattr(archiver.time, "sleep", caught_up)
+    with pytest.raises(Stop):
+        archiver.run()
+
+    rows = [len(read_columns(path)["id_ms"]) for path in sorted(glob.glob(str(tmp_path / "*.npz")))]
+    assert rows == [50, 50, 50, 50]
+
+
+def test_poison_entries_dont_hold_the_frontier_back(monkeypatch):
+    client = fakeredis.FakeRedis()
+    ids = [client.xadd(archiver.stream_name, {"amount": "1.00"}) for _ in range(3)]
+    client.xgroup_create(archiver.stream_name, archiver.group_name, id="0")
+    client.xreadgroup(archiver.group_name, "consumer", {archiver.stream_name: ">"})
+    client.xack(archiver.stream_name, archiver.group_name, ids[1])
+    monkeypatch.setattr(archiver, "max_deliveries", 2)
+
+    # Both unacknowledged entries are still being worked on: the oldest bounds the frontier
+    frontier, _, poison = archiver.acknowledged_frontier(client)
+    assert (frontier, poison) == (f"({ids[0].decode()}", [])
+
+    # The first keeps failing: it is reported and passed over, the second still bounds the frontier
+    for _ in range(2):
+        client.xclaim(archiver.stream_name, archiver.group_name, "consumer", 0, [ids[0]])
+    frontier, _, poison = archiver.acknowledged_frontier(client)
+    assert (frontier, poison) == (f"({ids[2].decode()}", [ids[0].decode()])
@@ -0,0 +1,22 @@
+import gc
+import gzip
+
+import pytest
+
+from util_bulk_resp_generator import open_output
+
+
+@pytest.mark.filterwarnings("error::ResourceWarning", "error::pytest.PytestUnraisableExceptionWarning")
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_open_output_closes_the_file(tmp_path, compression):
+    path = tmp_path / "part.txt"
+    with open_output(str(path), "wb", compression, 3) as out:
+        out.write(b"*1\r\n$4\r\nPING\r\n")
+    gc.collect()  # An underlying file left open warns here
+    data = path.read_bytes()
+    assert (gzip.decompress(data) if compression == "gzip" else data) == b"*1\r\n$4\r\nPING\r\n"
+
+
+def test_open_output_rejects_unknown_compression(tmp_path):
+    with pytest.raises(ValueError):
+        open_output(str(tmp_path / "part.txt"), "wb", "lz4", 3)
@@ -0,0 +1,41 @@
+import fakeredis
+
+import pix_lag_metrics as lag
+
+
+def test_capacity_and_active_consumers_are_per_pod_not_per_worker(monkeypatch):
+    metrics = lag.LagMetrics()
+    metrics.redis_client = client = fakeredis.FakeRedis()
+    for index in range(3000):
+        client.xadd(lag.stream_name, {"amount": "1.00"})
+    client.xgroup_create(lag.stream_name, lag.group_name, id="0")
+    # Two pods: one running three workers, one running a single worker
+    for name in ("consumer_a_1234", "consumer_a_1234/1", "consumer_a_1234/2", "consumer_b_5678"):
+        client.xreadgroup(lag.group_name, name, {lag.stream_name: ">"}, count=10)
+
+    monkeypatch.setattr(lag.time, "time", lambda: 1000.0)
+    assert metrics.sample()["active_consumers"] == 2
+
+    # 6000 messages in 10 s while saturated: 600 msg/s from two pods
+    client.set("processed_count:shard:0", 6000)
+    monkeypatch.setattr(lag.time, "time", lambda: 1010.0)
+    snapshot = metrics.sample()
+    assert snapshot["consumer_capacity"] == 300
+
+
+def test_consumer_pod_strips_the_worker_index():
+    assert lag.consumer_pod("consumer_pix-7d9f_4821/3") == "consumer_pix-7d9f_4821"
+    assert lag.consumer_pod("consumer_pix-7d9f_4821") == "consumer_pix-7d9f_4821"
+
+
+def test_unknown_lag_falls_back_to_entries_added_minus_entries_read():
+    metrics = lag.LagMetrics()
+    assert metrics.group_lag({"entries-added": 500}, {"lag": 20, "entries-read": 480}) == (20, True)
+    assert metrics.group_lag({"entries-added": 500}, {"lag": None, "entries-read": 450}) == (50, False)
+    assert not metrics.lag_known
+    # Redis < 7: neither the lag nor the counters
+    assert metrics.group_lag({}, {"name": b"pix_consumers", "pending": 3}) == (0, False)
+    assert metrics.group_lag({}, {}) == (0, True)  # No group yet
+
+    metrics.redis_client = fakeredis.FakeRedis()
+    assert "pix_consumer_group_lag_unknown{" in lag.render_prometheus(metrics.sample())
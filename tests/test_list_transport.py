@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+import pix_smasher_demo as smasher
+from conftest import payment
+
+pytestmark = pytest.mark.parametrize("smasher_client", [smasher.ListTransport], indirect=True)
+
+
+def consume_once(worker_name):
+    entries = smasher.transport.read_batch(worker_name)
+    pipeline, message_ids, replies, expiring = smasher.process_batch(worker_name, 0, entries)
+    if message_ids:
+        smasher.commit_batch(worker_name, pipeline, message_ids, replies, expiring)
+    return message_ids
+
+
+def test_unparsable_items_are_dead_lettered_not_fatal(smasher_client):
+    poison = [b"not json", b"[1, 2]", json.dumps({"amount": "abc"}).encode()]
+    smasher_client.lpush(smasher.source_list, json.dumps(payment(1)), *poison, json.dumps(payment(2)))
+
+    assert len(consume_once("worker")) == 2
+    assert sorted(smasher_client.lrange(smasher.transport.dead_letter_key, 0, -1)) == sorted(poison)
+    assert smasher_client.llen(smasher.transport.processing_key("worker")) == 0
+    assert int(smasher_client.get("processed_count:shard:0")) == 2
+
+
+def test_dead_workers_are_claimed_from_the_workers_set(smasher_client):
+    smasher_client.lpush(smasher.source_list, *[json.dumps(payment(index)) for index in range(5)])
+    smasher.transport.read_batch("crashed")  # Moves the items to its processing list, never commits
+    smasher_client.delete(smasher.transport.alive_key("crashed"))  # Heartbeat expired
+
+    cursor, claimed = smasher.transport.claim_pending("survivor", "0-0", 100)
+    assert len(claimed) == 5
+    assert smasher_client.llen(smasher.transport.processing_key("crashed")) == 0
+    assert smasher_client.llen(smasher.transport.processing_key("survivor")) == 5
+
+
+def test_retire_consumers_keeps_workers_that_are_alive_or_own_items(smasher_client):
+    smasher_client.lpush(smasher.source_list, json.dumps(payment(1)))
+    smasher.transport.read_batch("holding")  # Keeps an uncommitted item
+    smasher_client.zadd(smasher.transport.workers_key, {"gone": 0, "holding": 0, "alive": 0})
+    smasher_client.set(smasher.transport.alive_key("alive"), 1)
+    smasher_client.delete(smasher.transport.alive_key("holding"))
+    smasher_client.hset(smasher.transport.stats_key, mapping={"gone": 1, "holding": 2, "alive": 3})
+
+    assert smasher.prune_consumer_stats(idle_ms=1000) == 1
+    assert set(smasher_client.zrange(smasher.transport.workers_key, 0, -1)) == {b"holding", b"alive"}
+    assert set(smasher_client.hkeys(smasher.transport.stats_key)) == {b"holding", b"alive"}
+
+
+def test_list_prune_leaves_the_stream_consumers_counts_alone(smasher_client):
+    smasher_client.hset(smasher.consumer_stats_key, "stream_consumer", 4)
+    smasher_client.hset(smasher.transport.stats_key, "gone", 1)
+
+    assert smasher.prune_consumer_stats(idle_ms=1000) == 1
+    assert smasher_client.hgetall(smasher.consumer_stats_key) == {b"stream_consumer": b"4"}
+    assert smasher_client.hgetall(smasher.transport.stats_key) == {}
@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+
+from util_metric_history import EwmaRate, MetricHistory, Sparkline
+
+
+def test_history_wraps_and_keeps_the_newest():
+    history = MetricHistory(["rate", "lag"], capacity=4)
+    for tick in range(6):
+        history.append(float(tick), {"rate": tick * 10, "lag": None if tick == 5 else tick})
+    assert len(history) == 4
+    assert history.times().tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert history.series("rate", 3).tolist() == [30, 40, 50]
+    assert history.latest("rate") == 50
+    assert history.latest("lag") is None
+
+
+def test_ewma_rate_follows_a_steady_counter():
+    rate = EwmaRate(windows_seconds=(60,))
+    assert rate.update(0.0, 0) == [None]
+    for second in range(1, 600):
+        rate.update(float(second), second * 100)
+    assert math.isclose(rate.rates[0], 100)
+    rate.update(600.0, 0)  # Counter reset: the rate decays instead of going negative
+    assert rate.instant == 0 and rate.rates[0] > 0
+
+
+def test_sparkline_appends_one_character_per_tick_once_full(monkeypatch):
+    width = 10
+    sparkline = Sparkline(width)
+    drawn_sizes = []
+    char_indices = sparkline._char_indices
+
+    def recording(values, low, high):
+        drawn_sizes.append(len(values))
+        return char_indices(values, low, high)
+
+    monkeypatch.setattr(sparkline, "_char_indices", recording)
+    # Period 4 with both extremes, so every window of 10 has the same min/max scale
+    samples = np.array([0.0, 7.0, 3.0, 5.0] * 10)
+    for tick in range(1, len(samples) + 1):
+        window = samples[max(tick - width, 0):tick]
+        assert sparkline.update(window, tick) == Sparkline(width).update(window, tick)
+
+    assert drawn_sizes[0] == 1 and drawn_sizes[1] == 2  # Scale moves while the first samples arrive
+    assert drawn_sizes[2:] == [1] * (len(samples) - 2)  # Then one character per tick, full or not
+
+
+def test_sparkline_redraws_when_the_scale_moves():
+    sparkline = Sparkline(4)
+    sparkline.update(np.array([1.0, 2.0, 3.0, 4.0]), 4)
+    assert sparkline.update(np.array([2.0, 3.0, 4.0, 100.0]), 5) == "▁▁▁█"
+    assert sparkline.update(np.array([3.0, 4.0, 100.0, np.nan]), 6) == "▁▁█ "
+
+
+def test_sparkline_draws_nothing_new_without_a_new_sample():
+    sparkline = Sparkline(4)
+    window = np.array([0.0, 7.0, 3.0, 5.0])
+    line = sparkline.update(window, 4)
+    for _ in range(3):  # A stale target re-rendered every tick
+        assert sparkline.update(window, 4) == line
+
+
+def test_sparkline_redraws_after_several_samples_at_once():
+    history = MetricHistory(["throughput"], capacity=16)
+    sparkline = Sparkline(4)
+    for value in (0.0, 7.0, 3.0, 5.0):
+        history.append(0.0, {"throughput": value})
+    sparkline.update(history.series("throughput", 4), history.total)
+    for value in (0.0, 7.0, 6.0):  # Same scale, three samples while another view was open
+        history.append(0.0, {"throughput": value})
+    window = history.series("throughput", 4)
+    assert sparkline.update(window, history.total) == Sparkline(4).update(window, history.total)
@@ -0,0 +1,47 @@
+import fakeredis
+import pytest
+import redis
+
+from alternative_demos import pix_mvp
+
+
+class ClusterLikeRedis(fakeredis.FakeRedis):
+    """Rejects multi-key BRPOP as a cluster does when the keys are in different slots"""
+
+    def brpop(self, keys, timeout=0):
+        if isinstance(keys, list) and len(keys) > 1:
+            raise redis.exceptions.ResponseError("CROSSSLOT Keys in request don't hash to the same slot")
+        return super().brpop(keys, timeout=timeout)
+
+
+@pytest.fixture
+def cluster_client(monkeypatch):
+    client = ClusterLikeRedis()
+    monkeypatch.setattr(pix_mvp, "redis_client", client)
+    return client
+
+
+def test_work_stealer_falls_back_to_single_key_pops_on_crossslot(cluster_client):
+    cluster_client.lpush(pix_mvp.list_name(2), "stolen")
+    stealer = pix_mvp.WorkStealer(0, 3)
+
+    assert stealer.pop(timeout=1) == (pix_mvp.list_name(2).encode(), b"stolen")
+    assert not stealer.multi_key
+
+
+def test_sum_batch_counts_only_the_payments_it_summed():
+    assert pix_mvp.sum_batch([b'{"amount": "10.50"}', b"not json", b'{"amount": "abc"}', b'{"amount": 1}']) == (2, 11.5)
+
+
+def test_recovery_walks_the_consumers_set(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(pix_mvp, "redis_client", client)
+    client.zadd(pix_mvp.consumers_key, {"crashed": 0, "alive": 0})
+    client.lpush(f"{pix_mvp.processing_prefix}crashed", "a", "b")
+    client.lpush(f"{pix_mvp.processing_prefix}alive", "c")
+    client.set(f"{pix_mvp.alive_prefix}alive", 1)
+
+    assert pix_mvp.recover_orphaned_batches() == 2
+    assert client.llen(pix_mvp.source_queue) == 2
+    assert client.llen(f"{pix_mvp.processing_prefix}alive") == 1
+    assert client.zrange(pix_mvp.consumers_key, 0, -1) == [b"alive"]
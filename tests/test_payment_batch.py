@@ -0,0 +1,51 @@
+import json
+
+import fakeredis
+import numpy as np
+
+from util_payment_batch import DEFAULT_BACKEND_IDS, encode_resp_command, generate_payment_batch, send_resp_commands
+
+
+def test_formats_agree():
+    batch = generate_payment_batch(500, start_id=995, backend_ids=DEFAULT_BACKEND_IDS,
+                                   rng=np.random.default_rng(7))
+    dicts = batch.to_dicts()
+    assert len(dicts) == 500
+    assert [payment["transaction_id"] for payment in dicts[:6]] == ["995", "996", "997", "998", "999", "1000"]
+    assert [json.loads(item) for item in batch.to_json()] == [
+        {**payment, "amount": float(payment["amount"])} for payment in dicts]
+    expected = b"".join(encode_resp_command("XADD", "pix_payments", "*", *[value for field in payment.items()
+                                                                            for value in field])
+                        for payment in dicts)
+    assert batch.to_resp_xadd("pix_payments") == expected
+
+
+def test_total_amount_matches_rendered_amounts():
+    batch = generate_payment_batch(1000, rng=np.random.default_rng(1))
+    assert round(sum(float(payment["amount"]) for payment in batch.to_dicts()), 2) == round(batch.total_amount, 2)
+
+
+def test_lpush_chunks_carry_every_item():
+    batch = generate_payment_batch(25, start_id=0)
+    payload = batch.to_resp_lpush("source_list_0", items_per_command=10)
+    assert payload.count(b"$5\r\nLPUSH\r\n") == 3
+    assert payload.startswith(b"*12\r\n")  # LPUSH, the key and 10 items
+
+
+def test_empty_batch_renders_nothing():
+    batch = generate_payment_batch(0, start_id=0, backend_ids=DEFAULT_BACKEND_IDS)
+    assert batch.to_resp_xadd("pix_payments") == b""
+    assert batch.to_resp_lpush("source_list_0") == b""
+    assert batch.to_json() == []
+    assert batch.to_dicts() == []
+
+
+def test_send_resp_commands_reports_which_commands_failed():
+    client = fakeredis.FakeRedis()
+    client.set("not_a_stream", "x")
+    payload = b"".join(encode_resp_command("XADD", key, "*", "amount", "1.00")
+                       for key in ["pix_payments", "not_a_stream", "pix_payments"])
+    failed = []
+    assert send_resp_commands(client, payload, 3, failed) == 1
+    assert failed == [1]
+    assert client.xlen("pix_payments") == 2
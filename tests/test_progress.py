@@ -0,0 +1,32 @@
+import fakeredis
+
+from util_progress import (progress_count_key, progress_crossed, progress_stream, publish_progress,
+                           queue_progress, start_progress)
+
+
+def test_progress_crossed_marks_first_steps_and_target():
+    assert progress_crossed(0, 10, 1000, 100)  # First message
+    assert not progress_crossed(10, 90, 1000, 100)
+    assert progress_crossed(90, 110, 1000, 100)  # Past 100
+    assert progress_crossed(950, 1000, 1000, 300)  # The target, off the step grid
+    assert not progress_crossed(1000, 1010, 1000, 300)
+    assert progress_crossed(5, 6, 10, 0)  # A step of 0 means every message
+
+
+def commit(client, processed, counted):
+    pipe = client.pipeline(transaction=False)
+    replies = queue_progress(pipe, processed, counted)
+    return publish_progress(client, pipe.execute()[-replies:], processed)
+
+
+def test_each_threshold_is_marked_once_across_batches():
+    client = fakeredis.FakeRedis()
+    assert not commit(client, 10, False)  # No injector waiting: nothing counted
+    start_progress(client, 250, marks=2)  # Step 125
+
+    waiting = False
+    for _ in range(5):
+        waiting = commit(client, 50, waiting)
+    assert waiting
+    assert int(client.get(progress_count_key)) == 250
+    assert [int(fields[b"count"]) for _, fields in client.xrange(progress_stream)] == [50, 150, 250]
@@ -0,0 +1,79 @@
+import threading
+
+import fakeredis
+import pytest
+
+import util_resp_pipe_loader as loader
+from util_payment_batch import encode_resp_command
+
+
+def write_commands(path, count):
+    path.write_bytes(b"".join(encode_resp_command("SET", f"key:{i}", i) for i in range(count)))
+    return str(path)
+
+
+def use_client(monkeypatch, client):
+    monkeypatch.setattr(loader.redis, "from_url", lambda url: client)
+    monkeypatch.setattr(loader, "window_commands", 100)
+    monkeypatch.setattr(loader, "max_inflight", 250)
+
+
+def test_scan_window_stops_at_command_boundaries():
+    data = b"".join(encode_resp_command("SET", f"key:{i}", "x" * i) for i in range(10))
+    end, count = loader.scan_window(data, 0, len(data), 4, 1 << 20)
+    assert count == 4
+    assert end == len(b"".join(encode_resp_command("SET", f"key:{i}", "x" * i) for i in range(4)))
+    with pytest.raises(ValueError):
+        loader.scan_window(data[:-3], 0, len(data) - 3, 100, 1 << 20)
+
+
+def test_loads_every_command(tmp_path, monkeypatch):
+    client = fakeredis.FakeRedis()
+    use_client(monkeypatch, client)
+    loader.load_file(write_commands(tmp_path / "load.txt", 2500))
+    assert client.dbsize() == 2500
+    assert client.get("key:2499") == b"2499"
+
+
+class BrokenConnection:
+    """Accepts writes, then fails reading replies with an error that isn't a ConnectionError"""
+
+    def send_packed_command(self, command, check_health=True):
+        pass
+
+    def read_response(self, disable_decoding=False):
+        raise BufferError("reply buffer is exported")
+
+    def disconnect(self):
+        pass
+
+
+class BrokenPool:
+    def get_connection(self, name):
+        return BrokenConnection()
+
+    def release(self, connection):
+        pass
+
+
+class BrokenClient:
+    connection_pool = BrokenPool()
+
+
+def test_worker_failure_stops_the_load(tmp_path, monkeypatch):
+    use_client(monkeypatch, BrokenClient())
+    path = write_commands(tmp_path / "load.txt", 20000)
+    errors = []
+
+    def run():
+        try:
+            loader.load_file(path)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "the splitter blocked on a queue nobody drains"
+    assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
+    assert "BufferError" in str(errors[0])
@@ -0,0 +1,31 @@
+import math
+
+import fakeredis
+
+from util_rollups import MINUTE, SECOND, peak_second, plan_buckets, rollup_key
+
+
+def covered_seconds(buckets):
+    seconds = []
+    for resolution, bucket in buckets:
+        seconds += range(bucket, bucket + (60 if resolution == MINUTE else 1))
+    return seconds
+
+
+def test_plan_buckets_covers_the_window_exactly_once():
+    for start, end in ((0, 60), (30, 30.5), (59, 181), (61, 119), (125, 3725.2)):
+        assert covered_seconds(plan_buckets(start, end)) == list(range(int(start), math.ceil(end)))
+    assert plan_buckets(59, 181) == [(SECOND, 59), (MINUTE, 60), (MINUTE, 120), (SECOND, 180)]
+
+
+def test_peak_second_matches_a_full_scan():
+    client = fakeredis.FakeRedis()
+    counts = {5: 3, 61: 7, 62: 7, 100: 2, 130: 9, 131: 1}  # Minute 60 is the busiest, second 130 the peak
+    for second, count in counts.items():
+        client.hset(rollup_key(SECOND, second), mapping={"bank_a:count": count, "bank_a:centavos": count * 100})
+        client.hincrby(rollup_key(MINUTE, second // 60 * 60), "bank_a:count", count)
+        client.hincrby(rollup_key(MINUTE, second // 60 * 60), "bank_a:centavos", count * 100)
+
+    assert peak_second(client, 0, 180) == (130, {"bank_a": {"count": 9, "centavos": 900}})
+    assert peak_second(client, 0, 120) == (61, {"bank_a": {"count": 7, "centavos": 700}})
+    assert peak_second(client, 200, 300) == (None, {})
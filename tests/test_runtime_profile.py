@@ -0,0 +1,31 @@
+import pytest
+
+import pix_smasher_demo as smasher
+
+MIB = 1024 * 1024
+
+
+@pytest.fixture(autouse=True)
+def no_overrides(monkeypatch):
+    for name in ("CONSUMER_WORKERS", "READ_COUNT", "PREFETCH_DEPTH", "LATENCY_SAMPLES", "POOL_SIZE"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_a_throttled_pod_gets_one_worker_small_reads_and_no_read_ahead():
+    assert smasher.derive_profile(0.05, 64 * MIB) == {
+        "workers": 1, "read_count": 10, "prefetch_depth": 0, "latency_samples": 1000, "pool_size": 2}
+
+
+def test_a_large_host_is_capped():
+    profile = smasher.derive_profile(64, 64 * 1024 * MIB)
+    assert (profile["workers"], profile["read_count"], profile["prefetch_depth"]) == (32, 500, 2)
+    assert profile["pool_size"] == 32 * 2 + 1  # A worker and a reader each
+
+
+def test_read_ahead_is_capped_to_a_tenth_of_memory_and_env_wins(monkeypatch):
+    profile = smasher.derive_profile(8, 32 * MIB)
+    assert profile["read_count"] * 2048 * profile["workers"] * 3 <= 32 * MIB * 0.1
+
+    monkeypatch.setenv("CONSUMER_WORKERS", "3")
+    monkeypatch.setenv("PREFETCH_DEPTH", "0")
+    assert smasher.derive_profile(8, 32 * MIB)["pool_size"] == 4
@@ -0,0 +1,38 @@
+import fakeredis
+import pytest
+import redis
+
+from util_sharded_counters import (counter_shard, fold_counter_shards, queue_counters, read_counters,
+                                   reset_counters, sum_counter_replies)
+
+
+def test_sum_counter_replies_skips_missing_and_failed_shards():
+    replies = [b"3", None, b"4", ValueError("unreadable"), b"1.25", None, b"2.5", b"0"]
+    assert sum_counter_replies(replies, shards=4) == {"processed_count": 7, "total_amount": 3.75}
+
+
+def test_workers_spread_over_shards_and_fold_into_the_canonical_keys():
+    client = fakeredis.FakeRedis()
+    pipe = client.pipeline(transaction=False)
+    for worker in ("consumer_a", "consumer_a/1", "consumer_b"):
+        assert 0 <= counter_shard(worker, shards=4) < 4
+        queue_counters(pipe, counter_shard(worker, shards=4), 10, 12.5)
+    pipe.execute()
+    assert read_counters(client, shards=4) == {"processed_count": 30, "total_amount": 37.5}
+
+    assert fold_counter_shards(client, "consumer_a", shards=4) == {"processed_count": 30, "total_amount": 37.5}
+    assert (int(client.get("processed_count")), float(client.get("total_amount"))) == (30, 37.5)
+    # Another replica within the same interval leaves the fold to the lock holder
+    assert fold_counter_shards(client, "consumer_b", shards=4) is None
+
+    reset_counters(client, shards=4)
+    assert client.dbsize() == 1  # Just the fold lock
+
+
+def test_fold_raises_instead_of_folding_an_unreadable_shard_as_zero():
+    client = fakeredis.FakeRedis()
+    client.set("processed_count:shard:0", 5)
+    client.lpush("processed_count:shard:1", "not a counter")
+    with pytest.raises(redis.exceptions.ResponseError):
+        fold_counter_shards(client, "consumer_a", shards=2)
+    assert client.get("processed_count") is None
@@ -0,0 +1,57 @@
+import pytest
+
+import pix_smasher_demo as smasher
+from conftest import payment
+
+pytestmark = pytest.mark.parametrize("smasher_client", [smasher.StreamTransport], indirect=True)
+
+
+def test_prune_retires_idle_empty_consumers_and_their_stats(smasher_client):
+    smasher_client.xadd(smasher.stream_name, {"amount": "1.00"})
+    smasher_client.xreadgroup(smasher.group_name, "busy", {smasher.stream_name: ">"}, count=1)  # Keeps a pending entry
+    smasher_client.xreadgroup(smasher.group_name, "done", {smasher.stream_name: ">"}, count=1)  # Nothing pending
+    smasher_client.hset(smasher.transport.stats_key, mapping={"busy": 5, "done": 7, "restarted_long_ago": 9})
+
+    assert smasher.prune_consumer_stats(idle_ms=-1) == 2
+    assert smasher_client.hgetall(smasher.transport.stats_key) == {b"busy": b"5"}
+    assert [consumer["name"] for consumer in smasher_client.xinfo_consumers(smasher.stream_name, smasher.group_name)] == [b"busy"]
+
+
+def test_prune_keeps_recently_active_consumers(smasher_client):
+    smasher_client.xreadgroup(smasher.group_name, "idle_a_moment", {smasher.stream_name: ">"}, count=1)
+    smasher_client.hset(smasher.transport.stats_key, "idle_a_moment", 3)
+    assert smasher.prune_consumer_stats(idle_ms=600000) == 0
+    assert smasher_client.hgetall(smasher.transport.stats_key) == {b"idle_a_moment": b"3"}
+
+
+def expireats(pipeline):
+    return [args[1] for args, options in pipeline.command_stack if args[0] == "EXPIREAT"]
+
+
+def test_status_buckets_are_marked_expiring_only_after_a_commit(smasher_client, monkeypatch):
+    monkeypatch.setattr(smasher, "status_generation", None)
+    for index in range(20):
+        smasher_client.xadd(smasher.stream_name, payment(index))
+    [[_, entries]] = smasher_client.xreadgroup(smasher.group_name, "worker", {smasher.stream_name: ">"}, count=20)
+    commit = smasher.transport.commit_batch
+
+    def failing_commit(*args):
+        raise ConnectionError("lost the connection mid-batch")
+
+    pipeline, message_ids, replies, expiring = smasher.process_batch("worker", 0, entries)
+    assert sorted(expireats(pipeline)) == sorted(expiring)
+    monkeypatch.setattr(smasher.transport, "commit_batch", failing_commit)
+    with pytest.raises(ConnectionError):
+        smasher.commit_batch("worker", pipeline, message_ids, replies, expiring)
+    assert not smasher.status_expiring
+
+    # The retried batch queues the expiries again, and only its commit marks them
+    monkeypatch.setattr(smasher.transport, "commit_batch", commit)
+    pipeline, message_ids, replies, expiring = smasher.process_batch("worker", 0, entries)
+    assert sorted(expireats(pipeline)) == sorted(expiring)
+    smasher.commit_batch("worker", pipeline, message_ids, replies, expiring)
+    assert smasher.status_expiring == expiring
+    assert all(smasher_client.ttl(key) > 0 for key in expiring)
+
+    pipeline, *_ = smasher.process_batch("worker", 0, entries)
+    assert not expireats(pipeline)
@@ -0,0 +1,26 @@
+import fakeredis
+
+from util_status_index import (lookup_statuses, parse_status_lookups, queue_status_lookups, status_bucket,
+                               status_key, status_ttl)
+
+
+def test_lookups_check_both_generations_and_the_latest_wins():
+    client = fakeredis.FakeRedis()
+    now = 10 * status_ttl + 5
+    client.hset(status_key(9, status_bucket("PIX1")), "PIX1", "confirmed|bank_a|1-0|1000")
+    client.hset(status_key(9, status_bucket("PIX2")), "PIX2", "confirmed|bank_a|1-1|1000")
+    client.hset(status_key(10, status_bucket("PIX2")), "PIX2", "refunded|bank_b|2-0|2000")
+
+    pipe = client.pipeline(transaction=False)
+    plan = queue_status_lookups(pipe, ["PIX1", "PIX2", "PIX3", "PIX1"], now=now)
+    statuses = parse_status_lookups(pipe.execute(), plan)
+
+    assert statuses["PIX1"] == {"status": "confirmed", "backend_id": "bank_a", "message_id": "1-0", "confirmed_at": 1.0}
+    assert statuses["PIX2"]["status"] == "refunded"
+    assert statuses["PIX3"] is None
+
+
+def test_failed_bucket_reads_count_as_not_found():
+    plan = [["PIX1"], ["PIX1"]]
+    assert parse_status_lookups([ConnectionError("down"), [None]], plan) == {"PIX1": None}
+    assert lookup_statuses(fakeredis.FakeRedis(), []) == {}
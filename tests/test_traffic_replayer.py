@@ -0,0 +1,23 @@
+import numpy as np
+
+from util_resp_pipe_loader import scan_window
+from util_traffic_replayer import TIMESTAMP_WIDTH, encode_xadds
+
+
+def test_encoded_xadds_are_whole_commands_once_the_timestamp_is_spliced_in():
+    columns = {
+        "transaction_id": np.array([b"PIX1", b"PIX2"], dtype=np.bytes_),
+        "backend_id": np.array([b"bank_a", b""], dtype=np.bytes_),
+        "amount_cents": np.array([1005, 7], dtype=np.int64),
+    }
+    timestamp = b"2024-01-01T12:00:00.000000"
+    assert len(timestamp) == TIMESTAMP_WIDTH
+
+    commands = [command + timestamp + b"\r\n" for command in encode_xadds(columns, [0, 1], "replay")]
+    buffer = b"".join(commands)
+    assert scan_window(buffer, 0, len(buffer), 100, len(buffer)) == (len(buffer), 2)
+    assert commands[0].split(b"\r\n")[2::2] == [b"XADD", b"replay", b"*", b"transaction_id", b"PIX1",
+                                                b"backend_id", b"bank_a", b"amount", b"10.05",
+                                                b"timestamp", timestamp]
+    assert b"backend_id" not in commands[1]  # Recorded without one: replayed without one
+    assert b"$4\r\n0.07\r\n" in commands[1]
@@ -0,0 +1,151 @@
+import gzip
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from util_payment_batch import generate_payment_batch
+
+try:
+    import zstandard
+except ImportError:  # zstd output is optional: pip install zstandard
+    zstandard = None
+
+# Parallel RESP bulk-file generator for `redis-cli --pipe` (or util_resp_pipe_loader.py).
+# The item range is split into chunks; a process pool renders each chunk into its own part file
+# through a large binary buffer, and the finished parts are concatenated in order. Parts are
+# written to a .tmp name and renamed when complete, so a crashed run resumes where it stopped.
+# Concatenated gzip members / zstd frames are valid streams, so compressed parts concatenate too.
+
+target = os.getenv("TARGET", "lpush").lower()  # lpush (list demos) or xadd (stream demos)
+total_items = int(os.getenv("TOTAL_ITEMS", 225_000_000))
+batch_size = int(os.getenv("BATCH_SIZE", 10000))  # Payments rendered per batch (and items per LPUSH)
+chunk_items = int(os.getenv("CHUNK_ITEMS", 1_000_000))  # Payments per part file / pool task
+num_workers = int(os.getenv("NUM_WORKERS", os.cpu_count() or 1))
+compression = os.getenv("COMPRESSION", "none").lower()  # none, gzip or zstd
+compression_level = int(os.getenv("COMPRESSION_LEVEL", 3))
+write_buffer_bytes = int(os.getenv("WRITE_BUFFER_MB", 8)) * 1024 * 1024
+backend_ids = [b for b in os.getenv("BACKEND_IDS", "").split(",") if b] or None  # e.g. "1,2,3,4"
+default_key = "source_list" if target == "lpush" else "pix_payments"
+key_name = os.getenv("KEY_NAME", default_key)  # List or stream the commands write to
+default_extension = {"none": "txt", "gzip": "txt.gz", "zstd": "txt.zst"}.get(compression, "txt")
+file_name = os.getenv("OUTPUT_FILE", f"bulk_load_pix_{target}_data.{default_extension}")
+
+
+def open_output(path, mode, compression, level):
+    """Binary file object for `path`, compressed on the fly if requested; closing it closes the file"""
+    if compression == "gzip":
+        # Compressed output is a fraction of the input, so GzipFile's own write buffer is enough
+        return gzip.open(path, mode, compresslevel=min(max(level, 1), 9))
+    raw = open(path, mode, buffering=write_buffer_bytes)
+    if compression == "none":
+        return raw
+    if compression == "zstd":
+        if zstandard is None:
+            raw.close()
+            raise RuntimeError("COMPRESSION=zstd requires the 'zstandard' package (pip install zstandard)")
+        return zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=True)
+    raw.close()
+    raise ValueError(f"Unknown compression '{compression}' (use none, gzip or zstd)")
+
+
+def render_chunk(params, chunk_index, start_id, count, part_path):
+    """Worker: render payments [start_id, start_id + count) into part_path; returns (index, raw bytes)"""
+    tmp_path = f"{part_path}.tmp"
+    raw_bytes = 0
+    with open_output(tmp_path, "wb", params["compression"], params["compression_level"]) as out:
+        for offset in range(start_id, start_id + count, params["batch_size"]):
+            batch = generate_payment_batch(min(params["batch_size"], start_id + count - offset),
+                                           start_id=offset, backend_ids=params["backend_ids"])
+            if params["target"] == "lpush":
+                payload = batch.to_resp_lpush(params["key_name"], items_per_command=params["batch_size"])
+            else:
+                payload = batch.to_resp_xadd(params["key_name"])
+            out.write(payload)
+            raw_bytes += len(payload)
+    os.replace(tmp_path, part_path)  # a part only exists once it is complete
+    return chunk_index, raw_bytes
+
+
+def prepare_parts_dir(parts_dir, params):
+    """Reuse finished parts from an interrupted run with the same parameters, otherwise start clean"""
+    manifest_path = os.path.join(parts_dir, "manifest.json")
+    if os.path.isdir(parts_dir):
+        try:
+            with open(manifest_path) as f:
+                if json.load(f) == params:
+                    for name in os.listdir(parts_dir):
+                        if name.endswith(".tmp"):
+                            os.remove(os.path.join(parts_dir, name))
+                    return
+        except (OSError, ValueError):
+            pass
+        print(f"Discarding parts in '{parts_dir}' (parameters changed or no manifest)")
+        shutil.rmtree(parts_dir)
+    os.makedirs(parts_dir)
+    with open(manifest_path, "w") as f:
+        json.dump(params, f)
+
+
+def generate_bulk_file(target, total_items, file_name, key_name, batch_size=10000, chunk_items=1_000_000,
+                       num_workers=1, compression="none", compression_level=3, backend_ids=None):
+    if target not in ("lpush", "xadd"):
+        raise ValueError(f"Unknown target '{target}' (use lpush or xadd)")
+    params = {
+        "target": target,
+        "total_items": total_items,
+        "key_name": key_name,
+        "batch_size": batch_size,
+        "chunk_items": chunk_items,
+        "compression": compression,
+        "compression_level": compression_level,
+        "backend_ids": backend_ids,
+    }
+    parts_dir = f"{file_name}.parts"
+    prepare_parts_dir(parts_dir, params)
+
+    chunks = [
+        (index, start, min(chunk_items, total_items - start), os.path.join(parts_dir, f"part-{index:06d}"))
+        for index, start in enumerate(range(0, total_items, chunk_items))
+    ]
+    pending = [chunk for chunk in chunks if not os.path.exists(chunk[3])]
+    if len(pending) < len(chunks):
+        print(f"Resuming: {len(chunks) - len(pending)}/{len(chunks)} chunks already generated")
+
+    print(f"Generating {total_items:,} {target.upper()} payments into '{file_name}' "
+          f"({len(pending)} chunks, {num_workers} workers, compression={compression})")
+    start_time = time.perf_counter()
+    generated_bytes = 0
+    completed = 0
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = [executor.submit(render_chunk, params, *chunk) for chunk in pending]
+        for future in as_completed(futures):
+            _, raw_bytes = future.result()
+            generated_bytes += raw_bytes
+            completed += 1
+            elapsed = time.perf_counter() - start_time
+            print(f"Progress: {completed}/{len(pending)} chunks, "
+                  f"{generated_bytes / 1e6:,.1f} MB at {generated_bytes / 1e6 / elapsed:,.1f} MB/sec")
+
+    # Stitch the parts together in order
+    with open(file_name, "wb", buffering=0) as out:
+        for _, _, _, part_path in chunks:
+            with open(part_path, "rb") as part:
+                shutil.copyfileobj(part, out, write_buffer_bytes)
+    shutil.rmtree(parts_dir)
+
+    elapsed = time.perf_counter() - start_time
+    output_bytes = os.path.getsize(file_name)
+    print(f"✅ Bulk load file '{file_name}' generated with {total_items:,} items for '{key_name}' in {elapsed:.2f}s")
+    if generated_bytes:
+        print(f"RESP generated: {generated_bytes / 1e6:,.1f} MB ({generated_bytes / 1e6 / elapsed:,.1f} MB/sec), "
+              f"written: {output_bytes / 1e6:,.1f} MB")
+    return output_bytes
+
+
+if __name__ == "__main__":
+    generate_bulk_file(target, total_items, file_name, key_name, batch_size=batch_size, chunk_items=chunk_items,
+                       num_workers=num_workers, compression=compression, compression_level=compression_level,
+                       backend_ids=backend_ids)
@@ -1,11 +1,12 @@
 import os
 import redis
-import time
+
+from util_progress import report_progress, server_time_us, start_progress, wait_for_completion
+from util_sharded_counters import reset_counters
 
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 source_queue = os.getenv("REDIS_LIST", "source_list")
-counter_key = "processed_count"  # This key tracks the number of processed messages
 list_size = int(os.getenv("LIST_SIZE", 10000))
 
 # Initialize Redis connection
@@ -18,7 +19,8 @@ def inject_messages(list_size):
 
     # Clear existing items in source queue and counter
     redis_client.delete(source_queue)
-    redis_client.delete(counter_key)
+    reset_counters(redis_client)  # processed_count, total_amount and all their shards
+    start_progress(redis_client, list_size)
     print("Cleaned up existing messages and counter.")
 
     # Generate the range of items and push them in a single LPUSH command
@@ -27,37 +29,14 @@ def inject_messages(list_size):
 
     print(f"Injected {list_size} messages into {source_queue} in a single LPUSH.")
 
-# Monitor function to track processed messages
-def monitor_processed_count():
-    print("Starting to monitor processed messages...")
-    start_time = None  # Initialize start time for first message
-    end_time = None    # Initialize end time for last message
-
-    while True:
-        # Fetch current count from the counter key
-        processed_count = redis_client.get(counter_key)
-        processed_count = int(processed_count) if processed_count else 0
-        print(f"Total messages processed: {processed_count}")
-
-        # Record the start time when the first message is processed
-        if processed_count > 0 and start_time is None:
-            start_time = time.time()
-            print("Processing started...")
-
-        # Record the end time when the last message is processed
-        if processed_count >= list_size:
-            end_time = time.time()
-            print("All messages processed.")
-            break
-
-        time.sleep(1)  # Poll every second
-
-    # Calculate the total processing time
-    if start_time and end_time:
-        total_time = end_time - start_time
-        print(f"Total time to process all messages: {total_time:.2f} seconds")
+# Wait for the consumers' progress marks instead of polling the counter
+def monitor_processed_count(injection_start_us, injection_end_us):
+    print("Waiting for consumers to process all messages...")
+    marks = wait_for_completion(redis_client, list_size)
+    report_progress(marks, list_size, injection_start_us, injection_end_us)
 
 if __name__ == "__main__":
     # Inject messages and start monitoring
+    injection_start_us = server_time_us(redis_client)
     inject_messages(list_size)
-    monitor_processed_count()
\ No newline at end of file
+    monitor_processed_count(injection_start_us, server_time_us(redis_client))
@@ -0,0 +1,125 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import redis
+
+# Burst latency test for Redis Streams: K producer/consumer pairs run as separate processes, every
+# message carries the wall-clock time it was produced, and latency is taken at the consumer that
+# actually received it. Producers and consumers share one stream and consumer group, so consumers
+# compete for messages the way the PIX consumers do.
+#
+# Wall-clock nanoseconds (time.time_ns) are used because perf_counter is not comparable across
+# processes; producers and consumers run on the same host, so they share the clock.
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+
+def _wait_for(client, key, expected, timeout):
+    deadline = time.time() + timeout
+    while int(client.get(key) or 0) < expected:
+        if time.time() > deadline:
+            raise TimeoutError(f"Timed out waiting for {expected} workers on {key}")
+        time.sleep(0.01)
+
+
+def _producer(url, stream, keys, consumers, count, pipeline_size, payload, timeout):
+    """XADD count messages, pipeline_size at a time, once every consumer is blocked and ready"""
+    client = redis.from_url(url)
+    ready_key, done_key = keys
+    _wait_for(client, ready_key, consumers, timeout)
+
+    first_sent_ns = time.time_ns()
+    sent = 0
+    while sent < count:
+        size = min(pipeline_size, count - sent)
+        pipe = client.pipeline(transaction=False)
+        for _ in range(size):
+            pipe.xadd(stream, {"sent_ns": time.time_ns(), "content": payload})
+        pipe.execute()
+        sent += size
+
+    client.incr(done_key)
+    return first_sent_ns
+
+
+def _consumer(url, stream, group, consumer_name, keys, producers, read_count, timeout):
+    """Read until every producer is done and the group is drained; return latencies (ms) and last receive time"""
+    client = redis.from_url(url)
+    ready_key, done_key = keys
+    client.incr(ready_key)
+
+    latencies = []
+    last_received_ns = 0
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        # Check before reading: an empty read after all producers finished means nothing is left
+        producers_done = int(client.get(done_key) or 0) >= producers
+        response = client.xreadgroup(group, consumer_name, {stream: ">"}, count=read_count, block=100)
+        if not response:
+            if producers_done:
+                break
+            continue
+
+        last_received_ns = time.time_ns()
+        entries = response[0][1]
+        latencies.extend((last_received_ns - int(fields[b"sent_ns"])) / 1e6 for _, fields in entries)
+        client.xack(stream, group, *[message_id for message_id, _ in entries])
+
+    return np.array(latencies), last_received_ns
+
+
+def run_burst(url, stream, group, total_messages, concurrency, pipeline_size=1, read_count=100,
+              payload_size=64, timeout=120):
+    """Send total_messages through `concurrency` producer/consumer process pairs and collect per-message latency"""
+    client = redis.from_url(url)
+    keys = (f"{stream}:ready", f"{stream}:done")
+    client.delete(stream, *keys)
+    client.xgroup_create(stream, group, id="0", mkstream=True)
+
+    payload = "x" * payload_size
+    shares = [total_messages // concurrency + (1 if i < total_messages % concurrency else 0)
+              for i in range(concurrency)]
+    try:
+        with ProcessPoolExecutor(max_workers=2 * concurrency) as pool:
+            consumers = [pool.submit(_consumer, url, stream, group, f"burst_consumer_{i}", keys, concurrency,
+                                     read_count, timeout)
+                         for i in range(concurrency)]
+            producers = [pool.submit(_producer, url, stream, keys, concurrency, share, pipeline_size, payload,
+                                     timeout)
+                         for share in shares]
+            first_sent_ns = min(future.result() for future in producers)
+            results = [future.result() for future in consumers]
+    finally:
+        client.delete(stream, *keys)
+
+    latencies = np.concatenate([latencies for latencies, _ in results])
+    elapsed = max((last for _, last in results), default=first_sent_ns) - first_sent_ns
+    elapsed_s = max(elapsed / 1e9, 1e-9)
+    return {
+        "concurrency": concurrency,
+        "pipeline_size": pipeline_size,
+        "sent": total_messages,
+        "received": len(latencies),
+        "elapsed_s": elapsed_s,
+        "throughput": len(latencies) / elapsed_s,
+        "latencies_ms": latencies,
+    }
+
+
+def run_sweep(url, stream, group, total_messages, concurrency_levels, pipeline_size=1, **kwargs):
+    """run_burst once per concurrency level"""
+    return [run_burst(url, stream, group, total_messages, level, pipeline_size, **kwargs)
+            for level in concurrency_levels]
+
+
+if __name__ == "__main__":
+    stream = os.getenv("LATENCY_TEST_STREAM", "latency_test_stream") + "_burst"
+    levels = [int(level) for level in os.getenv("CONCURRENCY_LEVELS", "1,2,4,8").split(",")]
+    for result in run_sweep(redis_url, stream, "latency_burst_group", int(os.getenv("NUM_MESSAGES", 10000)),
+                            levels, int(os.getenv("PIPELINE_SIZE", 1))):
+        latencies = result["latencies_ms"]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0, 0, 0)
+        print(f"K={result['concurrency']:>3}: {result['received']:,}/{result['sent']:,} messages, "
+              f"{result['throughput']:,.0f} msg/s | p50 {p50:.3f} ms | p95 {p95:.3f} ms | p99 {p99:.3f} ms")
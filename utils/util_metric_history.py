@@ -0,0 +1,138 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# Fixed-size history of monitor samples plus the helpers the TUI draws from it.
+# Samples live in one preallocated NumPy array used as a ring buffer, so recording a tick is a
+# single row write and reading a window is at most two slices - no per-tick allocation.
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+class MetricHistory:
+    """Ring buffer of per-tick samples: one row per tick, one column per metric"""
+
+    def __init__(self, metrics, capacity):
+        self.metrics = list(metrics)
+        self.columns = {name: index for index, name in enumerate(self.metrics)}
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity)
+        self.values = np.full((capacity, len(self.metrics)), np.nan)
+        self.head = 0  # next row to write
+        self.count = 0
+        self.total = 0  # Samples ever recorded: the sequence number of the newest one
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, sample):
+        """Record one tick; metrics missing from sample are stored as NaN"""
+        row = self.values[self.head]
+        row[:] = np.nan
+        for name, value in sample.items():
+            column = self.columns.get(name)
+            if column is not None and value is not None:
+                row[column] = value
+        self.timestamps[self.head] = timestamp
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.total += 1
+
+    def _window(self, array, last):
+        last = min(last or self.count, self.count)
+        start = (self.head - last) % self.capacity
+        if start + last <= self.capacity:
+            return array[start:start + last]
+        return np.concatenate((array[start:], array[:self.head]))
+
+    def series(self, name, last=None):
+        """Oldest-to-newest values of one metric over the last `last` ticks (default: everything kept)"""
+        return self._window(self.values[:, self.columns[name]], last)
+
+    def times(self, last=None):
+        return self._window(self.timestamps, last)
+
+    def latest(self, name):
+        if not self.count:
+            return None
+        value = self.values[(self.head - 1) % self.capacity, self.columns[name]]
+        return None if np.isnan(value) else float(value)
+
+
+class EwmaRate:
+    """
+    Rate of a monotonically increasing counter, smoothed like the Unix load average: each tick the
+    instantaneous rate is blended in with weight 1 - exp(-dt / window), so irregular tick intervals
+    are handled and the 1/5/15-minute averages mean what they say.
+    """
+
+    def __init__(self, windows_seconds=(60, 300, 900)):
+        self.windows = windows_seconds
+        self.rates = [None] * len(windows_seconds)
+        self.instant = None  # unsmoothed rate over the last interval
+        self.last_time = None
+        self.last_value = None
+
+    def update(self, timestamp, counter):
+        if self.last_time is not None and timestamp > self.last_time:
+            dt = timestamp - self.last_time
+            # A counter reset (keys deleted between runs) restarts the rate instead of going negative
+            self.instant = max(counter - self.last_value, 0) / dt
+            for index, window in enumerate(self.windows):
+                if self.rates[index] is None:
+                    self.rates[index] = self.instant
+                else:
+                    alpha = 1 - math.exp(-dt / window)
+                    self.rates[index] += alpha * (self.instant - self.rates[index])
+        self.last_time = timestamp
+        self.last_value = counter
+        return self.rates
+
+
+class Sparkline:
+    """
+    Sparkline of the last `width` samples, updated incrementally: while the window's min/max scale
+    is unchanged, exactly one new sample only appends one character; the full line is redrawn
+    (vectorized) when the scale moves or several samples arrived since the last update.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.chars = deque(maxlen=width)
+        self.scale = None
+        self.newest = None  # Sequence number of the newest sample drawn
+
+    def _char_indices(self, values, low, high):
+        if high <= low:
+            return np.zeros(len(values), dtype=int)
+        scaled = (values - low) / (high - low) * (len(SPARK_BLOCKS) - 1)
+        return np.clip(np.rint(np.nan_to_num(scaled)), 0, len(SPARK_BLOCKS) - 1).astype(int)
+
+    def update(self, window, newest):
+        """
+        window: oldest-to-newest values ending with the newest sample (at most `width` of them);
+        newest: that sample's sequence number (MetricHistory.total), so a repeated call draws nothing new
+        """
+        window = window[-self.width:]
+        if not len(window):
+            return ""
+        if newest == self.newest:
+            return "".join(self.chars)  # No sample since the last update, e.g. a stale target re-rendered
+        new_samples = None if self.newest is None else newest - self.newest
+        self.newest = newest
+        finite = window[~np.isnan(window)]
+        scale = (float(finite.min()), float(finite.max())) if len(finite) else (0.0, 0.0)
+        # Exactly one sample since the last update: the window grew by one, or slid by one once full
+        drawn = len(self.chars)
+        if (scale == self.scale and new_samples == 1
+                and (drawn == len(window) - 1 or drawn == len(window) == self.width)):
+            index = self._char_indices(window[-1:], *scale)[0]
+            self.chars.append(" " if np.isnan(window[-1]) else SPARK_BLOCKS[index])
+        else:
+            indices = self._char_indices(window, *scale)
+            self.chars.clear()
+            self.chars.extend(" " if np.isnan(value) else SPARK_BLOCKS[index]
+                              for value, index in zip(window, indices))
+            self.scale = scale
+        return "".join(self.chars)
@@ -1,10 +1,9 @@
 import os
 import redis
-import json
-from datetime import datetime
-import random
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from util_payment_batch import generate_payment_batch, send_resp_commands
+
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 inbound_stream_name = os.getenv("REDIS_STREAM", "pix_payments")  # Stream name for PIX payments
@@ -19,24 +18,12 @@ num_threads = int(os.getenv("NUM_THREADS", 5))  # Number of parallel threads
 # Initialize Redis connection
 redis_client = redis.from_url(redis_url)
 
-# Generate a single PIX payment message
-def generate_pix_payment(transaction_id):
-    assigned_backend_id = random.choice(backend_ids) if randomize_backend_id else backend_id
-    return {
-        "transaction_id": transaction_id,
-        "backend_id": assigned_backend_id,
-        "amount": round(random.uniform(1, 1000), 2),  # Random amount between 1 and 1000 BRL
-        "timestamp": datetime.now().isoformat()  # Current timestamp
-    }
-
-# Function to inject a batch of PIX payment messages using a pipeline
+# Function to inject a batch of PIX payment messages as one pre-encoded RESP write
 def inject_batch(batch_size):
-    with redis_client.pipeline() as pipe:
-        for _ in range(batch_size):
-            transaction_id = f"txn_{random.randint(100000, 999999)}"  # Random transaction ID
-            pix_message = generate_pix_payment(transaction_id)
-            pipe.xadd(inbound_stream_name, pix_message)
-        pipe.execute()
+    batch = generate_payment_batch(batch_size, backend_ids=backend_ids if randomize_backend_id else backend_id)
+    errors = send_resp_commands(redis_client, batch.to_resp_xadd(inbound_stream_name), len(batch))
+    if errors:
+        raise RuntimeError(f"{errors} of {len(batch)} XADDs failed")
 
 # Function to handle multithreaded injection
 def inject_multiple_messages(num_requests, batch_size, num_threads):
@@ -0,0 +1,346 @@
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+import redis
+
+# Shared vectorized PIX payment generator.
+# Every producer used to call generate_pix_payment() once per message (random.uniform, round,
+# datetime.now().isoformat(), random.randint). Here a whole batch is generated at once with NumPy
+# and emitted as redis-py field dicts, JSON strings (list demos) or pre-encoded RESP bytes.
+#
+# Rendering never formats one value at a time: every output row is assembled as a uint8 matrix of
+# ASCII bytes plus a keep-mask (variable-width numbers are right-aligned and their leading zeros
+# masked out), so matrix[mask].tobytes() yields the whole batch in a single copy.
+
+DEFAULT_BACKEND_IDS = [f"{i}" for i in range(1, 5)]  # BE IDs: 1, 2, 3, 4
+
+_rng = np.random.default_rng()
+
+
+def _const_segment(size, data):
+    """The same bytes on every row (mask None = every byte kept)"""
+    row = np.frombuffer(data, dtype=np.uint8)
+    return np.broadcast_to(row, (size, len(row))), None
+
+
+# "00".."99" as 2-byte ASCII words, so digits are produced two at a time by a single gather
+_DIGIT_PAIRS = np.frombuffer("".join(f"{i:02d}" for i in range(100)).encode(), dtype=np.uint16)
+
+
+def _digits(values, width):
+    """(n, width) ASCII matrix of zero-padded decimal digits of non-negative ints"""
+    pairs = (width + 1) // 2
+    out = np.empty((len(values), pairs), dtype=np.uint16)
+    remaining = values
+    for pair in range(pairs - 1, -1, -1):
+        out[:, pair] = _DIGIT_PAIRS[remaining % 100]
+        remaining = remaining // 100
+    return out.view(np.uint8)[:, pairs * 2 - width:]
+
+
+def _fixed_digits_segment(values, width):
+    """Zero-padded decimal digits of non-negative ints, always `width` characters"""
+    return _digits(values, width), None
+
+
+def _int_segment(values):
+    """Decimal digits of non-negative ints, leading zeros masked out (at least one digit kept)"""
+    width = len(str(int(values.max()))) if len(values) else 1
+    if width == 1:
+        return _digits(values, 1), None
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    mask = values[:, None] >= powers
+    mask[:, -1] = True
+    if mask.all():
+        return _digits(values, width), None
+    return _digits(values, width), mask
+
+
+def _table_segment(labels, index):
+    """labels[index] for every row, where labels are arbitrary (possibly non-ASCII) strings"""
+    encoded = [label.encode("utf-8") for label in labels]
+    width = max(len(label) for label in encoded)
+    table = np.zeros((len(encoded), width), dtype=np.uint8)
+    for row, label in enumerate(encoded):
+        table[row, :len(label)] = np.frombuffer(label, dtype=np.uint8)
+    lengths = np.array([len(label) for label in encoded])
+    if (lengths == width).all():
+        return table[index], None
+    return table[index], np.arange(width) < lengths[index][:, None]
+
+
+def _segment_lengths(segments):
+    """Rendered byte length of every row"""
+    size = segments[0][0].shape[0]
+    lengths = np.zeros(size, dtype=np.int64)
+    for matrix, mask in segments:
+        lengths += matrix.shape[1] if mask is None else np.count_nonzero(mask, axis=1)
+    return lengths
+
+
+def _render(segments):
+    """Concatenate the segments row by row into one bytes blob"""
+    size = segments[0][0].shape[0]
+    if size == 0:
+        return b""
+    widths = [matrix.shape[1] for matrix, _ in segments]
+    starts = np.concatenate(([0], np.cumsum(widths)))
+
+    # Constant (broadcast) segments go into a template row that is copied to every row at once;
+    # only the per-row segments are written column by column
+    template = np.zeros(starts[-1], dtype=np.uint8)
+    for (matrix, _), start, width in zip(segments, starts, widths):
+        if matrix.strides[0] == 0:
+            template[start:start + width] = matrix[0]
+    out = np.empty((size, starts[-1]), dtype=np.uint8)
+    out[:] = template
+
+    keep = None
+    for (matrix, mask), start, width in zip(segments, starts, widths):
+        if matrix.strides[0] != 0:
+            out[:, start:start + width] = matrix
+        if mask is not None:
+            if keep is None:
+                keep = np.ones(out.shape, dtype=bool)
+            keep[:, start:start + width] = mask
+    return out.tobytes() if keep is None else out[keep].tobytes()
+
+
+class PixPaymentBatch:
+    """Column-oriented batch of PIX payments (one NumPy array per field)"""
+
+    def __init__(self, transaction_numbers, amount_cents, timestamp, backend_labels=None, backend_index=None,
+                 random_ids=True, id_prefix=""):
+        self.transaction_numbers = transaction_numbers  # int64 array, rendered as txn_NNNNNN or bare ints
+        self.amount_cents = amount_cents  # int64 array, amounts in centavos (1.00 - 1000.00 BRL)
+        self.timestamp = timestamp  # ISO timestamp shared by the whole batch
+        self.backend_labels = backend_labels  # list of backend IDs, or None when payments carry no backend_id
+        self.backend_index = backend_index  # int array indexing backend_labels
+        self.random_ids = random_ids
+        self.id_prefix = id_prefix  # prepended to sequential IDs
+
+    def __len__(self):
+        return len(self.amount_cents)
+
+    @property
+    def total_amount(self):
+        """Sum of the batch in BRL, computed from the integer centavos (no float drift)"""
+        return int(self.amount_cents.sum()) / 100
+
+    def field_segments(self):
+        """Ordered (field name, value segments, is_number) triples, in the field order producers always used"""
+        size = len(self)
+        if self.random_ids:
+            transaction_id = [_const_segment(size, b"txn_"), _fixed_digits_segment(self.transaction_numbers, 6)]
+        elif self.id_prefix:
+            transaction_id = [_const_segment(size, self.id_prefix.encode("utf-8")), _int_segment(self.transaction_numbers)]
+        else:
+            transaction_id = [_int_segment(self.transaction_numbers)]
+        fields = [("transaction_id", transaction_id, False)]
+        if self.backend_labels is not None:
+            fields.append(("backend_id", [_table_segment(self.backend_labels, self.backend_index)], False))
+        amount = [
+            _int_segment(self.amount_cents // 100),
+            _const_segment(size, b"."),
+            _fixed_digits_segment(self.amount_cents % 100, 2),
+        ]
+        fields.append(("amount", amount, True))
+        fields.append(("timestamp", [_const_segment(size, self.timestamp.encode())], False))
+        return fields
+
+    def column(self, name):
+        """One field as a list of str"""
+        for field, segments, _ in self.field_segments():
+            if field == name:
+                blob = _render(segments + [_const_segment(len(self), b"\n")])
+                return blob.decode("utf-8").split("\n")[:-1]
+        raise KeyError(name)
+
+    def to_dicts(self):
+        """List of field dicts, ready for redis-py xadd()"""
+        names = [name for name, _, _ in self.field_segments()]
+        columns = [self.column(name) for name in names]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+    def json_segments(self):
+        """Segments of one JSON object per row (same shape json.dumps produced for the list demos)"""
+        size = len(self)
+        segments = []
+        for index, (name, values, is_number) in enumerate(self.field_segments()):
+            separator = "{" if index == 0 else ", "
+            quote = b"" if is_number else b'"'
+            segments.append(_const_segment(size, f'{separator}"{name}": '.encode() + quote))
+            segments.extend(values)
+            segments.append(_const_segment(size, quote))
+        segments.append(_const_segment(size, b"}"))
+        return segments
+
+    def to_json(self):
+        """List of JSON strings, ready for LPUSH"""
+        blob = _render(self.json_segments() + [_const_segment(len(self), b"\n")])
+        return blob.decode("utf-8").split("\n")[:-1]
+
+    def to_resp_xadd(self, stream_name):
+        """One RESP-encoded 'XADD <stream> * field value ...' command per payment, as a single bytes blob"""
+        size = len(self)
+        fields = self.field_segments()
+        stream = stream_name.encode("utf-8")
+        header = b"*%d\r\n$4\r\nXADD\r\n$%d\r\n%s\r\n$1\r\n*\r\n" % (3 + 2 * len(fields), len(stream), stream)
+        segments = [_const_segment(size, header)]
+        for name, values, _ in fields:
+            segments.append(_const_segment(size, b"$%d\r\n%s\r\n$" % (len(name), name.encode())))
+            segments.append(_int_segment(_segment_lengths(values)))
+            segments.append(_const_segment(size, b"\r\n"))
+            segments.extend(values)
+            segments.append(_const_segment(size, b"\r\n"))
+        return _render(segments)
+
+    def to_resp_lpush(self, list_name, items_per_command=10000):
+        """RESP-encoded 'LPUSH <list> json ...' commands carrying up to items_per_command payments each"""
+        size = len(self)
+        values = self.json_segments()
+        segments = [_const_segment(size, b"$"), _int_segment(_segment_lengths(values)), _const_segment(size, b"\r\n")]
+        segments.extend(values)
+        segments.append(_const_segment(size, b"\r\n"))
+        items = _render(segments)
+        offsets = np.concatenate(([0], np.cumsum(_segment_lengths(segments))))
+
+        name = list_name.encode("utf-8")
+        chunks = []
+        for start in range(0, size, items_per_command):
+            end = min(start + items_per_command, size)
+            chunks.append(b"*%d\r\n$5\r\nLPUSH\r\n$%d\r\n%s\r\n" % (end - start + 2, len(name), name))
+            chunks.append(items[offsets[start]:offsets[end]])
+        return b"".join(chunks)
+
+
+def encode_resp_command(*args):
+    """Encode a single command as RESP bytes, using the UTF-8 byte length of every argument"""
+    encoded = [arg if isinstance(arg, bytes) else str(arg).encode("utf-8") for arg in args]
+    out = [b"*%d\r\n" % len(encoded)]
+    for arg in encoded:
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+def send_resp_commands(redis_client, payload, command_count, failed=None):
+    """
+    Write pre-encoded RESP commands on one pooled connection and read back their replies.
+    Skips redis-py's per-command packing entirely; returns the number of error replies.
+    A failed list, if given, receives the position in the payload of every command that got one.
+    """
+    connection = redis_client.connection_pool.get_connection("PIPELINE")
+    errors = 0
+    try:
+        connection.send_packed_command([payload])
+        for index in range(command_count):
+            try:
+                connection.read_response(disable_decoding=True)
+            except redis.exceptions.ResponseError:
+                errors += 1
+                if failed is not None:
+                    failed.append(index)
+    except BaseException:
+        connection.disconnect()  # replies may be left unread, never hand this connection out again
+        raise
+    finally:
+        redis_client.connection_pool.release(connection)
+    return errors
+
+
+def generate_payment_batch(size, start_id=None, backend_ids=None, rng=None, id_prefix=""):
+    """
+    Generate `size` PIX payments at once.
+
+    start_id=None gives random 'txn_NNNNNN' transaction IDs (simulators); an int gives sequential
+    IDs start_id, start_id + 1, ... behind an optional id_prefix (injectors, bulk loaders, and
+    simulators that need unique IDs). backend_ids may be None (no backend_id field), a single ID,
+    or a list of IDs assigned uniformly at random.
+    """
+    rng = rng or _rng
+
+    if start_id is None:
+        transaction_numbers = rng.integers(100000, 1000000, size)
+    else:
+        transaction_numbers = np.arange(start_id, start_id + size, dtype=np.int64)
+
+    amount_cents = rng.integers(100, 100001, size)  # 1.00 - 1000.00 BRL
+
+    if backend_ids is None:
+        backend_labels = None
+        backend_index = None
+    elif isinstance(backend_ids, str):
+        backend_labels = [backend_ids]
+        backend_index = np.zeros(size, dtype=np.int64)
+    else:
+        backend_labels = list(backend_ids)
+        backend_index = rng.integers(0, len(backend_labels), size)
+
+    # One timestamp per batch - a batch is generated within microseconds anyway
+    timestamp = datetime.now().isoformat()
+
+    return PixPaymentBatch(transaction_numbers, amount_cents, timestamp, backend_labels, backend_index,
+                           random_ids=start_id is None, id_prefix=id_prefix)
+
+
+# Benchmark: per-message generation (the old generate_pix_payment) vs. vectorized batches
+def _generate_pix_payment_scalar(transaction_id, backend_ids):
+    return {
+        "transaction_id": transaction_id,
+        "backend_id": random.choice(backend_ids),
+        "amount": round(random.uniform(1, 1000), 2),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def _resp_xadd_scalar(stream_name, message):
+    proto = f"*{3 + 2 * len(message)}\r\n$4\r\nXADD\r\n${len(stream_name)}\r\n{stream_name}\r\n$1\r\n*\r\n"
+    for key, value in message.items():
+        value_str = str(value)
+        proto += f"${len(key)}\r\n{key}\r\n${len(value_str)}\r\n{value_str}\r\n"
+    return proto
+
+
+def run_benchmark(total, batch_size):
+    print(f"Generating {total:,} payments (batch size {batch_size:,})")
+    print("-" * 70)
+
+    scalar = [
+        ("dicts", lambda: _generate_pix_payment_scalar(
+            f"txn_{random.randint(100000, 999999)}", DEFAULT_BACKEND_IDS)),
+        ("JSON", lambda: json.dumps(_generate_pix_payment_scalar(
+            f"txn_{random.randint(100000, 999999)}", DEFAULT_BACKEND_IDS))),
+        ("RESP XADD", lambda: _resp_xadd_scalar("pix_payments", _generate_pix_payment_scalar(
+            f"txn_{random.randint(100000, 999999)}", DEFAULT_BACKEND_IDS)).encode()),
+    ]
+    batched = [
+        ("dicts", lambda batch: batch.to_dicts()),
+        ("RESP XADD", lambda batch: batch.to_resp_xadd("pix_payments")),
+        ("JSON", lambda batch: batch.to_json()),
+        ("RESP LPUSH", lambda batch: batch.to_resp_lpush("source_list")),
+    ]
+
+    baselines = {}
+    for label, generate in scalar:
+        start = time.perf_counter()
+        for _ in range(total):
+            generate()
+        elapsed = time.perf_counter() - start
+        baselines[label] = elapsed
+        print(f"{'per-message ' + label:<24}{elapsed:8.3f}s {total / elapsed:14,.0f} msg/sec")
+
+    for label, emit in batched:
+        start = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            emit(generate_payment_batch(min(batch_size, total - offset), backend_ids=DEFAULT_BACKEND_IDS))
+        elapsed = time.perf_counter() - start
+        speedup = f"  ({baselines[label] / elapsed:.1f}x)" if label in baselines else ""
+        print(f"{'batch ' + label:<24}{elapsed:8.3f}s {total / elapsed:14,.0f} msg/sec{speedup}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(os.getenv("NUM_REQUESTS", 1_000_000)), int(os.getenv("BATCH_SIZE", 10000)))
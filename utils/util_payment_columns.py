@@ -0,0 +1,103 @@
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Column-oriented payment files, shared by the archiver (pix_archiver.py) and the traffic recorder and
+# replayer. A file is a zip-deflated .npz with one NumPy array per column:
+#   id_ms, id_seq       stream entry ID (id_ms is also the arrival time, in ms)
+#   transaction_id      fixed-width bytes
+#   backend_code        index into backend_labels (dictionary encoded; b"" = no backend_id field)
+#   amount_cents        int64
+#   created_ms          the producer's timestamp field, epoch ms (-1 when missing or malformed)
+
+
+def parse_id(message_id):
+    ms, seq = message_id.split(b"-") if isinstance(message_id, bytes) else message_id.split("-")
+    return int(ms), int(seq)
+
+
+def format_id(ms, seq):
+    return f"{ms}-{seq}"
+
+
+class ColumnBuffer:
+    """Stream entries awaiting the next file, kept as one list per column"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.id_ms, self.id_seq, self.transaction_id, self.backend_code = [], [], [], []
+        self.amount_cents, self.created_ms = [], []
+        self.backend_labels = {}  # backend_id -> code, per file
+        self.started = None  # When the first row was buffered
+
+    def __len__(self):
+        return len(self.id_ms)
+
+    def append(self, entries):
+        """Add XRANGE entries; the producer's timestamp is parsed once per distinct value (batches share one)"""
+        if entries and not self.id_ms:
+            self.started = time.time()
+        last_timestamp, last_created = None, -1
+        for message_id, fields in entries:
+            ms, seq = parse_id(message_id)
+            self.id_ms.append(ms)
+            self.id_seq.append(seq)
+            self.transaction_id.append(fields.get(b"transaction_id", b""))
+            backend_id = fields.get(b"backend_id", b"")
+            self.backend_code.append(self.backend_labels.setdefault(backend_id, len(self.backend_labels)))
+            try:
+                self.amount_cents.append(round(float(fields.get(b"amount", 0)) * 100))
+            except ValueError:
+                self.amount_cents.append(0)
+            timestamp = fields.get(b"timestamp")
+            if timestamp != last_timestamp:
+                last_timestamp = timestamp
+                try:
+                    last_created = int(datetime.fromisoformat(timestamp.decode()).timestamp() * 1000)
+                except (AttributeError, ValueError):
+                    last_created = -1  # Missing or malformed
+            self.created_ms.append(last_created)
+
+    def columns(self):
+        return {
+            "id_ms": np.array(self.id_ms, dtype=np.int64),
+            "id_seq": np.array(self.id_seq, dtype=np.int64),
+            "transaction_id": np.array(self.transaction_id, dtype=np.bytes_),
+            "backend_code": np.array(self.backend_code, dtype=np.int32),
+            "backend_labels": np.array(list(self.backend_labels), dtype=np.bytes_),
+            "amount_cents": np.array(self.amount_cents, dtype=np.int64),
+            "created_ms": np.array(self.created_ms, dtype=np.int64),
+        }
+
+
+def write_columns(path, buffer):
+    """Write the buffer to path through a temp file, fsync and rename, so readers never see a partial file"""
+    with open(path + ".tmp", "wb") as output:
+        np.savez_compressed(output, **buffer.columns())
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def read_columns(path):
+    """Columns of one file, with the backend decoded back to one label per row"""
+    with np.load(path) as payments:
+        columns = {name: payments[name] for name in payments.files}
+    columns["backend_id"] = columns.pop("backend_labels")[columns.pop("backend_code")]
+    return columns
+
+
+def summarize_columns(path, columns):
+    """Print rows, ID range and amounts per backend of one file"""
+    print(f"{path}: {len(columns['id_ms']):,} entries, {format_id(columns['id_ms'][0], columns['id_seq'][0])} to "
+          f"{format_id(columns['id_ms'][-1], columns['id_seq'][-1])}, "
+          f"BRL {columns['amount_cents'].sum() / 100:,.2f}")
+    labels, codes = np.unique(columns["backend_id"], return_inverse=True)
+    counts = np.bincount(codes, minlength=len(labels))
+    amounts = np.bincount(codes, weights=columns["amount_cents"], minlength=len(labels))
+    for label, count, amount in zip(labels, counts, amounts):
+        print(f"  {label.decode() or '(none)':<24} {count:>12,} BRL {amount / 100:>18,.2f}")
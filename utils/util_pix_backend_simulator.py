@@ -1,68 +1,110 @@
 import os
 import redis
-import json
-from datetime import datetime
-import random
+import threading
 import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError, wait
+
+import numpy as np
+
+from util_payment_batch import generate_payment_batch, send_resp_commands
+from util_response_correlator import ResponseCorrelator
 
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 inbound_stream_name = os.getenv("REDIS_STREAM", "pix_payments")  # Stream name for PIX payments
 backend_id = os.getenv("BACKEND_ID", "1")  # Backend ID, replace with desired ID
 backend_response_prefix = os.getenv("BACKEND_RESPONSE_PREFIX", "backend_bacen_response_")  # Prefix for backend response streams
+num_payments = int(os.getenv("NUM_PAYMENTS", 1))  # Payments to send; 1 = single payment with full confirmation output
+max_inflight = int(os.getenv("MAX_INFLIGHT", 1000))  # Payments awaiting confirmation at once
+batch_size = int(os.getenv("BATCH_SIZE", 100))  # Payments per pipelined XADD write
+confirmation_timeout = float(os.getenv("CONFIRMATION_TIMEOUT", 30))  # Seconds to wait for a confirmation
 
 # Initialize Redis connection
 redis_client = redis.from_url(redis_url)
 
-
-# Generate a single PIX payment message
-def generate_pix_payment(transaction_id, backend_id):
-    return {
-        "transaction_id": transaction_id,
-        "backend_id": backend_id,
-        "amount": round(random.uniform(1, 1000), 2),  # Random amount between 1 and 1000 BRL
-        "timestamp": datetime.now().isoformat()  # Current timestamp
-    }
+backend_response_stream = f"{backend_response_prefix}{backend_id}"  # Response stream for this backend
+# Transaction IDs must be unique while thousands are in flight, across processes too
+run_prefix = f"txn_{backend_id}_{uuid.uuid4().hex[:8]}_"
 
 
 # Function to inject a single PIX payment message and wait for confirmation
 def inject_and_wait_for_confirmation():
-    transaction_id = f"txn_{random.randint(100000, 999999)}"  # Random transaction ID
-    backend_response_stream = f"{backend_response_prefix}{backend_id}"  # Response stream for this backend
-    group_name = f"response_group_{backend_id}"  # Consumer group name unique to this backend ID
-    consumer_name = f"consumer_{backend_id}"
+    correlator = ResponseCorrelator(redis_client, backend_response_stream).start()
+    try:
+        pix_message = generate_payment_batch(1, start_id=0, id_prefix=run_prefix, backend_ids=backend_id).to_dicts()[0]
+        transaction_id = pix_message["transaction_id"]
+
+        # Register before sending, so a fast confirmation can't be missed
+        future = correlator.expect(transaction_id)
+        redis_client.xadd(inbound_stream_name, pix_message)
+        print(f"Sent PIX message to {inbound_stream_name} for transaction {transaction_id}")
+
+        print(f"Waiting for confirmation on stream {backend_response_stream}...")
+        try:
+            confirmation, latency_ms = future.result(timeout=confirmation_timeout)
+            print(f"Received confirmation for transaction {transaction_id} in {latency_ms:.3f} ms: {confirmation}")
+        except FutureTimeoutError:
+            correlator.forget(transaction_id)
+            print(f"No confirmation for transaction {transaction_id} after {confirmation_timeout}s")
+    finally:
+        correlator.stop()
+
+
+# Function to keep up to max_inflight payments awaiting confirmation, measuring each round trip
+def inject_concurrent(num_payments, max_inflight, batch_size):
+    correlator = ResponseCorrelator(redis_client, backend_response_stream).start()
+    slots = threading.BoundedSemaphore(max_inflight)
+    futures = {}
+    errors = 0
+    print(f"Sending {num_payments:,} payments for backend {backend_id} "
+          f"({max_inflight:,} in flight max, batches of {batch_size})...")
+    start_time = time.perf_counter()
 
-    # Ensure the consumer group exists for the backend response stream
     try:
-        redis_client.xgroup_create(backend_response_stream, group_name, id="0", mkstream=True)
-        print(f"Created consumer group '{group_name}' on stream '{backend_response_stream}'")
-    except redis.exceptions.ResponseError as e:
-        if "BUSYGROUP Consumer Group name already exists" in str(e):
-            print(f"Consumer group '{group_name}' already exists for stream '{backend_response_stream}'")
-        else:
-            raise e
-
-    # Send the PIX message to the inbound stream
-    pix_message = generate_pix_payment(transaction_id, backend_id)
-    redis_client.xadd(inbound_stream_name, pix_message)
-    print(f"Sent PIX message to {inbound_stream_name} for transaction {transaction_id}")
-
-    # Wait for confirmation on the backend response stream
-    print(f"Waiting for confirmation on stream {backend_response_stream}...")
-    while True:
-        # Block and read the next message from the group; use '>' to only receive new messages
-        messages = redis_client.xreadgroup(group_name, consumer_name, {backend_response_stream: ">"}, block=30000, count=1)
-
-        if messages:
-            for stream, message_entries in messages:
-                for message_id, message_data in message_entries:
-                    # Check if confirmation message corresponds to our transaction
-                    if message_data[b"transaction_id"].decode() == transaction_id:
-                        print(f"Received confirmation for transaction {transaction_id}: {message_data}")
-                        # Acknowledge the message to mark it as processed
-                        redis_client.xack(backend_response_stream, group_name, message_id)
-                        return  # Exit once confirmation is received
+        for start in range(0, num_payments, batch_size):
+            size = min(batch_size, num_payments - start)
+            for _ in range(size):
+                if not slots.acquire(timeout=confirmation_timeout):
+                    raise TimeoutError(f"No confirmations for {confirmation_timeout}s "
+                                       f"with {correlator.in_flight:,} payments in flight - is a consumer running?")
+
+            batch = generate_payment_batch(size, start_id=start, id_prefix=run_prefix, backend_ids=backend_id)
+            transaction_ids = batch.column("transaction_id")
+            for transaction_id in transaction_ids:
+                future = correlator.expect(transaction_id)
+                future.add_done_callback(lambda _: slots.release())
+                futures[transaction_id] = future
+            failed = []
+            errors += send_resp_commands(redis_client, batch.to_resp_xadd(inbound_stream_name), size, failed)
+            for index in failed:
+                # Rejected, so never confirmed: stop waiting for it (which frees its slot) and don't count it
+                correlator.forget(transaction_ids[index])
+                del futures[transaction_ids[index]]
+
+        done, not_done = wait(futures.values(), timeout=confirmation_timeout)
+        for transaction_id, future in futures.items():
+            if not future.done():
+                correlator.forget(transaction_id)
+    finally:
+        correlator.stop()
+
+    elapsed = time.perf_counter() - start_time
+    latencies = np.array([f.result()[1] for f in done if not f.cancelled()])
+    print(f"✅ {len(latencies):,}/{len(futures):,} payments confirmed in {elapsed:.2f}s "
+          f"({len(latencies) / elapsed:,.0f} confirmations/sec), {len(not_done):,} timed out")
+    if errors:
+        print(f"{errors:,} XADDs got error replies; their payments were not awaited or counted")
+    if len(latencies):
+        p50, p95, p99, p999 = np.percentile(latencies, [50, 95, 99, 99.9])
+        print(f"Round trip (ms): avg {latencies.mean():.3f} | p50 {p50:.3f} | p95 {p95:.3f} | "
+              f"p99 {p99:.3f} | p99.9 {p999:.3f} | max {latencies.max():.3f}")
+    if correlator.unmatched:
+        print(f"Ignored {correlator.unmatched:,} confirmations for other processes or expired payments")
 
 
 if __name__ == "__main__":
-    inject_and_wait_for_confirmation()
\ No newline at end of file
+    if num_payments <= 1:
+        inject_and_wait_for_confirmation()
+    else:
+        inject_concurrent(num_payments, max_inflight, batch_size)
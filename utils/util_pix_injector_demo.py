@@ -1,18 +1,21 @@
 import os
 import redis
-import json
-from datetime import datetime
-import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+from util_payment_batch import generate_payment_batch, send_resp_commands
+from util_progress import report_progress, server_time_us, start_progress, wait_for_completion
+from util_sharded_counters import read_counters, reset_counters
 
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 num_lists = int(os.getenv("NUM_LISTS", 4))  # Number of lists to distribute across, default to 4
 source_queue_base = os.getenv("REDIS_LIST", "source_list")
-counter_key = "processed_count"  # This key tracks the number of processed messages
-total_amount_key = "total_amount"  # This key tracks the total amount processed
 list_size = int(os.getenv("LIST_SIZE", 100000))
-batch_size = 25  # Batch size for each LPUSH operation
+batch_size = int(os.getenv("BATCH_SIZE", 1000))  # Items per LPUSH command
+pipeline_depth = int(os.getenv("PIPELINE_DEPTH", 10))  # LPUSH commands per list in each round trip
+num_workers = int(os.getenv("NUM_WORKERS", 1))  # Injector processes, each filling a slice of every list
+total_messages = list_size // num_lists * num_lists  # Every list gets list_size // num_lists items
 
 # Determine if we should use hash tags
 use_hashtag = os.getenv("USE_HASHTAG", "false").lower() == "true"
@@ -22,98 +25,93 @@ pool = redis.ConnectionPool.from_url(redis_url)
 redis_client = redis.Redis(connection_pool=pool)
 
 
-# Function to generate a PIX payment JSON string
-def generate_pix_payment(transaction_id):
-    return json.dumps({
-        "transaction_id": f"{transaction_id}",
-        "amount": round(random.uniform(1, 1000), 2),  # Random amount between 1 and 1000 BRL
-        "timestamp": datetime.now().isoformat()  # Current timestamp
-    })
+def get_list_name(list_index):
+    # Conditionally apply hash tags based on use_hashtag
+    list_name = f"{source_queue_base}_{list_index}"
+    if use_hashtag:
+        list_name = f"{{{list_name}}}"
+    return list_name
+
+
+def inject_range(start, end):
+    """
+    Inject payments [start, end) of every list. Each round trip carries pipeline_depth LPUSH commands
+    of batch_size items for every list, as pre-encoded RESP, so all lists fill at the same pace.
+    Returns (items, bytes, amount) injected.
+    """
+    client = redis.from_url(redis_url)
+    list_names = [get_list_name(i) for i in range(num_lists)]
+    chunk = batch_size * pipeline_depth
+    items = sent_bytes = errors = 0
+    amount = 0.0
+
+    for offset in range(start, end, chunk):
+        size = min(chunk, end - offset)
+        payloads = []
+        for list_name in list_names:
+            batch = generate_payment_batch(size, start_id=offset)
+            payloads.append(batch.to_resp_lpush(list_name, items_per_command=batch_size))
+            amount += batch.total_amount  # summed from the generated values, no JSON re-parsing
+        payload = b"".join(payloads)
+        errors += send_resp_commands(client, payload, -(-size // batch_size) * len(list_names))
+        items += size * len(list_names)
+        sent_bytes += len(payload)
+
+    if errors:
+        print(f"Worker for payments {start}-{end} got {errors} error replies")
+    return items, sent_bytes, amount
 
 
 # Optimized injector function to distribute PIX payment JSON messages across multiple lists in batches
 def inject_messages(list_size):
-    print(f"Injecting {list_size} PIX payment messages across {num_lists} lists...")
+    print(f"Injecting {list_size} PIX payment messages across {num_lists} lists "
+          f"(LPUSH batches of {batch_size}, {pipeline_depth} per list per round trip, {num_workers} workers)...")
 
     # Clear existing items in source queues and counters
+    # One key per DEL: on a cluster the lists are in different slots, where a multi-key DEL fails with CROSSSLOT
+    pipeline = redis_client.pipeline(transaction=False)
     for i in range(num_lists):
-        # Conditionally apply hash tags based on use_hashtag
-        list_name = f"{source_queue_base}_{i}"
-        if use_hashtag:
-            list_name = f"{{{list_name}}}"
-        redis_client.delete(list_name)
-
-    redis_client.delete(counter_key)
-    redis_client.delete(total_amount_key)
+        pipeline.delete(get_list_name(i))
+    pipeline.execute()
+    reset_counters(redis_client)  # processed_count, total_amount and all their shards
+    start_progress(redis_client, total_messages)
     print("Cleaned up existing messages and counters.")
 
-    # Track total amount injected for logging purposes
-    total_injected_amount = 0
-
-    # Generate and distribute PIX payment messages across multiple lists in batches
-    for list_index in range(num_lists):
-        # Conditionally apply hash tags based on use_hashtag
-        list_name = f"{source_queue_base}_{list_index}"
-        if use_hashtag:
-            list_name = f"{{{list_name}}}"
-
-        # Prepare the batches for this list
-        batches = [
-            [generate_pix_payment(j) for j in range(i, min(i + batch_size, list_size // num_lists))]
-            for i in range(0, list_size // num_lists, batch_size)
-        ]
+    # Every worker fills its own slice of each list
+    per_list = list_size // num_lists
+    step = max(-(-per_list // num_workers), 1)
+    ranges = [(start, min(start + step, per_list)) for start in range(0, per_list, step)]
 
-        # Inject each batch into the Redis list with a single LPUSH command
-        for batch in batches:
-            redis_client.lpush(list_name, *batch)
-            batch_total = sum(float(json.loads(msg)["amount"]) for msg in batch)
-            total_injected_amount += batch_total
+    start_time = time.perf_counter()
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(inject_range, *zip(*ranges)))
+    else:
+        results = [inject_range(start, end) for start, end in ranges]
+    elapsed = time.perf_counter() - start_time
 
-            print(f"Injected a batch of {len(batch)} messages into {list_name}")
+    total_items = sum(items for items, _, _ in results)
+    total_bytes = sum(sent for _, sent, _ in results)
+    total_injected_amount = sum(amount for _, _, amount in results)
 
     # Log the total injected amount
-    redis_client.set(total_amount_key, total_injected_amount)
-    print(f"Finished injecting {list_size} PIX payment messages across {num_lists} lists.")
+    print(f"Finished injecting {total_items} PIX payment messages across {num_lists} lists in {elapsed:.2f}s "
+          f"({total_items / elapsed:,.0f} msg/s, {total_bytes / elapsed / 1024 / 1024:,.1f} MB/s)")
     print(f"Total amount injected: BRL {total_injected_amount:.2f}")
 
 
-# Monitor function to track processed messages
-def monitor_processed_count(start_time):
-    print("Starting to monitor processed messages...")
-    end_time = None  # Initialize end time for last message
-
-    while True:
-        # Fetch current count from the counter key
-        processed_count = redis_client.get(counter_key)
-        processed_count = int(processed_count) if processed_count else 0
-
-        # Fetch current total amount processed
-        total_amount = redis_client.get(total_amount_key)
-        total_amount = float(total_amount) if total_amount else 0
+# Wait for the consumers' progress marks instead of polling the counter
+def monitor_processed_count(injection_start_us, injection_end_us):
+    print("Waiting for consumers to process all messages...")
+    marks = wait_for_completion(redis_client, total_messages)
+    report_progress(marks, total_messages, injection_start_us, injection_end_us)
 
-        print(f"Total messages processed: {processed_count}")
-        print(f"Total amount processed: BRL {total_amount:.2f}")
-
-        # Check if all messages are processed
-        if processed_count >= list_size:
-            end_time = time.time()
-            print("All messages processed.")
-            break
-
-        time.sleep(0.1)  # Poll more frequently for accurate timing
-
-    # Calculate the total processing time
-    if start_time and end_time:
-        total_time = end_time - start_time
-        print(f"Total time to process all messages: {total_time:.4f} seconds")
+    print(f"Total amount processed: BRL {read_counters(redis_client)['total_amount']:.2f}")
 
 
 if __name__ == "__main__":
-    # Start timing
-    start_time = time.time()
-
-    # Inject messages
+    injection_start_us = server_time_us(redis_client)
     inject_messages(list_size)
 
-    # Monitor processed messages and calculate total latency
-    monitor_processed_count(start_time)
\ No newline at end of file
+    # Time to first processed and time to drain, from the consumers' own commit times
+    monitor_processed_count(injection_start_us, server_time_us(redis_client))
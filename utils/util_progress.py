@@ -0,0 +1,122 @@
+import os
+import time
+
+# Completion signalling between injectors and consumers. Before injecting, an injector writes the
+# number of messages it expects (and a mark step) to progress_config_key. Consumers read that config
+# in the same pipeline as their counter updates and Redis TIME. While it is set they also INCRBY
+# progress_count_key (processed_count itself is sharded, see util_sharded_counters.py), and XADD a
+# mark to progress_stream when a batch takes that count to its first message, past a multiple of the
+# step, or to the target. Each threshold is crossed by exactly one INCRBY, so every mark is published
+# once. Marks carry the Redis server time of the commit, so consumers on other hosts need no clock sync.
+
+progress_stream = os.getenv("PROGRESS_STREAM", "processing_progress")
+progress_config_key = f"{progress_stream}:config"
+progress_count_key = f"{progress_stream}:count"
+progress_marks = int(os.getenv("PROGRESS_MARKS", 100))  # Marks per run, besides the first and the last
+progress_timeout = float(os.getenv("PROGRESS_TIMEOUT", 60))  # Give up after this many seconds without a mark
+
+
+def server_time_us(client):
+    """Redis server time in microseconds, the clock the consumers' marks use"""
+    seconds, microseconds = client.time()
+    return seconds * 1_000_000 + microseconds
+
+
+def progress_crossed(previous, total, target, step):
+    """True when a commit taking the progress count from previous to total crosses a threshold to mark"""
+    step = max(step, 1)
+    return previous == 0 or previous // step < total // step or previous < target <= total
+
+
+def queue_progress(pipe, processed, counted):
+    """
+    Queue a consumer's progress reads on its commit pipeline: the config and Redis TIME, after an INCRBY
+    of the count when counted (an injector was waiting at the last commit). Returns the replies queued.
+    """
+    if counted:
+        pipe.incrby(progress_count_key, processed)
+    pipe.hmget(progress_config_key, "target", "step")
+    pipe.time()
+    return 3 if counted else 2
+
+
+def publish_progress(client, replies, processed):
+    """
+    Publish a mark if the commit whose queue_progress replies are given crossed a threshold; only the
+    consumer whose INCRBY crossed it publishes it. Returns whether an injector is waiting, for counted.
+    """
+    config, server_time = replies[-2:]
+    target, step = (int(value) if value else 0 for value in config)
+    if not target:
+        return False
+    # The injector sets its config before injecting, so a commit that found it unannounced is counted here
+    total = replies[-3] if len(replies) == 3 else client.incrby(progress_count_key, processed)
+    if progress_crossed(total - processed, total, target, step):
+        client.xadd(progress_stream, {"count": total, "ts_us": server_time[0] * 1_000_000 + server_time[1]})
+    return True
+
+
+def start_progress(client, target, marks=progress_marks):
+    """Clear old marks and announce the target; call after emptying the queues, before injecting"""
+    step = max(target // max(marks, 1), 1)
+    pipeline = client.pipeline(transaction=False)
+    pipeline.delete(progress_stream)
+    pipeline.delete(progress_count_key)
+    pipeline.hset(progress_config_key, mapping={"target": target, "step": step})
+    pipeline.execute()
+
+
+def wait_for_completion(client, target, timeout=progress_timeout):
+    """Block on the progress stream until a mark reaches target; returns marks as sorted (count, ts_us)"""
+    marks = []
+    last_id = "0-0"
+    last_mark = time.time()
+    try:
+        while not marks or marks[-1][0] < target:
+            response = client.xread({progress_stream: last_id}, count=1000, block=1000)
+            if not response:
+                if time.time() - last_mark > timeout:
+                    print(f"No progress mark for {timeout:.0f}s: are the consumers running and publishing "
+                          f"to {progress_stream}?")
+                    break
+                continue
+            for message_id, fields in response[0][1]:
+                marks.append((int(fields[b"count"]), int(fields[b"ts_us"])))
+                last_id = message_id
+            # Consumers commit concurrently, so marks can land slightly out of order
+            marks.sort()
+            last_mark = time.time()
+            print(f"Total messages processed: {marks[-1][0]}")
+    finally:
+        # Consumers stop publishing once no injector is waiting
+        client.delete(progress_config_key)
+    return marks
+
+
+def report_progress(marks, target, injection_start_us, injection_end_us):
+    """Print time-to-first-processed, time-to-drain and the throughput curve between marks"""
+    print(f"Injection took {(injection_end_us - injection_start_us) / 1e6:.4f} seconds")
+    if not marks:
+        print("No messages were processed.")
+        return
+
+    first_count, first_us = marks[0]
+    last_count, last_us = marks[-1]
+    print(f"Time to first processed message: {(first_us - injection_start_us) / 1e6:.4f} seconds "
+          f"after injection started")
+    if last_count < target:
+        print(f"Only {last_count} of {target} messages were processed.")
+        return
+
+    drain = max(last_us - first_us, 1) / 1e6
+    print(f"Time to drain: {drain:.4f} seconds from first to last processed message "
+          f"({target / drain:,.0f} msg/s), {(last_us - injection_end_us) / 1e6:.4f} seconds after injection ended")
+
+    print("Throughput curve:")
+    print(f"  {'elapsed (s)':>12} {'processed':>12} {'msg/s':>12}")
+    previous_count, previous_us = 0, first_us
+    for count, ts_us in marks:
+        interval = (ts_us - previous_us) / 1e6
+        rate = f"{(count - previous_count) / interval:,.0f}" if interval > 0 else "-"
+        print(f"  {(ts_us - injection_start_us) / 1e6:>12.4f} {count:>12} {rate:>12}")
+        previous_count, previous_us = count, ts_us
@@ -1,72 +1,149 @@
+import json
 import os
 import redis
 import time
-from multiprocessing import Process, Queue
+from multiprocessing import Event, Process, Queue
 import numpy as np
 
+# Reaction time: how long a consumer blocked on Redis takes to see a message after it was written.
+# The producer embeds time.monotonic_ns() in each payload and the consumer subtracts it on receipt,
+# so nothing but Redis sits in the measured path. CLOCK_MONOTONIC is system-wide, so producer and
+# consumer processes must run on the same host. Every sample is kept: the tail is the point.
+
 # Redis configuration from environment
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
 source_queue = os.getenv("REDIS_LIST", "source_list")
-num_measurements = 100  # Number of reaction times to measure
+num_measurements = int(os.getenv("NUM_MEASUREMENTS", 10000))  # Samples per payload size and transport
+rate = float(os.getenv("RATE", 1000))  # Messages per second; keep it low enough that the consumer waits idle
+payload_sizes = [int(size) for size in os.getenv("PAYLOAD_SIZES", "64,1024,16384").split(",")]
+transports = os.getenv("TRANSPORTS", "list,stream,stream_group").split(",")
+warmup = int(os.getenv("WARMUP", 100))  # Leading samples dropped while connections warm up
+results_file = os.getenv("RESULTS_FILE")  # Optional JSON output with every histogram
+
+stream_name = f"{source_queue}_reaction_stream"
+group_name = "reaction_time_group"
 
 # Initialize Redis client with connection pooling
 pool = redis.ConnectionPool.from_url(redis_url)
 redis_client = redis.Redis(connection_pool=pool)
 
-def producer(inject_queue):
-    print("Starting producer...")
+
+def producer(transport, payload_size, ready):
+    client = redis.from_url(redis_url)
+    padding = "x" * payload_size
+    ready.wait()
+    time.sleep(0.1)  # let the consumer enter its first blocking read
+
+    interval_ns = int(1e9 / rate)
+    next_send = time.monotonic_ns()
     for _ in range(num_measurements):
-        # Sleep briefly to allow consumer to be ready
-        time.sleep(1)
+        # Absolute schedule, so a slow send doesn't shift every later one
+        delay = next_send - time.monotonic_ns()
+        if delay > 0:
+            time.sleep(delay / 1e9)
+        next_send += interval_ns
 
-        # Record start time, inject message
-        start_time = time.time()
-        redis_client.lpush(source_queue, "Test message")
+        sent_ns = time.monotonic_ns()
+        if transport == "list":
+            client.lpush(source_queue, f"{sent_ns}|{padding}")
+        else:
+            client.xadd(stream_name, {"sent_ns": sent_ns, "payload": padding})
 
-        # Send the start time to consumer
-        inject_queue.put(start_time)
-        print(f"Injected message at {start_time:.2f}")
 
-def consumer(inject_queue, reaction_times):
-    print("Starting consumer...")
-    for _ in range(num_measurements):
-        # Wait to receive the start time from producer
-        start_time = inject_queue.get()
+def consumer(transport, ready, results):
+    client = redis.from_url(redis_url)
+    samples = np.empty(num_measurements, dtype=np.int64)
+    received = 0
+    cursor = "0-0"  # measure() starts from an empty stream, so nothing is skipped however late we start
+    ready.set()
 
-        # Blocking on BRPOP to detect message
-        redis_client.brpop(source_queue, timeout=0)
+    while received < num_measurements:
+        if transport == "list":
+            item = client.brpop(source_queue, timeout=0)
+            now = time.monotonic_ns()
+            samples[received] = now - int(item[1].split(b"|", 1)[0])
+            received += 1
+            continue
 
-        # Calculate reaction time and store it in milliseconds
-        reaction_time_ms = (time.time() - start_time) * 1000  # Convert to milliseconds
-        reaction_times.put(reaction_time_ms)
-        print(f"Reaction time: {reaction_time_ms:.2f} ms")
+        if transport == "stream":
+            response = client.xread({stream_name: cursor}, count=100, block=0)
+        else:
+            response = client.xreadgroup(group_name, "reaction_time_consumer", {stream_name: ">"},
+                                         count=100, block=0)
+        now = time.monotonic_ns()
+        entries = response[0][1]
+        for message_id, fields in entries[:num_measurements - received]:
+            samples[received] = now - int(fields[b"sent_ns"])
+            received += 1
+        cursor = entries[-1][0]
+        if transport == "stream_group":
+            client.xack(stream_name, group_name, *[message_id for message_id, _ in entries])
 
-def main():
-    # Queues to communicate between producer and consumer
-    inject_queue = Queue()
-    reaction_times = Queue()
+    # Results travel back once, after the measurement
+    results.put(samples)
 
-    # Start producer and consumer processes
-    producer_process = Process(target=producer, args=(inject_queue,))
-    consumer_process = Process(target=consumer, args=(inject_queue, reaction_times))
-    producer_process.start()
+
+def measure(transport, payload_size):
+    """Reaction times in ms for one transport and payload size"""
+    redis_client.delete(source_queue, stream_name)
+    if transport == "stream_group":
+        redis_client.xgroup_create(stream_name, group_name, id="$", mkstream=True)
+
+    ready = Event()
+    results = Queue()
+    consumer_process = Process(target=consumer, args=(transport, ready, results))
+    producer_process = Process(target=producer, args=(transport, payload_size, ready))
     consumer_process.start()
+    producer_process.start()
 
-    # Wait for both to finish
+    samples = results.get()
     producer_process.join()
     consumer_process.join()
+    redis_client.delete(source_queue, stream_name)
+    return samples[min(warmup, num_measurements - 1):] / 1e6
+
+
+def summarize(reaction_times):
+    percentiles = dict(zip(["p50", "p90", "p99", "p99.9"], np.percentile(reaction_times, [50, 90, 99, 99.9])))
+    # Log-spaced bins: the body and the tail are both readable
+    edges = np.geomspace(max(reaction_times.min(), 1e-3), reaction_times.max() * 1.0001, 13)
+    counts, _ = np.histogram(reaction_times, bins=edges)
+    return {
+        "samples": len(reaction_times),
+        "min": reaction_times.min(),
+        "mean": reaction_times.mean(),
+        **percentiles,
+        "max": reaction_times.max(),
+        "histogram": [{"from_ms": low, "to_ms": high, "count": int(count)}
+                      for low, high, count in zip(edges[:-1], edges[1:], counts)],
+    }
 
-    # Collect reaction times from the queue
-    times = []
-    while not reaction_times.empty():
-        times.append(reaction_times.get())
 
-    # Use percentiles to filter out outliers (10th to 90th percentile)
-    filtered_times = [t for t in times if np.percentile(times, 10) <= t <= np.percentile(times, 90)]
+def print_summary(transport, payload_size, summary):
+    print(f"\n{transport}, {payload_size} B payload: {summary['samples']:,} samples | "
+          f"min {summary['min']:.3f} | mean {summary['mean']:.3f} | p50 {summary['p50']:.3f} | "
+          f"p90 {summary['p90']:.3f} | p99 {summary['p99']:.3f} | p99.9 {summary['p99.9']:.3f} | "
+          f"max {summary['max']:.3f} ms")
+    peak = max(bucket["count"] for bucket in summary["histogram"]) or 1
+    for bucket in summary["histogram"]:
+        bar = "#" * int(round(40 * bucket["count"] / peak))
+        print(f"  {bucket['from_ms']:>9.3f} - {bucket['to_ms']:>9.3f} ms {bucket['count']:>8,} {bar}")
+
+
+def main():
+    print(f"Measuring {num_measurements:,} reaction times at {rate:,.0f} msg/s "
+          f"for {', '.join(transports)} with payloads of {', '.join(map(str, payload_sizes))} bytes...")
+    results = []
+    for transport in transports:
+        for payload_size in payload_sizes:
+            summary = summarize(measure(transport, payload_size))
+            print_summary(transport, payload_size, summary)
+            results.append({"transport": transport, "payload_size": payload_size, **summary})
 
-    # Calculate and display statistics
-    avg_reaction_time = sum(filtered_times) / len(filtered_times)
-    print(f"\nAverage Reaction Time (filtered) over {len(filtered_times)} measurements: {avg_reaction_time:.2f} ms")
+    if results_file:
+        with open(results_file, "w") as output:
+            json.dump(results, output, indent=2, default=float)
+        print(f"\nResults written to {results_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
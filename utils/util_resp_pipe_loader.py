@@ -0,0 +1,229 @@
+import mmap
+import os
+import queue
+import threading
+import time
+
+import redis
+
+# Native replacement for `cat file | redis-cli --pipe`.
+# The RESP file is memory-mapped (never read into RAM) and cut into windows at command boundaries.
+# Windows are streamed over several connections; each connection keeps at most MAX_INFLIGHT
+# commands unanswered, reading replies as it goes so errors are counted while the load runs.
+# RATE_LIMIT caps commands/sec so a bulk load doesn't starve live consumers.
+# Note: with CONNECTIONS > 1, windows execute in parallel, so use CONNECTIONS=1 for strict file order.
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+resp_file = os.getenv("RESP_FILE", "bulk_load_pix_data.txt")
+num_connections = int(os.getenv("CONNECTIONS", 4))
+window_commands = int(os.getenv("WINDOW_COMMANDS", 1000))  # Max commands per write
+window_bytes = int(os.getenv("WINDOW_BYTES", 4 * 1024 * 1024))  # Max bytes per write
+max_inflight = int(os.getenv("MAX_INFLIGHT", 10000))  # Max unanswered commands per connection
+rate_limit = float(os.getenv("RATE_LIMIT", 0))  # Commands/sec across all connections, 0 = unlimited
+report_interval = float(os.getenv("REPORT_INTERVAL", 1))  # Seconds between progress lines
+
+
+class TokenBucket:
+    """Shared commands/sec limiter; acquire() sleeps until enough tokens are available"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(rate, 1)  # allow at most one second of burst
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                # A window bigger than the bucket is let through once the bucket is full
+                if self.tokens >= min(amount, self.capacity):
+                    self.tokens -= amount
+                    return
+                wait = (min(amount, self.capacity) - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class LoaderStats:
+    """Per-connection counters, summed by the reporter"""
+
+    def __init__(self):
+        self.sent_commands = 0
+        self.sent_bytes = 0
+        self.replies = 0
+        self.errors = 0
+        self.error_samples = {}
+        self.failure = None  # exception that stopped this worker
+
+
+def scan_window(buf, pos, end, max_commands, max_bytes):
+    """Walk whole RESP commands from pos; returns (end position, command count) of the window"""
+    start = pos
+    count = 0
+    while pos < end and count < max_commands and pos - start < max_bytes:
+        if buf[pos] != 42:  # '*'
+            raise ValueError(f"Expected a RESP array at byte {pos}, got {bytes(buf[pos:pos + 16])!r}")
+        eol = buf.find(b"\r\n", pos)
+        arguments = int(buf[pos + 1:eol])
+        pos = eol + 2
+        for _ in range(arguments):
+            eol = buf.find(b"\r\n", pos)
+            pos = eol + 2 + int(buf[pos + 1:eol]) + 2
+        if eol < 0 or pos > end:
+            raise ValueError(f"Truncated command at byte {start if count == 0 else pos}")
+        count += 1
+    return pos, count
+
+
+def record_reply(connection, stats):
+    try:
+        connection.read_response(disable_decoding=True)
+    except redis.exceptions.ResponseError as e:
+        stats.errors += 1
+        prefix = str(e).split(" ", 1)[0]
+        if prefix not in stats.error_samples:
+            stats.error_samples[prefix] = str(e)
+            print(f"Error reply: {e}")
+    stats.replies += 1
+
+
+def connection_worker(redis_client, windows, stats, limiter, failed):
+    """
+    Send windows from the queue on one connection, keeping at most max_inflight replies pending.
+    Any failure is recorded in stats and sets failed, so the splitter stops cutting windows.
+    """
+    connection = None
+    inflight = 0
+    view = None
+    finished = False  # The end-of-input None was taken from the queue
+    try:
+        connection = redis_client.connection_pool.get_connection("PIPELINE")
+        while True:
+            window = windows.get()
+            if window is None:
+                finished = True
+                break
+            view, commands = window
+            if limiter:
+                limiter.acquire(commands)
+            connection.send_packed_command([view], check_health=False)
+            stats.sent_bytes += view.nbytes
+            view.release()
+            inflight += commands
+            stats.sent_commands += commands
+            while inflight > max_inflight:
+                record_reply(connection, stats)
+                inflight -= 1
+        while inflight:
+            record_reply(connection, stats)
+            inflight -= 1
+    except Exception as e:
+        stats.failure = e
+        failed.set()
+        print(f"Connection worker failed, {inflight:,} replies lost: {e!r}")
+        if connection is not None:
+            connection.disconnect()  # Replies may be left unread, never hand this connection out again
+        if view is not None:
+            view.release()
+        # Keep draining so the splitter never blocks on a full queue, and no view outlives the mapping
+        while not finished:
+            window = windows.get()
+            if window is None:
+                finished = True
+            else:
+                window[0].release()
+    finally:
+        if connection is not None:
+            redis_client.connection_pool.release(connection)
+
+
+def report_progress(all_stats, total_bytes, start_time, done):
+    last_replies = 0
+    last_time = start_time
+    while not done.wait(report_interval):
+        now = time.monotonic()
+        replies = sum(s.replies for s in all_stats)
+        sent_bytes = sum(s.sent_bytes for s in all_stats)
+        pending = sum(s.sent_commands for s in all_stats) - replies
+        rate = (replies - last_replies) / (now - last_time)
+        print(f"[{now - start_time:7.1f}s] {sent_bytes / total_bytes:6.1%} sent | {replies:,} replies "
+              f"({rate:,.0f} cmd/sec, {sent_bytes / 1e6 / (now - start_time):,.1f} MB/sec) | "
+              f"in flight: {pending:,} | errors: {sum(s.errors for s in all_stats):,}")
+        last_replies = replies
+        last_time = now
+
+
+def load_file(file_name):
+    if file_name.endswith((".gz", ".zst")):
+        raise ValueError(f"'{file_name}' is compressed; decompress it first (the loader memory-maps plain RESP)")
+
+    redis_client = redis.from_url(redis_url)
+    limiter = TokenBucket(rate_limit) if rate_limit > 0 else None
+    windows = queue.Queue(maxsize=num_connections * 4)
+    all_stats = [LoaderStats() for _ in range(num_connections)]
+
+    with open(file_name, "rb") as f:
+        total_bytes = os.fstat(f.fileno()).st_size
+        if total_bytes == 0:
+            print(f"'{file_name}' is empty, nothing to load")
+            return
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            buf.madvise(mmap.MADV_SEQUENTIAL)
+
+    print(f"Loading '{file_name}' ({total_bytes / 1e6:,.1f} MB) into {redis_url} over {num_connections} connections "
+          f"(window {window_commands} commands, max {max_inflight} in flight, "
+          f"rate limit {f'{rate_limit:,.0f} cmd/sec' if limiter else 'off'})")
+
+    start_time = time.monotonic()
+    done = threading.Event()
+    failed = threading.Event()
+    reporter = threading.Thread(target=report_progress, args=(all_stats, total_bytes, start_time, done), daemon=True)
+    workers = [
+        threading.Thread(target=connection_worker, args=(redis_client, windows, stats, limiter, failed))
+        for stats in all_stats
+    ]
+    reporter.start()
+    for worker in workers:
+        worker.start()
+
+    # Cut the file into windows at command boundaries; zero-copy views of the mapping
+    view = memoryview(buf)
+    pos = 0
+    total_commands = 0
+    try:
+        while pos < total_bytes and not failed.is_set():
+            end, commands = scan_window(buf, pos, total_bytes, window_commands, window_bytes)
+            windows.put((view[pos:end], commands))
+            total_commands += commands
+            pos = end
+    finally:
+        for _ in workers:
+            windows.put(None)
+        for worker in workers:
+            worker.join()
+        done.set()
+        reporter.join()
+        view.release()
+        buf.close()
+
+    failures = [stats.failure for stats in all_stats if stats.failure]
+    if failures:
+        raise RuntimeError(f"{len(failures)} of {num_connections} connections failed; first: {failures[0]!r}")
+
+    elapsed = time.monotonic() - start_time
+    replies = sum(s.replies for s in all_stats)
+    errors = sum(s.errors for s in all_stats)
+    print(f"✅ Loaded {total_commands:,} commands ({total_bytes / 1e6:,.1f} MB) in {elapsed:.2f}s: "
+          f"{replies / elapsed:,.0f} cmd/sec, {total_bytes / 1e6 / elapsed:,.1f} MB/sec")
+    print(f"Replies: {replies:,}, errors: {errors:,}")
+    for stats in all_stats:
+        for prefix, sample in stats.error_samples.items():
+            print(f"  {prefix}: e.g. {sample}")
+
+
+if __name__ == "__main__":
+    load_file(resp_file)
@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import redis
+
+
+class ResponseCorrelator:
+    """
+    Matches confirmations on one backend response stream to the payments waiting for them.
+
+    A single background thread reads the stream in batches and resolves the Future registered for
+    each transaction_id, so any number of payments can be in flight at once. It reads with a plain
+    XREAD cursor rather than a consumer group: every simulator process sees all confirmations for
+    its backend and resolves only its own, and nothing accumulates in a PEL.
+    """
+
+    def __init__(self, redis_client, response_stream, read_count=1000, block_ms=1000):
+        self.redis_client = redis_client
+        self.response_stream = response_stream
+        self.read_count = read_count
+        self.block_ms = block_ms
+        self.pending = {}  # transaction_id -> (Future, perf_counter when registered)
+        self.lock = threading.Lock()
+        self.matched = 0
+        self.unmatched = 0  # confirmations for other processes, or for payments we stopped waiting on
+        self._stop = threading.Event()
+        self._reader = None
+
+        # Start right after the current last entry, so no confirmation sent after start() is missed
+        try:
+            self.cursor = redis_client.xinfo_stream(response_stream)["last-generated-id"]
+        except redis.exceptions.ResponseError:
+            self.cursor = "0-0"  # stream doesn't exist yet
+
+    def start(self):
+        self._reader = threading.Thread(target=self._read_loop, name=f"correlator-{self.response_stream}",
+                                        daemon=True)
+        self._reader.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._reader:
+            self._reader.join()
+
+    def expect(self, transaction_id):
+        """Register a payment before sending it; the Future resolves to (confirmation, round trip in ms)"""
+        future = Future()
+        with self.lock:
+            self.pending[transaction_id] = (future, time.perf_counter())
+        return future
+
+    def forget(self, transaction_id):
+        """Stop waiting for a payment (e.g. after a timeout)"""
+        with self.lock:
+            entry = self.pending.pop(transaction_id, None)
+        if entry:
+            entry[0].cancel()
+
+    @property
+    def in_flight(self):
+        return len(self.pending)
+
+    def _read_loop(self):
+        while not self._stop.is_set():
+            try:
+                response = self.redis_client.xread({self.response_stream: self.cursor},
+                                                   count=self.read_count, block=self.block_ms)
+            except redis.exceptions.ConnectionError as e:
+                print(f"Correlator read on {self.response_stream} failed, retrying: {e}")
+                time.sleep(1)
+                continue
+
+            if not response:
+                continue
+
+            received = time.perf_counter()
+            for _, entries in response:
+                with self.lock:
+                    resolved = []
+                    for message_id, message_data in entries:
+                        self.cursor = message_id
+                        entry = self.pending.pop(message_data.get(b"transaction_id", b"").decode(), None)
+                        if entry is None:
+                            self.unmatched += 1
+                        else:
+                            resolved.append((entry, message_data))
+                    self.matched += len(resolved)
+                # Resolve outside the lock: done-callbacks may register new payments
+                for (future, registered), message_data in resolved:
+                    future.set_result((message_data, (received - registered) * 1000))
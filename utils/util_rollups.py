@@ -0,0 +1,168 @@
+import os
+import argparse
+import math
+import time
+from datetime import datetime
+
+import redis
+
+# Time-bucketed rollups of processed volume, written by pix_smasher_demo.py. Each bucket is a small
+# hash, pix_rollup:<resolution>:<bucket start, epoch seconds>, with a "<backend>:count" and a
+# "<backend>:centavos" field per backend. Consumers add one HINCRBY per field per batch, and the
+# buckets expire on their own (ROLLUP_SECOND_TTL, ROLLUP_MINUTE_TTL). A question such as "volume per
+# backend in the last 10 minutes" then reads O(buckets) hashes instead of scanning the streams: the
+# whole minutes from the minute buckets, the partial minutes at the edges from the second buckets.
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+rollup_prefix = os.getenv("ROLLUP_PREFIX", "pix_rollup")  # Must match the consumers' ROLLUP_PREFIX
+read_chunk = int(os.getenv("ROLLUP_READ_CHUNK", 1000))  # HGETALLs per pipeline round trip
+
+SECOND, MINUTE = "1s", "1m"
+
+
+def rollup_key(resolution, bucket):
+    return f"{rollup_prefix}:{resolution}:{bucket}"
+
+
+def plan_buckets(start, end):
+    """(resolution, bucket) pairs that cover [start, end) exactly once; a partial last second is included"""
+    start, end = int(start), math.ceil(end)
+    first_minute = -(-start // 60) * 60
+    last_minute = end // 60 * 60
+    if first_minute >= last_minute:
+        return [(SECOND, second) for second in range(start, end)]
+    return ([(SECOND, second) for second in range(start, first_minute)] +
+            [(MINUTE, minute) for minute in range(first_minute, last_minute, 60)] +
+            [(SECOND, second) for second in range(last_minute, end)])
+
+
+def queue_rollup_reads(pipe, buckets):
+    """Queue an HGETALL of every bucket on pipe, in order"""
+    for resolution, bucket in buckets:
+        pipe.hgetall(rollup_key(resolution, bucket))
+
+
+def parse_bucket(reply):
+    """{backend: {"count", "centavos"}} from one bucket's HGETALL reply; missing buckets are empty"""
+    volume = {}
+    if isinstance(reply, Exception):
+        return volume
+    for field, value in reply.items():
+        backend, _, measure = field.decode().rpartition(":")
+        entry = volume.setdefault(backend, {"count": 0, "centavos": 0})
+        if measure in entry:
+            entry[measure] += int(value)
+    return volume
+
+
+def merge_volumes(volumes):
+    """Sum per-backend volumes, e.g. the parsed buckets of a window"""
+    merged = {}
+    for volume in volumes:
+        for backend, entry in volume.items():
+            total = merged.setdefault(backend, {"count": 0, "centavos": 0})
+            total["count"] += entry["count"]
+            total["centavos"] += entry["centavos"]
+    return merged
+
+
+def volume_count(volume):
+    return sum(entry["count"] for entry in volume.values())
+
+
+def read_buckets(client, buckets):
+    """Parsed volume of every bucket, in order, read in pipelines of read_chunk HGETALLs"""
+    volumes = []
+    for index in range(0, len(buckets), read_chunk):
+        pipe = client.pipeline(transaction=False)
+        queue_rollup_reads(pipe, buckets[index:index + read_chunk])
+        volumes.extend(parse_bucket(reply) for reply in pipe.execute(raise_on_error=False))
+    return volumes
+
+
+def volume_by_backend(client, start, end):
+    """Messages and centavos processed per backend in [start, end)"""
+    return merge_volumes(read_buckets(client, plan_buckets(start, end)))
+
+
+def search_peak_second(start, end):
+    """
+    The busiest second of [start, end), as a generator for callers that read the buckets themselves:
+    yields the buckets to read next, is sent their parsed volumes, and returns (second, volume), or
+    (None, {}) when nothing was processed. It reads the minute buckets first, then only the seconds of
+    the busiest minutes: once a minute's total is no larger than the best second found, no second in it
+    or in any quieter minute can beat it.
+    """
+    buckets = plan_buckets(start, end)
+    volumes = yield buckets
+    best, best_volume, best_count = None, {}, 0
+    minutes = []
+    for (resolution, bucket), volume in zip(buckets, volumes):
+        if resolution == MINUTE:
+            minutes.append((volume_count(volume), bucket))
+        elif volume_count(volume) > best_count:
+            best, best_volume, best_count = bucket, volume, volume_count(volume)
+
+    for minute_count, minute in sorted(minutes, reverse=True):
+        if minute_count <= best_count:
+            break
+        seconds = [(SECOND, second) for second in range(minute, minute + 60)]
+        volumes = yield seconds
+        for (_, second), volume in zip(seconds, volumes):
+            if volume_count(volume) > best_count:
+                best, best_volume, best_count = second, volume, volume_count(volume)
+    return best, best_volume
+
+
+def peak_second(client, start, end):
+    """The busiest second of [start, end) as (second, volume); see search_peak_second"""
+    search = search_peak_second(start, end)
+    buckets = next(search)
+    try:
+        while True:
+            buckets = search.send(read_buckets(client, buckets))
+    except StopIteration as done:
+        return done.value
+
+
+def start_of_today():
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+
+def print_volume(volume, seconds):
+    print(f"  {'backend':<24} {'messages':>12} {'BRL':>18} {'msg/s':>10} {'share':>7}")
+    total = volume_count(volume) or 1
+    for backend, entry in sorted(volume.items(), key=lambda item: item[1]["count"], reverse=True):
+        print(f"  {backend or '(none)':<24} {entry['count']:>12,} {entry['centavos'] / 100:>18,.2f} "
+              f"{entry['count'] / max(seconds, 1):>10,.1f} {entry['count'] / total:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the processed-volume rollups")
+    parser.add_argument("query", choices=["volume", "peak"],
+                        help="volume: messages and BRL per backend; peak: the busiest second")
+    parser.add_argument("--last", type=float, metavar="SECONDS",
+                        help="Window ending now (default: since local midnight)")
+    args = parser.parse_args()
+
+    client = redis.from_url(redis_url)
+    end = time.time()
+    start = end - args.last if args.last else start_of_today()
+    window = f"{datetime.fromtimestamp(start):%Y-%m-%d %H:%M:%S} to {datetime.fromtimestamp(end):%H:%M:%S}"
+
+    if args.query == "volume":
+        volume = volume_by_backend(client, start, end)
+        print(f"Processed volume from {window}: {volume_count(volume):,} messages")
+        print_volume(volume, end - start)
+    else:
+        second, volume = peak_second(client, start, end)
+        if second is None:
+            print(f"Nothing processed from {window}")
+            return
+        print(f"Peak second from {window}: {datetime.fromtimestamp(second):%Y-%m-%d %H:%M:%S}, "
+              f"{volume_count(volume):,} messages")
+        print_volume(volume, 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import os
+import time
+import zlib
+
+import redis
+
+# processed_count and total_amount are sharded: each consumer increments its own shard
+# ("processed_count:shard:3"), so counter writes from many replicas land on different keys and, on a
+# cluster, different slots instead of one hot key. The canonical keys are a snapshot of the shard sums
+# that the consumers refresh every COUNTER_FOLD_INTERVAL seconds; readers that need an exact value
+# sum the shards themselves, in one pipeline (never MGET: the shards span slots on a cluster).
+
+counter_shards = int(os.getenv("COUNTER_SHARDS", 16))  # Must match the consumers' COUNTER_SHARDS
+counter_fold_interval = float(os.getenv("COUNTER_FOLD_INTERVAL", 5))  # Seconds between folds into the canonical keys
+COUNTERS = {"processed_count": int, "total_amount": float}
+
+
+def shard_key(key, shard):
+    return f"{key}:shard:{shard}"
+
+
+def counter_shard(name, shards=counter_shards):
+    """The shard a consumer (or one of its workers) named name writes to"""
+    return zlib.crc32(name.encode()) % shards
+
+
+def queue_counters(pipe, shard, processed, amount):
+    """Queue a batch's increments of processed_count and total_amount on shard; returns the number of replies queued"""
+    pipe.incrby(shard_key("processed_count", shard), processed)
+    pipe.incrbyfloat(shard_key("total_amount", shard), amount)
+    return 2
+
+
+def queue_counter_reads(pipe, shards=counter_shards):
+    """Queue a GET of every shard of every counter on pipe; returns the number of replies queued"""
+    for key in COUNTERS:
+        for shard in range(shards):
+            pipe.get(shard_key(key, shard))
+    return len(COUNTERS) * shards
+
+
+def sum_counter_replies(replies, shards=counter_shards):
+    """Counter totals from the replies of queue_counter_reads; missing or unreadable shards count as 0"""
+    totals = {}
+    for index, (key, kind) in enumerate(COUNTERS.items()):
+        total = kind(0)
+        for value in replies[index * shards:(index + 1) * shards]:
+            if value is not None and not isinstance(value, Exception):
+                total += kind(float(value))
+        totals[key] = total
+    return totals
+
+
+def read_counters(client, shards=counter_shards):
+    """Exact counter totals, summed from the shards in one round trip"""
+    pipe = client.pipeline(transaction=False)
+    queue_counter_reads(pipe, shards)
+    return sum_counter_replies(pipe.execute(raise_on_error=False), shards)
+
+
+def reset_counters(client, shards=counter_shards):
+    """Delete the canonical counters and every shard (one key per DEL, so it also works on a cluster)"""
+    pipe = client.pipeline(transaction=False)
+    for key in COUNTERS:
+        pipe.delete(key)
+        for shard in range(shards):
+            pipe.delete(shard_key(key, shard))
+    pipe.execute()
+
+
+def fold_counter_shards(client, lock_owner, interval=counter_fold_interval, shards=counter_shards):
+    """
+    SET the canonical counters to the sum of their shards, if lock_owner gets the fold lock for this
+    interval; returns the totals, or None if another consumer holds it. SET is idempotent, so no
+    cross-slot transaction is needed; the lock only keeps every replica from doing the same work.
+    """
+    if not client.set("counter_fold_lock", lock_owner, nx=True, px=int(interval * 1000)):
+        return None
+    pipe = client.pipeline(transaction=False)
+    queue_counter_reads(pipe, shards)
+    totals = sum_counter_replies(pipe.execute(), shards)  # Raises rather than fold an unreadable shard as 0
+    pipe = client.pipeline(transaction=False)
+    for key, total in totals.items():
+        pipe.set(key, total)
+    pipe.execute()
+    return totals
+
+
+def fold_counters(client, lock_owner, interval=counter_fold_interval, shards=counter_shards):
+    """Fold the shards into the canonical counters every interval seconds; run it on a daemon thread"""
+    while True:
+        time.sleep(interval)
+        try:
+            fold_counter_shards(client, lock_owner, interval, shards)
+        except redis.exceptions.RedisError as e:
+            print(f"Counter fold failed: {e}")
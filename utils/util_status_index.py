@@ -0,0 +1,109 @@
+import os
+import argparse
+import json
+import sys
+import time
+import zlib
+from datetime import datetime
+
+import redis
+
+# Transaction status index, written by pix_smasher_demo.py as it confirms payments, so checking a
+# transaction_id is a hash lookup instead of an XRANGE over backend_bacen_response_<id>. Entries live
+# in hashes pix_status:<generation>:<bucket>, where the generation is the confirmation time divided
+# by STATUS_TTL and the bucket is the CRC32 of the transaction_id modulo STATUS_BUCKETS. Many small
+# hashes stay listpack-encoded (a few bytes per entry), and a whole generation expires at once: each
+# hash lives until the end of the following generation, so every entry is findable for STATUS_TTL
+# seconds at least and a lookup only checks the current and the previous generation.
+#
+# Entry value: "<status>|<backend_id>|<pix_payments entry ID>|<confirmation epoch ms>"
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+status_prefix = os.getenv("STATUS_PREFIX", "pix_status")  # Must match the consumers' STATUS_PREFIX
+status_buckets = int(os.getenv("STATUS_BUCKETS", 4096))  # Must match the consumers' STATUS_BUCKETS
+status_ttl = int(os.getenv("STATUS_TTL", 86400))  # Must match the consumers' STATUS_TTL
+
+
+def status_key(generation, bucket):
+    return f"{status_prefix}:{generation}:{bucket}"
+
+
+def status_bucket(transaction_id):
+    return zlib.crc32(transaction_id.encode()) % status_buckets
+
+
+def queue_status_lookups(pipe, transaction_ids, now=None):
+    """
+    Queue one HMGET per bucket and generation that the transaction_ids fall in, previous generation
+    first; returns the ID list of each HMGET, in order, for parse_status_lookups
+    """
+    by_bucket = {}
+    for transaction_id in dict.fromkeys(transaction_ids):
+        by_bucket.setdefault(status_bucket(transaction_id), []).append(transaction_id)
+    generation = int(now if now is not None else time.time()) // status_ttl
+    plan = []
+    for lookup_generation in (generation - 1, generation):
+        for bucket, ids in by_bucket.items():
+            pipe.hmget(status_key(lookup_generation, bucket), ids)
+            plan.append(ids)
+    return plan
+
+
+def parse_status(value):
+    """A decoded index entry, or None when the transaction isn't indexed (unknown, unconfirmed or expired)"""
+    if value is None:
+        return None
+    status, backend_id, message_id, confirmed_ms = value.decode().split("|")
+    return {
+        "status": status,
+        "backend_id": backend_id,
+        "message_id": message_id,
+        "confirmed_at": int(confirmed_ms) / 1000,
+    }
+
+
+def parse_status_lookups(replies, plan):
+    """{transaction_id: entry or None} from the replies of queue_status_lookups; the latest generation wins"""
+    statuses = {}
+    for ids, values in zip(plan, replies):
+        if isinstance(values, Exception):
+            values = [None] * len(ids)
+        for transaction_id, value in zip(ids, values):
+            entry = parse_status(value)
+            if entry is not None or transaction_id not in statuses:
+                statuses[transaction_id] = entry
+    return statuses
+
+
+def lookup_statuses(client, transaction_ids):
+    """Resolve a batch of transaction_ids in one pipelined round trip"""
+    pipe = client.pipeline(transaction=False)
+    plan = queue_status_lookups(pipe, transaction_ids)
+    return parse_status_lookups(pipe.execute(raise_on_error=False), plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up the confirmation status of PIX transactions")
+    parser.add_argument("transaction_ids", nargs="*", help="Transaction IDs; read one per line from stdin if none")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per transaction")
+    args = parser.parse_args()
+
+    transaction_ids = args.transaction_ids or [line.strip() for line in sys.stdin if line.strip()]
+    statuses = lookup_statuses(redis.from_url(redis_url), transaction_ids)
+
+    for transaction_id in transaction_ids:
+        entry = statuses[transaction_id]
+        if args.json:
+            print(json.dumps({"transaction_id": transaction_id, **(entry or {"status": None})}))
+        elif entry is None:
+            print(f"{transaction_id:<24} not found")
+        else:
+            print(f"{transaction_id:<24} {entry['status']:<10} backend {entry['backend_id'] or '(none)':<12} "
+                  f"entry {entry['message_id']:<20} at {datetime.fromtimestamp(entry['confirmed_at']):%Y-%m-%d %H:%M:%S.%f}")
+
+    # Non-zero when anything is missing, for scripts
+    sys.exit(0 if all(statuses.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
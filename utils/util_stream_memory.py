@@ -0,0 +1,176 @@
+import json
+import os
+import struct
+import time
+from datetime import datetime
+
+import redis
+
+from util_payment_batch import DEFAULT_BACKEND_IDS, generate_payment_batch
+from util_payment_columns import read_columns
+
+# Measures what a payment costs in a Redis stream, for sizing from data rather than guesses. A sample
+# of payments (generated, or a recording from util_traffic_recorder.py / pix_archiver.py) is loaded
+# into a scratch stream once per encoding and node setting:
+#
+#   full    the producers' field map: transaction_id, backend_id, amount, timestamp
+#   short   the same values under one-letter field names
+#   packed  one binary field: struct-packed timestamp ms, amount in centavos, backend code, then the ID
+#
+# and stream-node-max-entries / stream-node-max-bytes pairs (CONFIG SET, restored afterwards). Each
+# run reports MEMORY USAGE and the INFO used_memory delta per entry, XADD throughput (pipelined) and
+# XREADGROUP throughput (NOACK, so the PEL doesn't skew the read cost). Streams store the field names
+# once per node when entries repeat the node's first field map, so short names can save less than
+# their length suggests; this is what the sweep shows.
+#
+# CONFIG SET is server-wide: run it against a local scratch redis-server, not a shared instance.
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+sample_size = int(os.getenv("SAMPLE_SIZE", 100000))  # Entries loaded per run
+sample_file = os.getenv("SAMPLE_FILE")  # Optional recording (.npz) to use instead of generated payments
+encodings = os.getenv("ENCODINGS", "full,short,packed").split(",")
+node_settings = [tuple(int(value) for value in setting.split(":"))  # entries:bytes pairs
+                 for setting in os.getenv("NODE_SETTINGS", "100:4096,500:8192,1000:16384,4000:65536").split(",")]
+batch_size = int(os.getenv("BATCH_SIZE", 1000))  # XADDs per pipeline
+read_count = int(os.getenv("READ_COUNT", 1000))  # XREADGROUP COUNT
+retained_entries = int(os.getenv("RETAINED_ENTRIES", 10000000))  # Projected stream size for the GB column
+stream_name = os.getenv("SCRATCH_STREAM", "stream_memory_scratch")
+results_file = os.getenv("RESULTS_FILE", "stream_memory.json")
+
+SHORT_NAMES = {"transaction_id": "i", "backend_id": "b", "amount": "a", "timestamp": "t"}
+PACKED_HEADER = struct.Struct("<QIH")  # timestamp ms, centavos, backend code
+
+
+def load_sample():
+    """Payments as the producers' field dicts, from SAMPLE_FILE or freshly generated"""
+    if not sample_file:
+        return generate_payment_batch(sample_size, start_id=0, backend_ids=DEFAULT_BACKEND_IDS).to_dicts()
+    columns = read_columns(sample_file)
+    payments = []
+    for index in range(min(sample_size, len(columns["id_ms"]))):
+        cents = int(columns["amount_cents"][index])
+        created_ms = int(columns["created_ms"][index])
+        payment = {"transaction_id": columns["transaction_id"][index].decode()}
+        if columns["backend_id"][index]:
+            payment["backend_id"] = columns["backend_id"][index].decode()
+        payment["amount"] = f"{cents // 100}.{cents % 100:02d}"
+        payment["timestamp"] = datetime.fromtimestamp(max(created_ms, 0) / 1000).isoformat()
+        payments.append(payment)
+    return payments
+
+
+def encode_short(payment):
+    return {SHORT_NAMES[name]: value for name, value in payment.items()}
+
+
+def encode_packed(payment, backend_codes):
+    created_ms = int(datetime.fromisoformat(payment["timestamp"]).timestamp() * 1000)
+    cents = round(float(payment["amount"]) * 100)
+    backend = backend_codes.setdefault(payment.get("backend_id", ""), len(backend_codes))
+    return {"p": PACKED_HEADER.pack(created_ms, cents, backend) + payment["transaction_id"].encode()}
+
+
+def encode_sample(payments, encoding):
+    if encoding == "full":
+        return payments
+    if encoding == "short":
+        return [encode_short(payment) for payment in payments]
+    if encoding == "packed":
+        backend_codes = {}
+        return [encode_packed(payment, backend_codes) for payment in payments]
+    raise ValueError(f"Unknown encoding {encoding!r}")
+
+
+def used_memory(client):
+    try:
+        return client.info("memory")["used_memory"]
+    except redis.exceptions.ResponseError:
+        return None
+
+
+def measure(client, entries, max_entries, max_bytes):
+    """Load entries into the scratch stream under one node setting; memory per entry and throughputs"""
+    client.delete(stream_name)
+    client.config_set("stream-node-max-entries", max_entries)
+    client.config_set("stream-node-max-bytes", max_bytes)
+    before = used_memory(client)
+
+    started = time.perf_counter()
+    for offset in range(0, len(entries), batch_size):
+        pipe = client.pipeline(transaction=False)
+        for fields in entries[offset:offset + batch_size]:
+            pipe.xadd(stream_name, fields)
+        pipe.execute()
+    xadd_seconds = time.perf_counter() - started
+
+    after = used_memory(client)
+    try:
+        usage = client.memory_usage(stream_name, samples=0)  # 0 = walk every node: exact
+    except redis.exceptions.ResponseError:
+        usage = None
+
+    client.xgroup_create(stream_name, "stream_memory", id="0")
+    read = 0
+    started = time.perf_counter()
+    while True:
+        response = client.xreadgroup("stream_memory", "reader", {stream_name: ">"}, count=read_count, noack=True)
+        if not response or not response[0][1]:
+            break
+        read += len(response[0][1])
+    read_seconds = time.perf_counter() - started
+    client.delete(stream_name)
+
+    return {
+        "entries": len(entries),
+        "memory_usage_per_entry": usage / len(entries) if usage is not None else None,
+        "used_memory_per_entry": (after - before) / len(entries) if before is not None and after is not None else None,
+        "xadd_per_s": len(entries) / max(xadd_seconds, 1e-9),
+        "xreadgroup_per_s": read / max(read_seconds, 1e-9),
+    }
+
+
+def print_results(results):
+    print(f"\n{'encoding':<8} {'node entries':>12} {'node bytes':>10} {'B/entry':>8} {'INFO B/entry':>12} "
+          f"{f'GB @ {retained_entries:,}':>16} {'XADD/s':>10} {'XREADGROUP/s':>13}")
+    for result in results:
+        per_entry = result["memory_usage_per_entry"]
+        info_per_entry = result["used_memory_per_entry"]
+        print(f"{result['encoding']:<8} {result['node_max_entries']:>12,} {result['node_max_bytes']:>10,} "
+              f"{per_entry if per_entry is not None else float('nan'):>8.1f} "
+              f"{info_per_entry if info_per_entry is not None else float('nan'):>12.1f} "
+              f"{per_entry * retained_entries / 1e9 if per_entry is not None else float('nan'):>16.2f} "
+              f"{result['xadd_per_s']:>10,.0f} {result['xreadgroup_per_s']:>13,.0f}")
+
+
+if __name__ == "__main__":
+    client = redis.from_url(redis_url)
+    try:
+        original = client.config_get("stream-node-max-*")
+    except (redis.exceptions.ResponseError, redis.exceptions.ConnectionError) as e:
+        raise SystemExit(f"CONFIG GET failed on {redis_url} ({e}): the sweep needs CONFIG and MEMORY, "
+                         f"which managed Redis services usually disable; use a local redis-server")
+    payments = load_sample()
+    print(f"Measuring {len(payments):,} payments ({'from ' + sample_file if sample_file else 'generated'}) "
+          f"in {', '.join(encodings)} encodings x {len(node_settings)} node settings on {redis_url}")
+
+    results = []
+    try:
+        for encoding in encodings:
+            entries = encode_sample(payments, encoding)
+            for max_entries, max_bytes in node_settings:
+                print(f"Running {encoding} with stream-node-max-entries {max_entries}, "
+                      f"stream-node-max-bytes {max_bytes}...")
+                results.append({"encoding": encoding, "node_max_entries": max_entries, "node_max_bytes": max_bytes,
+                                **measure(client, entries, max_entries, max_bytes)})
+    finally:
+        # Server-wide settings: always put them back
+        for name, value in original.items():
+            client.config_set(name, value)
+        client.delete(stream_name)
+
+    print_results(results)
+    with open(results_file, "w") as output:
+        json.dump({"settings": {"sample_size": len(payments), "sample_file": sample_file, "batch_size": batch_size,
+                                "read_count": read_count, "original_config": original},
+                   "results": results}, output, indent=2)
+    print(f"\nResults written to {results_file}")
@@ -0,0 +1,141 @@
+import os
+import argparse
+import time
+from datetime import datetime
+from multiprocessing import Event, Process, Queue, Value
+
+import numpy as np
+import redis
+
+from util_payment_batch import send_resp_commands
+from util_payment_columns import read_columns
+from util_progress import report_progress, server_time_us, start_progress, wait_for_completion
+
+# Replays recordings (util_traffic_recorder.py, or pix_archiver.py archive files) into a test stream
+# with their original inter-arrival pattern, at 1x, Nx or max speed. The rows are dealt round-robin to
+# several processes that follow one shared schedule. Each process pre-encodes its XADDs as RESP before
+# the clock starts, leaving out only the timestamp value, which is fixed-width and spliced in once per
+# pipeline. Sending a pipeline is then one bytes.join and one write.
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+TIMESTAMP_WIDTH = 26  # datetime.isoformat(timespec="microseconds")
+
+
+def load_recordings(paths):
+    """Columns of one or more recordings, merged in stream ID order"""
+    parts = [read_columns(path) for path in paths]
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    order = np.lexsort((columns["id_seq"], columns["id_ms"]))
+    return {name: values[order] for name, values in columns.items()}
+
+
+def encode_xadds(columns, indices, stream_name):
+    """One 'XADD <stream> * ... timestamp $26' command per row, missing only the timestamp value and CRLF"""
+    stream = stream_name.encode()
+    commands = []
+    for index in indices:
+        args = [b"XADD", stream, b"*", b"transaction_id", columns["transaction_id"][index]]
+        if columns["backend_id"][index]:
+            args += [b"backend_id", columns["backend_id"][index]]  # Recorded without one: replayed without one
+        cents = int(columns["amount_cents"][index])
+        args += [b"amount", b"%d.%02d" % (cents // 100, cents % 100), b"timestamp"]
+        commands.append(b"*%d\r\n" % (len(args) + 1) +
+                        b"".join(b"$%d\r\n%s\r\n" % (len(arg), arg) for arg in args) +
+                        b"$%d\r\n" % TIMESTAMP_WIDTH)
+    return commands
+
+
+def replay_worker(worker, args, ready, start_event, start_time, results):
+    columns = load_recordings(args.recordings)
+    indices = np.arange(worker, len(columns["id_ms"]), args.processes)
+    commands = encode_xadds(columns, indices, args.stream)
+    if args.speed == "max":
+        offsets = np.zeros(len(indices))
+    else:
+        offsets = (columns["id_ms"][indices] - columns["id_ms"][0]) / 1000 / float(args.speed)
+    client = redis.from_url(redis_url)
+    client.ping()
+
+    ready.put(worker)
+    start_event.wait()
+    started = start_time.value
+    sent, errors, lateness = 0, 0, []
+    while sent < len(commands):
+        now = time.time() - started
+        due = int(np.searchsorted(offsets, now, side="right"))
+        if due == sent:
+            time.sleep(min(offsets[sent] - now, 0.05))
+            continue
+        end = min(due, sent + args.pipeline)
+        lateness.append(now - offsets[sent])  # How far the oldest command of this pipeline is behind schedule
+        stamp = datetime.now().isoformat(timespec="microseconds").encode() + b"\r\n"
+        errors += send_resp_commands(client, stamp.join(commands[sent:end]) + stamp, end - sent)
+        sent = end
+    results.put((worker, sent, errors, time.time() - started, lateness))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded PIX traffic into a stream")
+    parser.add_argument("recordings", nargs="+", help="Recording or archive files (.npz)")
+    parser.add_argument("--stream", default=os.getenv("REPLAY_STREAM", "pix_payments_replay"),
+                        help="Target stream (default: pix_payments_replay)")
+    parser.add_argument("--speed", default=os.getenv("REPLAY_SPEED", "1"),
+                        help="Speed multiplier (1 = original timing), or max for back-to-back pipelines")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("REPLAY_PROCESSES", 4)),
+                        help="Sending processes")
+    parser.add_argument("--pipeline", type=int, default=int(os.getenv("REPLAY_PIPELINE", 1000)),
+                        help="XADDs per pipeline at most")
+    parser.add_argument("--clear", action="store_true", help="Delete the target stream first")
+    parser.add_argument("--wait", action="store_true",
+                        help="Wait for the consumers' progress marks and report time to drain (see util_progress.py)")
+    args = parser.parse_args()
+    if args.speed != "max" and float(args.speed) <= 0:
+        parser.error("--speed must be positive or max")
+
+    columns = load_recordings(args.recordings)
+    total = len(columns["id_ms"])
+    recorded_span = (columns["id_ms"][-1] - columns["id_ms"][0]) / 1000
+    print(f"Replaying {total:,} entries recorded over {recorded_span:,.3f}s into {args.stream} "
+          f"at {args.speed}{'' if args.speed == 'max' else 'x'} speed with {args.processes} processes...")
+
+    redis_client = redis.from_url(redis_url)
+    if args.clear:
+        redis_client.delete(args.stream)
+    if args.wait:
+        start_progress(redis_client, total)
+
+    ready, results = Queue(), Queue()
+    start_event, start_time = Event(), Value("d", 0.0)
+    processes = [Process(target=replay_worker, args=(worker, args, ready, start_event, start_time, results))
+                 for worker in range(args.processes)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready.get()  # Every process has loaded and encoded its share
+
+    injection_start_us = server_time_us(redis_client)
+    start_time.value = time.time()
+    start_event.set()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    injection_end_us = server_time_us(redis_client)
+
+    sent = sum(report[1] for report in reports)
+    errors = sum(report[2] for report in reports)
+    elapsed = max(report[3] for report in reports)
+    lateness = np.concatenate([report[4] for report in reports]) * 1000
+    print(f"Replayed {sent:,} entries in {elapsed:,.3f}s ({sent / max(elapsed, 1e-9):,.0f} msg/s; "
+          f"recorded {total / max(recorded_span, 1e-9):,.0f} msg/s), {errors} errors")
+    if args.speed != "max" and len(lateness):
+        p50, p99 = np.percentile(lateness, [50, 99])
+        print(f"Behind schedule: p50 {p50:.2f} ms, p99 {p99:.2f} ms, max {lateness.max():.2f} ms "
+              f"(a growing lag means the replayer, not the recording, sets the pace: add --processes)")
+
+    if args.wait:
+        print("Waiting for consumers to process all messages...")
+        report_progress(wait_for_completion(redis_client, total), total, injection_start_us, injection_end_us)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+import redis
+
+from util_payment_batch import generate_payment_batch
+
+# Runs the same PIX workload through each Redis transport, with the same batch size and number of
+# producer/consumer processes, and reports throughput, latency, Redis memory per message and what
+# happens when a consumer is killed mid-batch:
+#
+#   list           LPUSH + BRPOP/RPOP count      (alternative_demos/pix_mvp.py)
+#   reliable_list  LPUSH + BLMOVE to a per-consumer processing list, LREM when done, recovery sweep
+#   stream         XADD + XREADGROUP + XACK, XAUTOCLAIM when idle    (pix_smasher_demo.py)
+#   pubsub         PUBLISH to one channel per consumer (round robin), nothing stored
+#
+# Every message carries its sequence number and the wall-clock time (ns) its batch was sent, so
+# latency is measured at the consumer that processed it and lost/duplicate messages are counted.
+
+redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+transports = os.getenv("TRANSPORTS", "list,reliable_list,stream,pubsub").split(",")
+num_messages = int(os.getenv("NUM_MESSAGES", 100000))
+batch_size = int(os.getenv("BATCH_SIZE", 100))
+concurrency = int(os.getenv("CONCURRENCY", 4))  # Producer processes, and consumer processes
+memory_sample = int(os.getenv("MEMORY_SAMPLE", 10000))  # Messages stored to measure memory per message
+crash_test = os.getenv("CRASH_TEST", "true").lower() == "true"  # Kill one consumer mid-batch in a second run
+claim_idle_ms = int(os.getenv("CLAIM_IDLE_MS", 1000))  # Idle time before recovering another consumer's messages
+key_prefix = os.getenv("KEY_PREFIX", "transport_bench")
+results_file = os.getenv("RESULTS_FILE", "transport_benchmark.json")
+run_timeout = float(os.getenv("RUN_TIMEOUT", 120))
+
+BLOCK_MS = 100
+HEARTBEAT_MS = 500
+
+
+def _encode(seq, sent_ns, payment_json):
+    return f"{seq}|{sent_ns}|{payment_json}"
+
+
+def _decode(value):
+    seq, sent_ns, payment_json = value.split(b"|", 2)
+    return int(seq), int(sent_ns), float(json.loads(payment_json)["amount"])
+
+
+class ListTransport:
+    name = "list"
+    stores_messages = True
+
+    def __init__(self, key, consumers):
+        self.key = key
+        self.consumers = consumers
+
+    def reset(self, client):
+        client.delete(self.key)
+
+    def prepare(self, batch):
+        return batch.to_json()
+
+    def send(self, client, seq, payments, sent_ns):
+        client.lpush(self.key, *[_encode(seq + i, sent_ns, payment) for i, payment in enumerate(payments)])
+
+    def open(self, client, index):
+        return {"index": index}
+
+    def receive(self, client, state, count):
+        first = client.brpop(self.key, timeout=BLOCK_MS / 1000)
+        if not first:
+            return []
+        values = [first[1]] + ((client.rpop(self.key, count - 1) or []) if count > 1 else [])
+        return [(*_decode(value), value) for value in values]
+
+    def ack(self, pipe, state, tokens):
+        pass  # popped means gone: whatever a killed consumer held is lost
+
+    def recover(self, client, state, count):
+        return []
+
+    def outstanding(self, client):
+        return client.llen(self.key)
+
+    def memory_keys(self):
+        return [self.key]
+
+
+class ReliableListTransport(ListTransport):
+    name = "reliable_list"
+
+    def processing_key(self, index):
+        return f"{self.key}:processing:{index}"
+
+    def alive_key(self, index):
+        return f"{self.key}:alive:{index}"
+
+    def reset(self, client):
+        client.delete(self.key, *[self.processing_key(i) for i in range(self.consumers)])
+
+    def open(self, client, index):
+        return {"index": index, "processing": self.processing_key(index)}
+
+    def receive(self, client, state, count):
+        client.set(self.alive_key(state["index"]), 1, px=HEARTBEAT_MS * 4)
+        first = client.blmove(self.key, state["processing"], BLOCK_MS / 1000, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        values = [first]
+        if count > 1:
+            # No multi-element LMOVE: pipeline the rest, an empty list answers None
+            pipe = client.pipeline(transaction=False)
+            for _ in range(count - 1):
+                pipe.lmove(self.key, state["processing"], "RIGHT", "LEFT")
+            values += [value for value in pipe.execute() if value is not None]
+        return [(*_decode(value), value) for value in values]
+
+    def ack(self, pipe, state, tokens):
+        for token in tokens:
+            pipe.lrem(state["processing"], 1, token)
+
+    def recover(self, client, state, count):
+        """Recovery sweep: push a dead consumer's processing list back onto the source list"""
+        for index in range(self.consumers):
+            if index != state["index"] and not client.exists(self.alive_key(index)):
+                while client.lmove(self.processing_key(index), self.key, "RIGHT", "RIGHT") is not None:
+                    pass
+        return []
+
+    def outstanding(self, client):
+        pipe = client.pipeline(transaction=False)
+        pipe.llen(self.key)
+        for index in range(self.consumers):
+            pipe.llen(self.processing_key(index))
+        return sum(pipe.execute())
+
+
+class StreamTransport(ListTransport):
+    name = "stream"
+    group = "bench_consumers"
+
+    def reset(self, client):
+        client.delete(self.key)
+        client.xgroup_create(self.key, self.group, id="0", mkstream=True)
+
+    def prepare(self, batch):
+        return batch.to_dicts()
+
+    def send(self, client, seq, payments, sent_ns):
+        pipe = client.pipeline(transaction=False)
+        for i, payment in enumerate(payments):
+            pipe.xadd(self.key, {"seq": seq + i, "sent_ns": sent_ns, **payment})
+        pipe.execute()
+
+    def open(self, client, index):
+        return {"index": index, "name": f"bench_consumer_{index}"}
+
+    @staticmethod
+    def _entries(messages):
+        return [(int(fields[b"seq"]), int(fields[b"sent_ns"]), float(fields[b"amount"]), message_id)
+                for message_id, fields in messages]
+
+    def receive(self, client, state, count):
+        response = client.xreadgroup(self.group, state["name"], {self.key: ">"}, count=count, block=BLOCK_MS)
+        return self._entries(response[0][1]) if response else []
+
+    def ack(self, pipe, state, tokens):
+        if tokens:
+            pipe.xack(self.key, self.group, *tokens)
+
+    def recover(self, client, state, count):
+        """XAUTOCLAIM entries idle longer than claim_idle_ms, as review_pending does in pix_smasher_demo.py"""
+        _, claimed, _ = client.xautoclaim(self.key, self.group, state["name"], claim_idle_ms,
+                                          start_id="0-0", count=count)
+        return self._entries(claimed)
+
+    def outstanding(self, client):
+        return client.xpending(self.key, self.group)["pending"]
+
+
+class PubSubTransport(ListTransport):
+    name = "pubsub"
+    stores_messages = False
+
+    def __init__(self, key, consumers):
+        super().__init__(key, consumers)
+        self.next_channel = 0
+
+    def channel(self, index):
+        return f"{self.key}:{index}"
+
+    def send(self, client, seq, payments, sent_ns):
+        # One channel per consumer, batches round robin: a work split, not a fan-out
+        channel = self.channel(self.next_channel)
+        self.next_channel = (self.next_channel + 1) % self.consumers
+        pipe = client.pipeline(transaction=False)
+        for i, payment in enumerate(payments):
+            pipe.publish(channel, _encode(seq + i, sent_ns, payment))
+        pipe.execute()
+
+    def open(self, client, index):
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel(index))
+        pubsub.get_message(timeout=1)  # wait for the subscribe confirmation
+        return {"index": index, "pubsub": pubsub}
+
+    def receive(self, client, state, count):
+        entries = []
+        message = state["pubsub"].get_message(timeout=BLOCK_MS / 1000)
+        while message is not None:
+            entries.append((*_decode(message["data"]), None))
+            if len(entries) >= count:
+                break
+            message = state["pubsub"].get_message(timeout=0)
+        return entries
+
+    def outstanding(self, client):
+        return 0  # nothing is stored: a message without a live subscriber is gone
+
+    def memory_keys(self):
+        return []
+
+
+TRANSPORT_CLASSES = {cls.name: cls for cls in (ListTransport, ReliableListTransport, StreamTransport, PubSubTransport)}
+
+
+def _wait_for(client, key, expected, timeout):
+    deadline = time.time() + timeout
+    while int(client.get(key) or 0) < expected:
+        if time.time() > deadline:
+            raise TimeoutError(f"Timed out waiting for {expected} workers on {key}")
+        time.sleep(0.01)
+
+
+def _producer(transport, url, keys, consumers, start, count, batch_size, timeout):
+    client = redis.from_url(url)
+    ready_key, done_key, _ = keys
+    payments = transport.prepare(generate_payment_batch(count, start_id=start))
+    _wait_for(client, ready_key, consumers, timeout)
+
+    for offset in range(0, count, batch_size):
+        transport.send(client, start + offset, payments[offset:offset + batch_size], time.time_ns())
+    client.incr(done_key)
+
+
+def _consumer(transport, url, index, keys, producers, batch_size, crash_after, timeout, results):
+    client = redis.from_url(url)
+    ready_key, done_key, crash_key = keys
+    state = transport.open(client, index)
+    client.incr(ready_key)
+
+    seqs = []
+    latencies = []
+    last_received_ns = 0
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        # Check before reading: nothing read after all producers finished means only recovery is left
+        producers_done = int(client.get(done_key) or 0) >= producers
+        entries = transport.receive(client, state, batch_size)
+        if not entries:
+            entries = transport.recover(client, state, batch_size)
+        if not entries:
+            if producers_done and transport.outstanding(client) == 0:
+                break
+            continue
+
+        if crash_after is not None and len(seqs) + len(entries) > crash_after:
+            # Simulated kill -9: the batch in hand is neither processed nor acknowledged. What was
+            # already processed is still reported, so only the batch in hand can be lost.
+            client.set(crash_key, time.time_ns())
+            results.put((index, np.array(seqs, dtype=np.int64), np.array(latencies), last_received_ns))
+            results.close()
+            results.join_thread()
+            os._exit(1)
+
+        last_received_ns = time.time_ns()
+        pipe = client.pipeline(transaction=False)
+        pipe.incrby(f"{transport.key}:processed_count", len(entries))
+        pipe.incrbyfloat(f"{transport.key}:total_amount", sum(amount for _, _, amount, _ in entries))
+        transport.ack(pipe, state, [token for _, _, _, token in entries])
+        pipe.execute()
+        seqs.extend(seq for seq, _, _, _ in entries)
+        latencies.extend((last_received_ns - sent_ns) / 1e6 for _, sent_ns, _, _ in entries)
+
+    results.put((index, np.array(seqs, dtype=np.int64), np.array(latencies), last_received_ns))
+
+
+def run_workload(transport, url, total_messages, batch_size, concurrency, crash=False, timeout=120):
+    """One run of total_messages through `concurrency` producer/consumer process pairs"""
+    client = redis.from_url(url)
+    keys = (f"{transport.key}:ready", f"{transport.key}:done", f"{transport.key}:crashed_at")
+    transport.reset(client)
+    client.delete(*keys)
+
+    results = multiprocessing.Queue()
+    consumers = [multiprocessing.Process(target=_consumer, args=(
+        transport, url, index, keys, concurrency, batch_size,
+        # Consumer 0 dies after processing about a quarter of its share
+        total_messages // (4 * concurrency) if crash and index == 0 else None,
+        timeout, results)) for index in range(concurrency)]
+    shares = [total_messages // concurrency + (1 if i < total_messages % concurrency else 0)
+              for i in range(concurrency)]
+    starts = np.cumsum([0] + shares[:-1])
+    producers = [multiprocessing.Process(target=_producer, args=(
+        transport, url, keys, concurrency, int(start), share, batch_size, timeout))
+        for start, share in zip(starts, shares)]
+
+    first_sent_ns = time.time_ns()
+    for process in consumers + producers:
+        process.start()
+    for process in producers:
+        process.join()
+
+    collected = []
+    while len(collected) < concurrency:
+        try:
+            collected.append(results.get(timeout=timeout))
+        except queue.Empty:
+            break
+    for process in consumers:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+
+    crashed_at = client.get(keys[2])
+    transport.reset(client)
+    client.delete(*keys, f"{transport.key}:processed_count", f"{transport.key}:total_amount")
+
+    seqs = np.concatenate([seqs for _, seqs, _, _ in collected]) if collected else np.array([], dtype=np.int64)
+    latencies = np.concatenate([lat for _, _, lat, _ in collected]) if collected else np.array([])
+    last_received_ns = max((last for _, _, _, last in collected), default=first_sent_ns)
+    unique = len(np.unique(seqs))
+    elapsed_s = max((last_received_ns - first_sent_ns) / 1e9, 1e-9)
+    result = {
+        "sent": total_messages,
+        "processed": int(len(seqs)),
+        "lost": total_messages - unique,
+        "duplicates": int(len(seqs) - unique),
+        "elapsed_s": elapsed_s,
+        "throughput": unique / elapsed_s,
+    }
+    if len(latencies):
+        p50, p95, p99, p999 = np.percentile(latencies, [50, 95, 99, 99.9])
+        result.update({"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "p999_ms": p999, "max_ms": latencies.max()})
+    if crashed_at:
+        # How long the survivors kept going after the kill: recovery (or just the rest of the backlog)
+        result["drain_after_crash_s"] = max(last_received_ns - int(crashed_at), 0) / 1e9
+    return result
+
+
+def measure_memory(transport, url, count, batch_size):
+    """Redis memory per stored message (MEMORY USAGE of the transport's keys), None if nothing is stored"""
+    if not transport.stores_messages:
+        return None
+    client = redis.from_url(url)
+    transport.reset(client)
+    payments = transport.prepare(generate_payment_batch(count, start_id=0))
+    for offset in range(0, count, batch_size):
+        transport.send(client, offset, payments[offset:offset + batch_size], time.time_ns())
+    used = sum(client.memory_usage(key, samples=0) or 0 for key in transport.memory_keys())
+    transport.reset(client)
+    return used / count
+
+
+def print_results(results):
+    print(f"\n{'Transport':<14} {'msg/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'B/msg':>7} "
+          f"{'lost@kill':>9} {'dup@kill':>8} {'drain@kill':>10}")
+    for name, result in results.items():
+        run = result["run"]
+        crash = result.get("crash_run") or {}
+        memory = result.get("bytes_per_message")
+        memory = f"{memory:,.0f}" if memory is not None else "n/a"
+        drain = f"{crash['drain_after_crash_s']:.2f}s" if "drain_after_crash_s" in crash else "-"
+        print(f"{name:<14} {run['throughput']:>10,.0f} {run.get('p50_ms', 0):>8.3f} {run.get('p99_ms', 0):>8.3f} "
+              f"{run.get('p999_ms', 0):>9.3f} {memory:>7} {crash.get('lost', '-'):>9} "
+              f"{crash.get('duplicates', '-'):>8} {drain:>10}")
+
+
+if __name__ == "__main__":
+    print(f"Comparing {', '.join(transports)}: {num_messages:,} messages, batches of {batch_size}, "
+          f"{concurrency} producers x {concurrency} consumers")
+    results = {}
+    for name in transports:
+        transport = TRANSPORT_CLASSES[name](f"{key_prefix}:{name}", concurrency)
+        print(f"Running {name}...")
+        results[name] = {
+            "run": run_workload(transport, redis_url, num_messages, batch_size, concurrency, timeout=run_timeout),
+            "bytes_per_message": measure_memory(transport, redis_url, memory_sample, batch_size),
+        }
+        if crash_test and concurrency > 1:
+            print(f"Running {name} with one consumer killed mid-batch...")
+            results[name]["crash_run"] = run_workload(transport, redis_url, num_messages, batch_size, concurrency,
+                                                      crash=True, timeout=run_timeout)
+
+    print_results(results)
+    with open(results_file, "w") as output:
+        json.dump({"settings": {"num_messages": num_messages, "batch_size": batch_size, "concurrency": concurrency,
+                                "claim_idle_ms": claim_idle_ms},
+                   "results": results}, output, indent=2, default=float)
+    print(f"\nResults written to {results_file}")